@@ -6,7 +6,9 @@ from flask_mail import Mail
 from flask_migrate import Migrate
 from flask_sqlalchemy import SQLAlchemy
 
+from core.caching.result_cache import ResultCache
 from core.configuration.configuration import get_app_version
+from core.database.routing import ReplicaRouter, RoutingSession
 from core.managers.config_manager import ConfigManager
 from core.managers.error_handler_manager import ErrorHandlerManager
 from core.managers.logging_manager import LoggingManager
@@ -16,9 +18,11 @@ from core.managers.module_manager import ModuleManager
 load_dotenv()
 
 # Create the instances
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={"class_": RoutingSession})
 migrate = Migrate()
 mail = Mail()
+cache = ResultCache()
+replicas = ReplicaRouter(db)
 
 
 def create_app(config_name="development"):
@@ -32,6 +36,12 @@ def create_app(config_name="development"):
     db.init_app(app)
     migrate.init_app(app, db)
 
+    # Route the reads of GET requests and read-only repository methods to the replica, if any
+    replicas.init_app(app)
+
+    # Initialize the result cache used by explore and search
+    cache.init_app(app)
+
     # Register modules
     module_manager = ModuleManager(app)
     module_manager.register_modules()
@@ -39,15 +49,16 @@ def create_app(config_name="development"):
     # Register login manager
     from flask_login import LoginManager
 
+    from app.modules.auth.identity_cache import identity_cache
+
+    identity_cache.init_app(app)
     login_manager = LoginManager()
     login_manager.init_app(app)
     login_manager.login_view = "auth.login"
 
     @login_manager.user_loader
     def load_user(user_id):
-        from app.modules.auth.models import User
-
-        return User.query.get(int(user_id))
+        return identity_cache.load_user(int(user_id))
 
     # Set up logging
     logging_manager = LoggingManager(app)
@@ -0,0 +1,130 @@
+import os
+from typing import Optional
+
+from cachelib import BaseCache, NullCache
+from flask import current_app, has_app_context
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import select
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+
+from core.caching.result_cache import create_backend, is_shared
+
+
+def _columns(instance, exclude=()) -> dict:
+    columns = sqlalchemy_inspect(type(instance)).column_attrs
+    return {column.key: getattr(instance, column.key) for column in columns if column.key not in exclude}
+
+
+def _restore(model, columns: dict):
+    """Detached instance of `model` holding `columns` as if it had just been loaded"""
+    instance = sqlalchemy_inspect(model).class_manager.new_instance()
+    for key, value in columns.items():
+        set_committed_value(instance, key, value)
+    make_transient_to_detached(instance)
+    return instance
+
+
+class IdentityCache:
+    """
+    Bounded, TTL'd cache of what authenticated requests need about their user, keyed by
+    user id: the user row, its profile and the ids of the communities it curates.
+
+    Entries hold column values, not ORM instances. On a hit `load_user` rebuilds the user
+    and its profile and attaches them to the session without querying; relationships and
+    the password hash are left out of the entry and lazy load when used.
+
+    Whatever changes the user row, its profile or its curators must call `invalidate(user_id)`;
+    the TTL only bounds how long a missed invalidation lasts. With an in-process backend
+    (CACHE_TYPE=memory) the other workers do not see the invalidation either and keep their
+    entry until it expires, which is why `is_curator` only answers from a shared backend.
+    """
+
+    EXTENSION = "identity_cache"
+
+    def __init__(self, app=None):
+        self._null_backend = NullCache()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("IDENTITY_CACHE_TIMEOUT", 60)
+        app.config.setdefault("IDENTITY_CACHE_THRESHOLD", 1000)
+        # Same kind of backend as the result cache
+        config = {
+            **app.config,
+            "CACHE_DEFAULT_TIMEOUT": app.config["IDENTITY_CACHE_TIMEOUT"],
+            "CACHE_THRESHOLD": app.config["IDENTITY_CACHE_THRESHOLD"],
+            "CACHE_DIR": os.path.join(app.config["CACHE_DIR"], "identity"),
+            "CACHE_KEY_PREFIX": f"{app.config['CACHE_KEY_PREFIX']}identity:",
+        }
+        app.extensions[self.EXTENSION] = create_backend(config)
+
+    @property
+    def backend(self) -> BaseCache:
+        if not has_app_context():
+            return self._null_backend
+        return current_app.extensions.get(self.EXTENSION, self._null_backend)
+
+    @staticmethod
+    def _key(user_id: int) -> str:
+        return f"user:{user_id}"
+
+    def load_user(self, user_id: int):
+        """User `user_id` with its profile, from the cache when possible; None if it does not exist"""
+        from app import db
+        from app.modules.auth.models import User
+        from app.modules.profile.models import UserProfile
+
+        entry = self.backend.get(self._key(user_id))
+        if entry is None:
+            return self._load_and_store(user_id)
+
+        user = _restore(User, entry["user"])
+        profile = _restore(UserProfile, entry["profile"]) if entry["profile"] is not None else None
+        set_committed_value(user, "profile", profile)
+        if profile is not None:
+            set_committed_value(profile, "user", user)
+        return db.session.merge(user, load=False)
+
+    def _load_and_store(self, user_id: int):
+        from app import db
+        from app.modules.auth.models import User
+        from app.modules.community.models import CommunityCurator
+
+        # From the primary: a lagging replica would cache an outdated entry until it expires
+        primary = {"bind": db.engine}
+        user = db.session.scalars(
+            select(User).options(joinedload(User.profile)).filter_by(id=user_id), bind_arguments=primary
+        ).first()
+        if user is None:
+            return None
+
+        communities = db.session.scalars(
+            select(CommunityCurator.community_id).filter_by(user_id=user_id), bind_arguments=primary
+        ).all()
+        entry = {
+            "user": _columns(user, exclude=("password",)),
+            "profile": _columns(user.profile) if user.profile is not None else None,
+            "communities": sorted(communities),
+        }
+        self.backend.set(self._key(user_id), entry)
+        return user
+
+    def is_curator(self, user_id: int, community_id: int) -> Optional[bool]:
+        """
+        Whether the user curates the community, or None when its entry is not cached. Always
+        None with an in-process backend, which may hold memberships revoked by another worker.
+        """
+        backend = self.backend
+        if not is_shared(backend):
+            return None
+        entry = backend.get(self._key(user_id))
+        return community_id in entry["communities"] if entry is not None else None
+
+    def invalidate(self, *user_ids: int):
+        for user_id in user_ids:
+            self.backend.delete(self._key(user_id))
+
+
+identity_cache = IdentityCache()
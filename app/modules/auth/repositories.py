@@ -50,10 +50,7 @@ class Email2FACodeRepository(BaseRepository):
         )
 
     def invalidate_all_codes_for_user(self, user_id: int) -> None:
-        codes = self.model.query.filter_by(user_id=user_id, invalidated=False).all()
-        for code in codes:
-            code.invalidated = True
-        self.session.commit()
+        self.update_where({"invalidated": True}, user_id=user_id, invalidated=False)
 
 
 class TwoFAAttemptRepository(BaseRepository):
@@ -66,9 +63,4 @@ class TwoFAAttemptRepository(BaseRepository):
 
     def get_failed_attempts_in_window(self, user_id: int, window_minutes: int = 5) -> int:
         cutoff_time = datetime.now(tz=timezone.utc) - timedelta(minutes=window_minutes)
-        count = (
-            self.model.query.filter_by(user_id=user_id, success=False)
-            .filter(TwoFAAttempt.created_at > cutoff_time)
-            .count()
-        )
-        return count
+        return self.count(TwoFAAttempt.created_at > cutoff_time, user_id=user_id, success=False)
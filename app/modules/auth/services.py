@@ -6,7 +6,8 @@ from flask import current_app, render_template, url_for
 from flask_login import current_user, login_user
 from flask_mail import Message
 
-from app import mail
+from app import cache, mail
+from app.modules.auth.identity_cache import identity_cache
 from app.modules.auth.models import User
 from app.modules.auth.repositories import (
     Email2FACodeRepository,
@@ -16,6 +17,7 @@ from app.modules.auth.repositories import (
 )
 from app.modules.profile.models import UserProfile
 from app.modules.profile.repositories import UserProfileRepository
+from app.modules.profile.services import PROFILE_NAMES_SCOPE
 from core.configuration.configuration import uploads_folder_name
 from core.services.BaseService import BaseService
 
@@ -67,6 +69,7 @@ class AuthenticationService(BaseService):
             profile_data["user_id"] = user.id
             self.user_profile_repository.create(**profile_data)
             self.repository.session.commit()
+            cache.invalidate(PROFILE_NAMES_SCOPE)
 
             # Send email validation after successful user creation
             try:
@@ -81,6 +84,7 @@ class AuthenticationService(BaseService):
     def update_profile(self, user_profile_id, form):
         if form.validate():
             updated_instance = self.update(user_profile_id, **form.data)
+            cache.invalidate(PROFILE_NAMES_SCOPE)
             return updated_instance, None
 
         return None, form.errors
@@ -147,6 +151,7 @@ class EmailValidationService(BaseService):
 
         if valid:
             self.user_repository.update(user_id, email_validated=True)
+            identity_cache.invalidate(user_id)
             return True
         else:
             return False
@@ -223,6 +228,7 @@ class Email2FAService(BaseService):
             )
 
         self.user_repository.update(user_id, email_2fa_enabled=True)
+        identity_cache.invalidate(user_id)
         return True
 
     def disable_email_2fa(self, user_id: int) -> bool:
@@ -235,4 +241,5 @@ class Email2FAService(BaseService):
             return True
 
         self.user_repository.update(user_id, email_2fa_enabled=False)
+        identity_cache.invalidate(user_id)
         return True
@@ -0,0 +1,158 @@
+import re
+
+import pytest
+from cachelib import FileSystemCache
+from flask import g
+from sqlalchemy import event
+
+from app import db
+from app.modules.auth.identity_cache import identity_cache
+from app.modules.auth.models import User
+from app.modules.auth.services import Email2FAService
+from app.modules.community.services import CommunityService
+from app.modules.conftest import login, logout
+from app.modules.profile.models import UserProfile
+from core.caching.result_cache import LRUMemoryCache
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extends the test_client fixture with a user, its profile and a community it curates.
+    """
+    with test_client.application.app_context():
+        user = User(email="identity@example.com", password="test1234", email_validated=True)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add(UserProfile(user_id=user.id, name="Identity", surname="Cached"))
+        db.session.commit()
+        CommunityService().create_community("identity-community", "Curated by the identity user", user.id)
+
+    yield test_client
+
+
+def use_backend(test_client, backend):
+    extensions = test_client.application.extensions
+    previous = extensions[identity_cache.EXTENSION]
+    extensions[identity_cache.EXTENSION] = backend
+    return previous
+
+
+@pytest.fixture
+def identity_backend(test_client, tmp_path):
+    """The testing config disables caching: give the identity cache a backend shared by workers"""
+    backend = FileSystemCache(str(tmp_path), threshold=10, default_timeout=60)
+    previous = use_backend(test_client, backend)
+    yield backend
+    use_backend(test_client, previous)
+
+
+@pytest.fixture
+def memory_backend(test_client):
+    backend = LRUMemoryCache(threshold=10, default_timeout=60)
+    previous = use_backend(test_client, backend)
+    yield backend
+    use_backend(test_client, previous)
+
+
+@pytest.fixture
+def statements(test_client):
+    executed = []
+
+    def record(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", record)
+
+
+def get_as_new_request(test_client, path):
+    """The tests hold the app context of every request: forget the user loaded by the previous one"""
+    g.pop("_login_user", None)
+    db.session.expunge_all()
+    return test_client.get(path)
+
+
+def identity_user():
+    return User.query.filter_by(email="identity@example.com").one()
+
+
+def test_cached_user_loads_without_queries(test_client, identity_backend, statements):
+    """Test that a cached user, its profile and its curator memberships need no query"""
+    user_id = identity_user().id
+    community = CommunityService().get_community_by_name("identity-community")
+    db.session.expunge_all()
+
+    assert identity_cache.load_user(user_id).email == "identity@example.com"
+    db.session.expunge_all()
+    statements.clear()
+
+    user = identity_cache.load_user(user_id)
+    assert (user.id, user.email_validated, user.profile.name) == (user_id, True, "Identity")
+    assert user.profile.user is user
+    assert CommunityService().is_curator(user_id, community.id)
+    assert statements == []
+
+    # The password hash is not cached: it lazy loads on the session the user was attached to
+    assert user.check_password("test1234")
+    assert len(statements) == 1
+
+
+def test_authenticated_requests_reuse_the_cached_identity(test_client, identity_backend, statements):
+    """Test that once cached, authenticated page views do not query the user or its profile"""
+    login(test_client, "identity@example.com", "test1234")
+
+    get_as_new_request(test_client, "/")
+    statements.clear()
+    response = get_as_new_request(test_client, "/")
+
+    assert response.status_code == 200
+    assert b"Cached, Identity" in response.data
+    assert not [statement for statement in statements if re.search(r"FROM [\"`]?user(_profile)?\b", statement)]
+
+    logout(test_client)
+
+
+def test_writes_invalidate_the_cached_identity(test_client, identity_backend):
+    """Test that 2FA toggles and curator changes invalidate the entry of the user"""
+    user_id = identity_user().id
+    other_id = User.query.filter_by(email="test@example.com").one().id
+    service = CommunityService()
+    community = service.get_community_by_name("identity-community")
+
+    identity_cache.load_user(user_id)
+    identity_cache.load_user(other_id)
+    assert identity_cache.is_curator(other_id, community.id) is False
+
+    Email2FAService().enable_email_2fa(user_id)
+    service.add_curator(community.id, other_id, user_id)
+
+    assert identity_cache.is_curator(user_id, community.id) is None
+    assert identity_cache.is_curator(other_id, community.id) is None
+    db.session.expunge_all()
+    assert identity_cache.load_user(user_id).email_2fa_enabled is True
+    assert service.is_curator(other_id, community.id)
+
+    identity_cache.load_user(other_id)
+    service.remove_curator(community.id, other_id, user_id)
+    assert not service.is_curator(other_id, community.id)
+
+    Email2FAService().disable_email_2fa(user_id)
+    db.session.expunge_all()
+    assert identity_cache.load_user(user_id).email_2fa_enabled is False
+
+
+def test_memory_backend_does_not_answer_curator_checks(test_client, memory_backend, statements):
+    """Test that an in-process backend, which other workers cannot invalidate, is not used for authorization"""
+    user_id = identity_user().id
+    community = CommunityService().get_community_by_name("identity-community")
+    identity_cache.load_user(user_id)
+    db.session.expunge_all()
+    statements.clear()
+
+    assert identity_cache.load_user(user_id).email == "identity@example.com"
+    assert statements == []
+    assert identity_cache.is_curator(user_id, community.id) is None
+    assert CommunityService().is_curator(user_id, community.id)
+    assert len(statements) == 1
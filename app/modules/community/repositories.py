@@ -1,5 +1,8 @@
+from sqlalchemy import orm
+
 from app import db
 from app.modules.community.models import Community, CommunityCurator, CommunityDataset
+from app.modules.dataset.repositories import dataset_loader_options
 from core.repositories.BaseRepository import BaseRepository
 
 
@@ -26,8 +29,7 @@ class CommunityCuratorRepository(BaseRepository):
         return Community.query.join(CommunityCurator).filter(CommunityCurator.user_id == user_id).all()
 
     def is_curator(self, user_id: int, community_id: int) -> bool:
-        curator = self.model.query.filter_by(user_id=user_id, community_id=community_id).first()
-        return curator is not None
+        return self.exists(user_id=user_id, community_id=community_id)
 
     def add_curator(self, community_id: int, user_id: int):
         try:
@@ -40,11 +42,8 @@ class CommunityCuratorRepository(BaseRepository):
             print(f"Error adding curator: {str(e)}")
             raise
 
-    def remove_curator(self, community_id: int, user_id: int):
-        curator = self.model.query.filter_by(community_id=community_id, user_id=user_id).first()
-        if curator:
-            return self.delete(curator)
-        return None
+    def remove_curator(self, community_id: int, user_id: int) -> bool:
+        return self.delete_where(community_id=community_id, user_id=user_id) > 0
 
 
 class CommunityDatasetRepository(BaseRepository):
@@ -64,16 +63,15 @@ class CommunityDatasetRepository(BaseRepository):
 
     def unassign_dataset(self, community_id: int, dataset_id: int) -> bool:
         """Remove a dataset from a community"""
-        assignment = self.model.query.filter_by(community_id=community_id, dataset_id=dataset_id).first()
-        if assignment:
-            db.session.delete(assignment)
-            db.session.flush()
-            return True
-        return False
+        return self.delete_where(community_id=community_id, dataset_id=dataset_id, commit=False) > 0
 
     def get_community_datasets(self, community_id: int) -> list[CommunityDataset]:
         """Get all dataset assignments for a community"""
-        return self.model.query.filter_by(community_id=community_id).all()
+        return (
+            self.model.query.filter_by(community_id=community_id)
+            .options(*dataset_loader_options("listing", parent=orm.joinedload(CommunityDataset.dataset)))
+            .all()
+        )
 
     def get_dataset_communities(self, dataset_id: int) -> list[CommunityDataset]:
         """Get all community assignments for a dataset"""
@@ -81,5 +79,4 @@ class CommunityDatasetRepository(BaseRepository):
 
     def is_dataset_assigned(self, community_id: int, dataset_id: int) -> bool:
         """Check if a dataset is already assigned to a community"""
-        assignment = self.model.query.filter_by(community_id=community_id, dataset_id=dataset_id).first()
-        return assignment is not None
+        return self.exists(community_id=community_id, dataset_id=dataset_id)
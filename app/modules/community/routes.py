@@ -5,6 +5,7 @@ from app.modules.auth.models import User
 from app.modules.community.forms import CommunityForm
 from app.modules.community.services import CommunityService
 from app.modules.profile.models import UserProfile
+from app.modules.profile.services import UserProfileService
 
 community_bp = Blueprint("community", __name__, template_folder="templates")
 
@@ -32,6 +33,7 @@ def create():
 
         if form.validate_on_submit():
             service = CommunityService()
+            profile_service = UserProfileService()
             try:
                 print(f"Creating community with name: {form.name.data}")
                 community = service.create_community(
@@ -55,24 +57,7 @@ def create():
                         name = curator_names[i].strip() if i < len(curator_names) else ""
                         orcid = curator_orcids[i].strip() if i < len(curator_orcids) else ""
 
-                        profile = None
-                        if orcid:
-                            profile = UserProfile.query.filter_by(orcid=orcid).first()
-                        if not profile and name:
-                            name_query = f"%{name}%"
-                            try:
-                                from sqlalchemy import func
-
-                                concat_field = func.concat(UserProfile.name, " ", UserProfile.surname)
-                                profile = UserProfile.query.filter(
-                                    (UserProfile.name.ilike(name_query))
-                                    | (UserProfile.surname.ilike(name_query))
-                                    | (concat_field.ilike(name_query))
-                                ).first()
-                            except Exception:
-                                profile = UserProfile.query.filter(
-                                    (UserProfile.name.ilike(name_query)) | (UserProfile.surname.ilike(name_query))
-                                ).first()
+                        profile = profile_service.resolve(orcid=orcid, name=name)
 
                         if profile:
                             if not service.is_curator(profile.user_id, community.id):
@@ -131,6 +116,7 @@ def detail(community_id):
 @login_required
 def edit(community_id):
     service = CommunityService()
+    profile_service = UserProfileService()
 
     community = service.get_by_id(community_id)
     if not community:
@@ -176,24 +162,7 @@ def edit(community_id):
                 name = curator_names[i].strip() if i < len(curator_names) else ""
                 orcid = curator_orcids[i].strip() if i < len(curator_orcids) else ""
 
-                profile = None
-                if orcid:
-                    profile = UserProfile.query.filter_by(orcid=orcid).first()
-                if not profile and name:
-                    name_query = f"%{name}%"
-                    try:
-                        from sqlalchemy import func
-
-                        concat_field = func.concat(UserProfile.name, " ", UserProfile.surname)
-                        profile = UserProfile.query.filter(
-                            (UserProfile.name.ilike(name_query))
-                            | (UserProfile.surname.ilike(name_query))
-                            | (concat_field.ilike(name_query))
-                        ).first()
-                    except Exception:
-                        profile = UserProfile.query.filter(
-                            (UserProfile.name.ilike(name_query)) | (UserProfile.surname.ilike(name_query))
-                        ).first()
+                profile = profile_service.resolve(orcid=orcid, name=name)
 
                 if profile:
                     if not service.is_curator(profile.user_id, community_id):
@@ -241,6 +210,7 @@ def list_curators(community_id):
 @login_required
 def add_curator(community_id):
     service = CommunityService()
+    profile_service = UserProfileService()
 
     if not service.is_curator(current_user.id, community_id):
         abort(403)
@@ -251,7 +221,7 @@ def add_curator(community_id):
     resolved_user_id = None
 
     if orcid:
-        profile = UserProfile.query.filter_by(orcid=orcid).first()
+        profile = profile_service.resolve(orcid=orcid)
         if profile:
             resolved_user_id = profile.user_id
         else:
@@ -264,22 +234,7 @@ def add_curator(community_id):
             flash("Invalid user identifier provided", "warning")
             return redirect(url_for("community.edit", community_id=community_id))
     elif name:
-        profile = None
-        name_query = f"%{name}%"
-        try:
-            from sqlalchemy import func
-
-            concat_field = func.concat(UserProfile.name, " ", UserProfile.surname)
-            profile = UserProfile.query.filter(
-                (UserProfile.name.ilike(name_query))
-                | (UserProfile.surname.ilike(name_query))
-                | (concat_field.ilike(name_query))
-            ).first()
-        except Exception:
-            profile = UserProfile.query.filter(
-                (UserProfile.name.ilike(name_query)) | (UserProfile.surname.ilike(name_query))
-            ).first()
-
+        profile = profile_service.find_by_name(name)
         if profile:
             resolved_user_id = profile.user_id
         else:
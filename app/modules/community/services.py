@@ -1,12 +1,14 @@
 from typing import Optional
 
-from app import db
-from app.modules.community.models import Community, CommunityCurator
+from app import cache, db
+from app.modules.auth.identity_cache import identity_cache
+from app.modules.community.models import Community, CommunityCurator, CommunityDataset
 from app.modules.community.repositories import (
     CommunityCuratorRepository,
     CommunityDatasetRepository,
     CommunityRepository,
 )
+from app.modules.explore.search_backends import refresh_search_index
 from core.services.BaseService import BaseService
 
 
@@ -27,6 +29,7 @@ class CommunityService(BaseService):
 
         # Commit explícito
         db.session.commit()
+        identity_cache.invalidate(creator_id)
 
         return created_community
 
@@ -56,8 +59,15 @@ class CommunityService(BaseService):
         if not community:
             raise ValueError(f"Community with id {community_id} not found")
 
+        dataset_ids = [assignment.dataset_id for assignment in community.community_datasets]
+        curator_ids = [curator.user_id for curator in community.curators]
+
         # BaseService.delete expects an id; pass the community_id (not the object)
-        return self.delete(community_id)
+        deleted = self.delete(community_id)
+        cache.invalidate()
+        identity_cache.invalidate(*curator_ids)
+        refresh_search_index(dataset_ids)
+        return deleted
 
     def get_community_by_name(self, name: str) -> Optional[Community]:
         return self.repository.get_by_name(name)
@@ -80,6 +90,7 @@ class CommunityService(BaseService):
             curator = self.curator_repository.add_curator(community_id, user_id)
             # ensure persistence
             db.session.commit()
+            identity_cache.invalidate(user_id)
             return curator
         except Exception:
             # rollback on error and re-raise so callers can react
@@ -91,9 +102,14 @@ class CommunityService(BaseService):
         if len(curators) <= 1:
             raise ValueError("Cannot remove the last curator from a community")
 
-        return self.curator_repository.remove_curator(community_id, user_id)
+        removed = self.curator_repository.remove_curator(community_id, user_id)
+        identity_cache.invalidate(user_id)
+        return removed
 
     def is_curator(self, user_id: int, community_id: int) -> bool:
+        cached = identity_cache.is_curator(user_id, community_id)
+        if cached is not None:
+            return cached
         return self.curator_repository.is_curator(user_id, community_id)
 
     def assign_dataset_to_community(self, community_id: int, dataset_id: int, curator_id: int):
@@ -111,6 +127,8 @@ class CommunityService(BaseService):
         try:
             assignment = self.dataset_repository.assign_dataset(community_id, dataset_id, curator_id)
             db.session.commit()
+            cache.invalidate()
+            refresh_search_index([dataset_id])
             return assignment
         except Exception:
             db.session.rollback()
@@ -127,6 +145,8 @@ class CommunityService(BaseService):
         try:
             result = self.dataset_repository.unassign_dataset(community_id, dataset_id)
             db.session.commit()
+            cache.invalidate()
+            refresh_search_index([dataset_id])
             return result
         except Exception:
             db.session.rollback()
@@ -139,16 +159,18 @@ class CommunityService(BaseService):
     def get_available_datasets_for_community(self, community_id: int):
         """Get datasets that are not yet assigned to this community"""
         from app.modules.dataset.models import DataSet
+        from app.modules.dataset.repositories import dataset_loader_options
 
-        # Get all dataset IDs already assigned to this community
-        assigned_dataset_ids = [
-            assignment.dataset_id for assignment in self.dataset_repository.get_community_datasets(community_id)
-        ]
+        # Dataset IDs already assigned to this community, as a subquery
+        assigned_dataset_ids = db.select(CommunityDataset.dataset_id).where(
+            CommunityDataset.community_id == community_id
+        )
 
         # Query all datasets not in the assigned list
-        if assigned_dataset_ids:
-            available_datasets = DataSet.query.filter(~DataSet.id.in_(assigned_dataset_ids)).all()
-        else:
-            available_datasets = DataSet.query.all()
+        available_datasets = (
+            DataSet.query.filter(~DataSet.id.in_(assigned_dataset_ids))
+            .options(*dataset_loader_options("summary"))
+            .all()
+        )
 
         return available_datasets
@@ -0,0 +1,100 @@
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.community.models import Community, CommunityCurator
+from app.modules.community.repositories import CommunityCuratorRepository, CommunityRepository
+from app.modules.dataset.models import DSMetaData, DSMetrics, PublicationType
+from core.repositories.BaseRepository import BaseRepository
+
+
+@pytest.fixture
+def statements(test_client):
+    executed = []
+
+    def count(conn, cursor, statement, *args):
+        executed.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    yield executed
+    event.remove(db.engine, "before_cursor_execute", count)
+
+
+@pytest.fixture
+def communities(test_client):
+    repository = CommunityRepository()
+    repository.bulk_create({"name": f"bulk-{i}", "description": "bulk"} for i in range(5))
+    yield repository
+    repository.delete_where(Community.name.like("bulk-%"))
+
+
+def test_bulk_create_inserts_rows_in_one_statement(communities, statements):
+    """Test that bulk_create inserts every row with a single executemany, applying column defaults"""
+    communities.bulk_create(({"name": f"bulk-more-{i}"} for i in range(20)), batch_size=50)
+
+    assert len([statement for statement in statements if statement.startswith("INSERT")]) == 1
+    assert communities.count(Community.name.like("bulk-%")) == 25
+    assert Community.query.filter_by(name="bulk-more-3").one().created_at is not None
+
+
+def test_count_and_exists_take_criteria_and_filters(communities):
+    """Test count() and exists() with SQL criteria and column filters"""
+    assert communities.count(Community.name.like("bulk-%")) == 5
+    assert communities.count(Community.name.like("bulk-%"), description="bulk") == 5
+    assert communities.exists(name="bulk-2")
+    assert not communities.exists(name="bulk-2", description="other")
+
+
+def test_update_where_and_bulk_update_change_rows_in_place(communities, statements):
+    """Test that update_where and bulk_update write with one UPDATE and refresh the loaded instances"""
+    first = Community.query.filter_by(name="bulk-0").one()
+    second = Community.query.filter_by(name="bulk-1").one()
+    statements.clear()
+
+    assert communities.update_where({"description": "renamed"}, Community.name.like("bulk-%")) == 5
+    assert communities.bulk_update([{"id": first.id, "logo": "a.png"}, {"id": second.id, "logo": "b.png"}]) == 2
+
+    assert len([statement for statement in statements if statement.startswith("UPDATE")]) == 2
+    assert (first.description, first.logo, second.logo) == ("renamed", "a.png", "b.png")
+
+
+def test_delete_where_and_remove_curator(communities):
+    """Test delete_where counts, and that removing a curator deletes only that membership"""
+    user = User.query.filter_by(email="test@example.com").first()
+    community = Community.query.filter_by(name="bulk-4").one()
+    curators = CommunityCuratorRepository()
+    curators.bulk_create([{"community_id": community.id, "user_id": user.id}])
+
+    assert curators.is_curator(user.id, community.id)
+    assert curators.remove_curator(community.id, user.id) is True
+    assert not curators.is_curator(user.id, community.id)
+    assert curators.remove_curator(community.id, user.id) is False
+    assert CommunityCurator.query.filter_by(community_id=community.id).count() == 0
+
+    assert communities.delete_where(name="bulk-3") == 1
+    assert not communities.delete_by_column("name", "bulk-3")
+
+
+def test_delete_where_requires_criteria(communities):
+    """Test that delete_where refuses to delete every row, which takes an explicit delete_all"""
+    with pytest.raises(ValueError):
+        communities.delete_where()
+    assert communities.count(Community.name.like("bulk-%")) == 5
+
+    total = CommunityCurator.query.count()
+    assert CommunityCuratorRepository().delete_all() == total
+    assert CommunityCurator.query.count() == 0
+
+
+def test_delete_by_column_keeps_orm_deletes_for_parents(test_client):
+    """Test that deleting the parent of a one-to-many relationship still nulls the foreign key of its children"""
+    metrics = DSMetrics(number_of_models="1", number_of_features="1")
+    metadata = DSMetaData(title="Parent", description="Parent", publication_type=PublicationType.NONE)
+    metadata.ds_metrics = metrics
+    db.session.add(metadata)
+    db.session.commit()
+
+    assert BaseRepository(DSMetrics).delete_by_column("id", metrics.id)
+    db.session.expire_all()
+    assert db.session.get(DSMetaData, metadata.id).ds_metrics_id is None
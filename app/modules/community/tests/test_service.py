@@ -11,6 +11,8 @@ class DummyCommunity:
         self.name = name
         self.description = description
         self.logo = logo
+        self.community_datasets = []
+        self.curators = []
 
 
 class DummyCurator:
@@ -1,4 +1,8 @@
+from flask import request
+from flask_restful import Resource
+
 from app.modules.dataset.models import DataSet
+from app.modules.dataset.services import CocheService, DataSetService
 from core.resources.generic_resource import create_resource
 from core.serialisers.serializer import Serializer
 
@@ -13,12 +17,172 @@ dataset_fields = {
     "files": "files",
 }
 
-dataset_serializer = Serializer(dataset_fields, related_serializers={"files": file_serializer})
+dataset_serializer = Serializer(
+    dataset_fields,
+    related_serializers={"files": file_serializer},
+    depends_on={"name": ("ds_meta_data",), "doi": ("ds_meta_data",)},
+)
 
 DataSetResource = create_resource(DataSet, dataset_serializer)
 
+CAR_QUERY_PARAMS = CocheService.TEXT_FILTERS + CocheService.INTEGER_FILTERS
+
+
+def get_published_dataset(id):
+    dataset = DataSet.query.get(id)
+    if not dataset or not dataset.ds_meta_data.dataset_doi:
+        return None
+    return dataset
+
+
+class CarListResource(Resource):
+    """
+    Cars of the published datasets (or of one of them), filtered by make, model, fuel,
+    production year and price. Paginated by cursor: pass `next_cursor` back as `cursor`.
+    `fields` restricts the returned columns, e.g. ?fields=marca,modelo,precio_estimado, and
+    ?order=year sorts by production year, which suits the fuel and year filters.
+    """
+
+    def get(self, id=None):
+        if id is not None and get_published_dataset(id) is None:
+            return {"message": "DataSet not found"}, 404
+
+        try:
+            page = CocheService().query_page(
+                dataset_id=id,
+                fields=request.args.get("fields"),
+                cursor=request.args.get("cursor"),
+                page_size=request.args.get("page_size"),
+                order=request.args.get("order"),
+                **{name: request.args.get(name) for name in CAR_QUERY_PARAMS},
+            )
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+        return page, 200
+
+
+class CarMatriculaResource(Resource):
+    """Every published dataset, and its car row, where a matrícula appears"""
+
+    def get(self, matricula):
+        try:
+            return CocheService().find_by_matricula(matricula), 200
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
+
+class CarAggregateResource(Resource):
+    """
+    Count, average price, average consumption and weight distribution of the cars of the
+    published datasets (or of one of them), per ?group_by=marca|combustible|pais_de_origen|decade.
+    """
+
+    def get(self, id=None):
+        dataset = get_published_dataset(id) if id is not None else None
+        if id is not None and dataset is None:
+            return {"message": "DataSet not found"}, 404
+
+        try:
+            return CocheService().aggregates(request.args.get("group_by"), dataset=dataset), 200
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
+
+class CarDistributionResource(Resource):
+    """
+    Quantiles and histograms of the numeric car columns of a published dataset,
+    restricted with ?columns=peso,consumo and ?quantiles=0.5,0.9.
+    """
+
+    def get(self, id):
+        dataset = get_published_dataset(id)
+        if dataset is None:
+            return {"message": "DataSet not found"}, 404
+
+        service = CocheService()
+        try:
+            columns, quantiles = service.parse_distribution_params(
+                request.args.get("columns"), request.args.get("quantiles")
+            )
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+        return service.distributions(dataset, columns, quantiles), 200
+
+
+class DataSetDiffResource(Resource):
+    """
+    Cars added, removed and changed in a published dataset since its parent version, or
+    since ?against=<dataset id>. ?limit= caps the rows detailed of each kind.
+    """
+
+    def get(self, id):
+        dataset = get_published_dataset(id)
+        if dataset is None:
+            return {"message": "DataSet not found"}, 404
+
+        against = request.args.get("against")
+        if against in (None, ""):
+            if dataset.parent_id is None:
+                return {"message": "DataSet has no previous version; pass ?against=<dataset id>"}, 400
+            against = dataset.parent_id
+        try:
+            against = int(against)
+        except ValueError:
+            return {"message": "against must be a dataset id"}, 400
+        try:
+            limit = CocheService.get_diff_limit(request.args.get("limit"))
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
+        other = get_published_dataset(against)
+        if other is None:
+            return {"message": "DataSet to compare against not found"}, 404
+
+        return CocheService().diff(dataset, other, limit), 200
+
+
+class DataSetBatchResource(Resource):
+    """
+    Many datasets in one request: POST {"ids": [...], "dois": [...]}, at most MAX_BATCH_SIZE
+    of them in all. Old DOIs are resolved to their current ones. Items come in request
+    order, ids first, with "dataset": null where nothing matched; ?fields= restricts the
+    dataset fields as in /api/v1/datasets/. Lookups here record no dataset views.
+    """
+
+    def post(self):
+        body = request.get_json(silent=True) or {}
+        service = DataSetService()
+        try:
+            fields = dataset_serializer.parse_fields(request.args.get("fields"))
+            ids, dois = service.parse_batch_keys(body.get("ids"), body.get("dois"))
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
+        by_id, by_doi = service.get_batch(ids, dois, dataset_serializer.loader_options(DataSet, fields))
+
+        def serialized(dataset):
+            return dataset_serializer.serialize(dataset, fields) if dataset is not None else None
+
+        items = [{"id": id, "dataset": serialized(by_id.get(id))} for id in ids]
+        for doi in dois:
+            current_doi, dataset = by_doi.get(doi, (None, None))
+            items.append({"doi": doi, "current_doi": current_doi, "dataset": serialized(dataset)})
+        return {"items": items}, 200
+
 
 def init_blueprint_api(api):
     """Function to register resources with the provided Flask-RESTful Api instance."""
     api.add_resource(DataSetResource, "/api/v1/datasets/", endpoint="datasets")
     api.add_resource(DataSetResource, "/api/v1/datasets/<int:id>", endpoint="dataset")
+    api.add_resource(DataSetBatchResource, "/api/v1/datasets/batch", endpoint="datasets_batch")
+    api.add_resource(CarListResource, "/api/v1/cars", endpoint="cars")
+    api.add_resource(CarListResource, "/api/v1/datasets/<int:id>/cars", endpoint="dataset_cars")
+    api.add_resource(CarMatriculaResource, "/api/v1/cars/matricula/<string:matricula>", endpoint="car_matricula")
+    api.add_resource(CarAggregateResource, "/api/v1/cars/aggregates", endpoint="cars_aggregates")
+    api.add_resource(
+        CarAggregateResource, "/api/v1/datasets/<int:id>/cars/aggregates", endpoint="dataset_cars_aggregates"
+    )
+    api.add_resource(
+        CarDistributionResource, "/api/v1/datasets/<int:id>/cars/distributions", endpoint="dataset_cars_distributions"
+    )
+    api.add_resource(DataSetDiffResource, "/api/v1/datasets/<int:id>/diff", endpoint="dataset_diff")
@@ -1,10 +1,16 @@
+import hashlib
 from datetime import datetime
 from enum import Enum
 
 from flask import request
 from sqlalchemy import Enum as SQLAlchemyEnum
+from sqlalchemy import event, false, inspect, select
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, object_session
 
 from app import db
+from app.modules.dataset.payloads import AuthorPayload, DataSetPayload, payload_to_dict
+from core.caching.value_dictionary import ValueDictionary
 
 
 class PublicationType(Enum):
@@ -28,35 +34,254 @@ class Author(db.Model):
     ds_meta_data_id = db.Column(db.Integer, db.ForeignKey("ds_meta_data.id"))
     fm_meta_data_id = db.Column(db.Integer, nullable=True)  # Legacy - FK removed
 
+    def to_payload(self) -> AuthorPayload:
+        return AuthorPayload(name=self.name, affiliation=self.affiliation, orcid=self.orcid)
+
     def to_dict(self):
-        return {"name": self.name, "affiliation": self.affiliation, "orcid": self.orcid}
+        return payload_to_dict(self.to_payload())
+
+
+class CarValueMixin:
+    """Dictionary table of a low-cardinality Coche column: each distinct string stored once"""
+
+    id = db.Column(db.Integer, primary_key=True)
+    value = db.Column(db.String(120), nullable=False, unique=True)
+
+    def __repr__(self):
+        return f"{type(self).__name__}<{self.id} {self.value}>"
+
+
+class CocheMarca(CarValueMixin, db.Model):
+    __tablename__ = "coche_marca"
+
+
+class CocheMotor(CarValueMixin, db.Model):
+    __tablename__ = "coche_motor"
+
+
+class CocheCombustible(CarValueMixin, db.Model):
+    __tablename__ = "coche_combustible"
+
+
+class CochePaisDeOrigen(CarValueMixin, db.Model):
+    __tablename__ = "coche_pais_de_origen"
+
+
+# Dictionary-encoded Coche columns: the string lives in the dictionary table and each
+# car row only holds its <column>_id
+CAR_DICTIONARIES = {
+    "marca": ValueDictionary("marca", CocheMarca),
+    "motor": ValueDictionary("motor", CocheMotor),
+    "combustible": ValueDictionary("combustible", CocheCombustible),
+    "pais_de_origen": ValueDictionary("pais_de_origen", CochePaisDeOrigen),
+}
+
+
+def dictionary_encoded(name: str) -> hybrid_property:
+    """
+    String attribute backed by the <name>_id column. Strings assigned to new cars are
+    encoded in bulk when the session flushes (see encode_car_values); in SQL the attribute
+    is a subquery on the dictionary table, while hot queries use the ids directly.
+    """
+    dictionary = CAR_DICTIONARIES[name]
+
+    def fget(self):
+        pending = self.__dict__.get("_pending_values", {})
+        if name in pending:
+            return pending[name]
+        return dictionary.decode(getattr(self, f"{name}_id"))
+
+    def fset(self, value):
+        state = inspect(self)
+        if state.persistent:
+            session = object_session(self)
+            setattr(self, f"{name}_id", dictionary.resolve([value], session)[value])
+        else:
+            self.__dict__.setdefault("_pending_values", {})[name] = value
+
+    def expr(cls):
+        model = dictionary.model
+        return select(model.value).where(model.id == getattr(cls, f"{name}_id")).scalar_subquery()
+
+    fget.__name__ = name
+    return hybrid_property(fget, fset, expr=expr)
+
+
+# Columns a car row is identified by in version diffs, in hashing order
+CAR_HASHED_FIELDS = (
+    "modelo",
+    "marca",
+    "motor",
+    "consumo",
+    "combustible",
+    "comienzo_de_produccion",
+    "fin_de_produccion",
+    "asientos",
+    "puertas",
+    "peso",
+    "carga_max",
+    "pais_de_origen",
+    "precio_estimado",
+    "matricula",
+    "fecha_matriculacion",
+)
+
+
+def hashed_value(value) -> str:
+    # Floats to 6 significant digits, which a single-precision FLOAT column round-trips
+    if value is None:
+        return ""
+    return format(value, ".6g") if isinstance(value, float) else str(value)
+
+
+def car_content_hash(values) -> int:
+    encoded = "\x1f".join(hashed_value(value) for value in values).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big", signed=True)
 
 
 class Coche(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=False)
     modelo = db.Column(db.String(120), nullable=False)
-    marca = db.Column(db.String(120), nullable=False)
-    motor = db.Column(db.String(120), nullable=False)
+    marca_id = db.Column(db.Integer, db.ForeignKey("coche_marca.id"), nullable=False)
+    motor_id = db.Column(db.Integer, db.ForeignKey("coche_motor.id"), nullable=False)
     consumo = db.Column(db.Float, nullable=False)
-    combustible = db.Column(db.String(120), nullable=False)
+    combustible_id = db.Column(db.Integer, db.ForeignKey("coche_combustible.id"), nullable=False)
     comienzo_de_produccion = db.Column(db.Integer, nullable=False)
     fin_de_produccion = db.Column(db.Integer, nullable=True)
     asientos = db.Column(db.Integer, nullable=False)
     puertas = db.Column(db.Integer, nullable=False)
     peso = db.Column(db.Integer, nullable=False)
     carga_max = db.Column(db.Integer, nullable=False)
-    pais_de_origen = db.Column(db.String(120), nullable=False)
+    pais_de_origen_id = db.Column(db.Integer, db.ForeignKey("coche_pais_de_origen.id"), nullable=False)
     precio_estimado = db.Column(db.Integer, nullable=False)
     matricula = db.Column(db.String(7), nullable=False)
     fecha_matriculacion = db.Column(db.DateTime, nullable=False)
+    # Set at ingest on the rows whose matrícula already appeared earlier in the dataset
+    matricula_duplicada = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
+    # Hash of the row content (see content_hash), so versions are diffed without reparsing files
+    row_hash = db.Column(db.BigInteger, nullable=True)
+
+    marca = dictionary_encoded("marca")
+    motor = dictionary_encoded("motor")
+    combustible = dictionary_encoded("combustible")
+    pais_de_origen = dictionary_encoded("pais_de_origen")
 
     # Relationship to DataSet
     dataset = db.relationship("DataSet", backref=db.backref("coches", passive_deletes=True))
 
+    # Serve the row-level car API: cars of a dataset by make/model, and cars by fuel and year
+    __table_args__ = (
+        db.Index("ix_coche_dataset_marca_modelo", "dataset_id", "marca_id", "modelo"),
+        db.Index("ix_coche_combustible_comienzo", "combustible_id", "comienzo_de_produccion"),
+        # Cross-dataset vehicle lookup: every dataset holding a plate is one probe of this index
+        db.Index("ix_coche_matricula_dataset", "matricula", "dataset_id"),
+        # Version diffs probe the rows of one dataset by hash
+        db.Index("ix_coche_dataset_row_hash", "dataset_id", "row_hash"),
+    )
+
     def __repr__(self):
         return f"Coche<{self.modelo} {self.marca} {self.matricula}>"
 
+    def content_hash(self) -> int:
+        """Signed 64-bit BLAKE2b of the content columns (not of the id, dataset or flags)"""
+        return car_content_hash([getattr(self, field) for field in CAR_HASHED_FIELDS])
+
+
+@event.listens_for(Session, "before_flush")
+def encode_car_values(session, flush_context, instances):
+    """
+    Hash the content of the new cars, then resolve their strings to dictionary ids, one
+    lookup per column and flush.
+    """
+    cars = [obj for obj in session.new if isinstance(obj, Coche)]
+    for car in cars:
+        if car.row_hash is None:
+            car.row_hash = car.content_hash()
+
+    cars = [car for car in cars if car.__dict__.get("_pending_values")]
+    if not cars:
+        return
+    for name, dictionary in CAR_DICTIONARIES.items():
+        values = {car._pending_values[name] for car in cars if name in car._pending_values}
+        if not values:
+            continue
+        ids = dictionary.resolve(values, session)
+        for car in cars:
+            if name in car._pending_values:
+                setattr(car, f"{name}_id", ids[car._pending_values.pop(name)])
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def forget_rolled_back_values(session, previous_transaction):
+    """Values inserted by a rolled back transaction are gone: drop the cached ids"""
+    for dictionary in session.info.pop("value_dictionaries", ()):
+        dictionary.forget()
+
+
+@event.listens_for(Session, "after_commit")
+def keep_committed_values(session):
+    session.info.pop("value_dictionaries", None)
+
+
+class DSZoneMap(db.Model):
+    """
+    Summary of the cars of a dataset, maintained at ingest time, so that explore can
+    discard the datasets that cannot contain a matching car without reading `coche`.
+
+    Value sets are stored lowercased between pipes ("|seat|audi|") so membership is a LIKE.
+    """
+
+    __tablename__ = "ds_zone_map"
+
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), primary_key=True)
+    car_count = db.Column(db.Integer, nullable=False, default=0)
+    min_year = db.Column(db.Integer, nullable=True)
+    max_year = db.Column(db.Integer, nullable=True)
+    min_price = db.Column(db.Integer, nullable=True)
+    max_price = db.Column(db.Integer, nullable=True)
+    marcas = db.Column(db.Text, nullable=False, default="|")
+    combustibles = db.Column(db.Text, nullable=False, default="|")
+    paises = db.Column(db.Text, nullable=False, default="|")
+    # MinHash (core.sketches.minhash) of the dataset's "marca|modelo|motor" tokens, for content similarity
+    minhash = db.Column(db.LargeBinary, nullable=True)
+
+    dataset = db.relationship(
+        "DataSet", backref=db.backref("zone_map", uselist=False, passive_deletes=True, cascade="all, delete-orphan")
+    )
+
+    @staticmethod
+    def encode_values(values) -> str:
+        return "|" + "".join(f"{value}|" for value in sorted({value.strip().lower() for value in values if value}))
+
+    @staticmethod
+    def decode_values(encoded: str) -> set:
+        return {value for value in (encoded or "").split("|") if value}
+
+    def __repr__(self):
+        return f"DSZoneMap<dataset={self.dataset_id}, cars={self.car_count}>"
+
+
+class DSRecommendation(db.Model):
+    """
+    One of the datasets recommended on the page of a dataset, stored so that page views
+    read them instead of comparing the dataset with every other one.
+    """
+
+    __tablename__ = "ds_recommendation"
+
+    id = db.Column(db.Integer, primary_key=True)
+    dataset_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=False)
+    recommended_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="CASCADE"), nullable=False, index=True)
+    rank = db.Column(db.Integer, nullable=False)
+    # DataSetRecommendationService.get_difference_level of both datasets; lower is more similar
+    difference = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (db.UniqueConstraint("dataset_id", "rank", name="uq_ds_recommendation_rank"),)
+
+    def __repr__(self):
+        return f"DSRecommendation<{self.dataset_id} -> {self.recommended_id} #{self.rank}>"
+
 
 class DSMetrics(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -97,9 +322,17 @@ class DataSet(db.Model):
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     version = db.Column(db.Integer, nullable=False, default=1)
+    # Version lineage: the dataset this one is a new version of
+    parent_id = db.Column(db.Integer, db.ForeignKey("data_set.id", ondelete="SET NULL"), nullable=True)
     DataSetType = db.Column(db.String(50))
 
     ds_meta_data = db.relationship("DSMetaData", backref=db.backref("data_set", uselist=False))
+    parent = db.relationship(
+        "DataSet",
+        remote_side=[id],
+        foreign_keys=[parent_id],
+        backref=db.backref("child_versions", passive_deletes=True),
+    )
 
     # Relación directa con archivos (reemplaza feature_models)
     files = db.relationship("Hubfile", backref="dataset", lazy=True, cascade="all, delete")
@@ -109,6 +342,9 @@ class DataSet(db.Model):
         "polymorphic_on": DataSetType,
     }
 
+    # Keyset pagination in explore walks datasets in (created_at, id) order
+    __table_args__ = (db.Index("ix_data_set_created_at_id", "created_at", "id"),)
+
     # ELIMINAR ESTE MÉTODO - causa duplicación
     # def files(self):
     #     """Return all files associated with this dataset"""
@@ -146,33 +382,36 @@ class DataSet(db.Model):
     def get_file_total_size_for_human(self):
         from app.modules.dataset.services import SizeService
 
-        return SizeService().get_human_readable_size(self.get_file_total_size())
+        return SizeService.get_human_readable_size(self.get_file_total_size())
 
     def get_dataset_url(self):
         from app.modules.dataset.services import DataSetService
 
-        return DataSetService().get_dataset_url(self)
+        return DataSetService.get_dataset_url(self)
+
+    def to_payload(self) -> DataSetPayload:
+        return DataSetPayload(
+            title=self.ds_meta_data.title,
+            id=self.id,
+            created_at=self.created_at,
+            created_at_timestamp=int(self.created_at.timestamp()),
+            description=self.ds_meta_data.description,
+            authors=[author.to_payload() for author in self.ds_meta_data.authors],
+            publication_type=self.get_cleaned_publication_type(),
+            publication_doi=self.ds_meta_data.publication_doi,
+            dataset_doi=self.ds_meta_data.dataset_doi,
+            tags=self.ds_meta_data.tags.split(",") if self.ds_meta_data.tags else [],
+            url=self.get_dataset_url(),
+            download=f'{request.host_url.rstrip("/")}/dataset/download/{self.id}',
+            zenodo=self.get_zenodo_url(),
+            files=[file.to_payload() for file in self.files],
+            files_count=self.get_files_count(),
+            total_size_in_bytes=self.get_file_total_size(),
+            total_size_in_human_format=self.get_file_total_size_for_human(),
+        )
 
     def to_dict(self):
-        return {
-            "title": self.ds_meta_data.title,
-            "id": self.id,
-            "created_at": self.created_at,
-            "created_at_timestamp": int(self.created_at.timestamp()),
-            "description": self.ds_meta_data.description,
-            "authors": [author.to_dict() for author in self.ds_meta_data.authors],
-            "publication_type": self.get_cleaned_publication_type(),
-            "publication_doi": self.ds_meta_data.publication_doi,
-            "dataset_doi": self.ds_meta_data.dataset_doi,
-            "tags": self.ds_meta_data.tags.split(",") if self.ds_meta_data.tags else [],
-            "url": self.get_dataset_url(),
-            "download": f'{request.host_url.rstrip("/")}/dataset/download/{self.id}',
-            "zenodo": self.get_zenodo_url(),
-            "files": [file.to_dict() for file in self.files],
-            "files_count": self.get_files_count(),
-            "total_size_in_bytes": self.get_file_total_size(),
-            "total_size_in_human_format": self.get_file_total_size_for_human(),
-        }
+        return payload_to_dict(self.to_payload())
 
     def __repr__(self):
         return f"DataSet<{self.id}>"
@@ -0,0 +1,46 @@
+from datetime import datetime
+from typing import List, Optional
+
+import msgspec
+
+
+class AuthorPayload(msgspec.Struct):
+    name: str
+    affiliation: Optional[str]
+    orcid: Optional[str]
+
+
+class FilePayload(msgspec.Struct):
+    id: int
+    name: str
+    checksum: str
+    size_in_bytes: int
+    size_in_human_format: str
+    url: str
+
+
+class DataSetPayload(msgspec.Struct):
+    """A dataset as listed by explore: its metadata, authors and files"""
+
+    title: str
+    id: int
+    created_at: datetime
+    created_at_timestamp: int
+    description: str
+    authors: List[AuthorPayload]
+    publication_type: str
+    publication_doi: Optional[str]
+    dataset_doi: Optional[str]
+    tags: List[str]
+    url: str
+    download: str
+    zenodo: Optional[str]
+    files: List[FilePayload]
+    files_count: int
+    total_size_in_bytes: int
+    total_size_in_human_format: str
+
+
+def payload_to_dict(payload: msgspec.Struct) -> dict:
+    """A payload as nested dicts and lists, keeping its datetimes"""
+    return msgspec.to_builtins(payload, builtin_types=(datetime,))
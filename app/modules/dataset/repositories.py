@@ -1,25 +1,371 @@
 import logging
 from datetime import datetime, timezone
-from typing import Optional
+from typing import Optional, Sequence
 
 from flask_login import current_user
-from sqlalchemy import desc, func
+from sqlalchemy import case, desc, func, insert, literal, or_, orm, select, tuple_
 
-from app.modules.dataset.models import Author, DataSet, DOIMapping, DSDownloadRecord, DSMetaData, DSViewRecord
+from app.modules.dataset.models import (
+    CAR_DICTIONARIES,
+    Author,
+    Coche,
+    DataSet,
+    DOIMapping,
+    DSDownloadRecord,
+    DSMetaData,
+    DSRecommendation,
+    DSViewRecord,
+    DSZoneMap,
+)
+from core.database.routing import replica_reads
 from core.repositories.BaseRepository import BaseRepository
+from core.sketches.minhash import MinHash
 
 logger = logging.getLogger(__name__)
 
 
+def dataset_loader_options(profile: str = "listing", parent=None) -> list:
+    """
+    Eager-loading options for the named profile, so that rendering a list of
+    datasets runs a fixed number of queries instead of one per dataset and relationship.
+
+    Profiles:
+        summary: metadata and authors (recommendations).
+        listing: metadata, metrics, authors and files (explore, search, homepage, communities).
+
+    Args:
+        profile: Name of the loader profile.
+        parent: Loader of the relationship leading to DataSet, e.g. joinedload(CommunityDataset.dataset).
+            When omitted the options apply to a query over DataSet itself.
+    """
+    from app.modules.hubfile.models import Hubfile  # noqa: F401 - makes sure DataSet.files is mapped
+
+    root = parent if parent is not None else orm
+    meta_data = root.joinedload(DataSet.ds_meta_data)
+
+    if profile == "summary":
+        return [meta_data.selectinload(DSMetaData.authors)]
+    if profile == "listing":
+        return [
+            meta_data.joinedload(DSMetaData.ds_metrics),
+            meta_data.selectinload(DSMetaData.authors),
+            root.selectinload(DataSet.files),
+        ]
+    raise ValueError(f"Unknown loader profile: {profile}")
+
+
 class AuthorRepository(BaseRepository):
     def __init__(self):
         super().__init__(Author)
 
+    def get_names(self) -> list:
+        """Distinct author names, for the name index"""
+        return [name for (name,) in self.session.query(Author.name).distinct()]
+
+
+def car_field(column_key: str) -> str:
+    """API field of a coche column: the dictionary-encoded ones are exposed by name, not id"""
+    name = column_key.removesuffix("_id")
+    return name if name in CAR_DICTIONARIES else column_key
+
+
+# row_hash is bookkeeping of the version diffs, not a field of the car
+CAR_FIELDS = tuple(car_field(column.key) for column in Coche.__table__.columns if column.key != "row_hash")
+
+
+# Keyset orders of the car API and the columns of their positions. "year" walks the
+# (combustible, comienzo_de_produccion) index in order instead of sorting its matches by id.
+CAR_ORDERS = {"id": ("id",), "year": ("comienzo_de_produccion", "id")}
+
+
+def car_columns(fields: Sequence[str]) -> list:
+    """Coche columns of the API `fields`; dictionary-encoded ones are their ids, labelled with the field name"""
+    table = Coche.__table__
+    return [table.c[f"{field}_id"].label(field) if field in CAR_DICTIONARIES else table.c[field] for field in fields]
+
+
+def decode_car_rows(rows: list, fields: Sequence[str]) -> list:
+    """Replace, in place, the dictionary ids of `rows` (dicts) by their strings"""
+    for field in CAR_DICTIONARIES.keys() & set(fields):
+        values = CAR_DICTIONARIES[field].decode_many(row[field] for row in rows)
+        for row in rows:
+            row[field] = values[row[field]]
+    return rows
+
+
+def car_page_statement(
+    fields: Sequence[str] = CAR_FIELDS,
+    dataset_id: Optional[int] = None,
+    dataset_ids=None,
+    marca_ids: Optional[Sequence[int]] = None,
+    modelo: Optional[str] = None,
+    combustible_ids: Optional[Sequence[int]] = None,
+    year_min: Optional[int] = None,
+    year_max: Optional[int] = None,
+    price_min: Optional[int] = None,
+    price_max: Optional[int] = None,
+    order: str = "id",
+    after: Optional[tuple] = None,
+    limit: int = 100,
+):
+    """
+    SELECT of one page of cars in keyset order, projecting only `fields` plus the columns
+    of the keyset position. Equality filters come first so that the composite indexes
+    (dataset_id, marca_id, modelo) and (combustible_id, comienzo_de_produccion) apply.
+
+    Args:
+        dataset_ids: Selectable of the dataset ids cars may belong to, e.g. the published ones.
+        marca_ids, combustible_ids: Dictionary ids the value may have, e.g. its spellings.
+        order: Key of CAR_ORDERS.
+        after: Position of the last car of the previous page, as decoded from its cursor.
+    """
+    table = Coche.__table__
+    order_columns = [table.c[column] for column in CAR_ORDERS[order]]
+    statement = select(*order_columns, *car_columns([field for field in fields if field not in CAR_ORDERS[order]]))
+
+    for column, value in ((table.c.dataset_id, dataset_id), (table.c.modelo, modelo)):
+        if value is not None:
+            statement = statement.where(column == value)
+    for column, ids in ((table.c.marca_id, marca_ids), (table.c.combustible_id, combustible_ids)):
+        if ids is not None:
+            statement = statement.where(column.in_(ids))
+    if dataset_ids is not None:
+        statement = statement.where(table.c.dataset_id.in_(dataset_ids))
+    if year_min is not None:
+        statement = statement.where(table.c.comienzo_de_produccion >= year_min)
+    if year_max is not None:
+        statement = statement.where(table.c.comienzo_de_produccion <= year_max)
+    if price_min is not None:
+        statement = statement.where(table.c.precio_estimado >= price_min)
+    if price_max is not None:
+        statement = statement.where(table.c.precio_estimado <= price_max)
+    if after is not None:
+        if order == "id":
+            statement = statement.where(table.c.id > after[0])
+        else:
+            # A row-value comparison, so the index is entered at the position instead of at the year
+            statement = statement.where(tuple_(table.c.comienzo_de_produccion, table.c.id) > tuple(after))
+
+    return statement.order_by(*order_columns).limit(limit)
+
+
+# Lower edges of the weight bins (kg) of the aggregates; the last bin is open-ended
+WEIGHT_BINS = (0, 1000, 1250, 1500, 1750, 2000, 2500)
+
+# Dictionary-encoded groups are grouped by id, and decoded afterwards
+CAR_GROUPS = {
+    "marca": Coche.marca_id,
+    "combustible": Coche.combustible_id,
+    "pais_de_origen": Coche.pais_de_origen_id,
+    "decade": Coche.comienzo_de_produccion - Coche.comienzo_de_produccion % 10,
+}
+
+
+class CocheRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(Coche)
+
+    @staticmethod
+    def published_dataset_ids():
+        return select(DataSet.id).join(DSMetaData).where(DSMetaData.dataset_doi.isnot(None))
+
+    def filter_page(self, fields: Sequence[str] = CAR_FIELDS, page_size: int = 100, **filters) -> list:
+        """Rows (as dicts) of up to `page_size` cars matching the filters of car_page_statement"""
+        statement = car_page_statement(fields, limit=page_size, **filters)
+        return decode_car_rows([dict(row._mapping) for row in self.session.execute(statement)], fields)
+
+    def find_by_matricula(self, matricula: str) -> list:
+        """
+        Rows (as dicts) of every car with `matricula` in a published dataset, with the title
+        and DOI of the dataset. The plate is looked up in ix_coche_matricula_dataset.
+        """
+        statement = (
+            select(*car_columns(CAR_FIELDS), DSMetaData.title.label("dataset_title"), DSMetaData.dataset_doi)
+            .join(DataSet, DataSet.id == Coche.dataset_id)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .where(Coche.matricula == matricula, DSMetaData.dataset_doi.isnot(None))
+            .order_by(Coche.dataset_id, Coche.id)
+        )
+        return decode_car_rows([dict(row._mapping) for row in self.session.execute(statement)], CAR_FIELDS)
+
+    def copy_rows(self, source_dataset_id: int, target_dataset_id: int) -> int:
+        """Copy the cars of a dataset into another one with a single INSERT ... SELECT; returns the rows copied"""
+        table = Coche.__table__
+        columns = [column for column in table.columns if column.key not in ("id", "dataset_id")]
+        rows = select(literal(target_dataset_id), *columns).where(table.c.dataset_id == source_dataset_id)
+        statement = insert(table).from_select(["dataset_id", *(column.key for column in columns)], rows)
+        return self.session.execute(statement).rowcount
+
+    def rows_missing_from(self, dataset_id: int, other_dataset_id: int) -> list:
+        """
+        (id, matricula) of the cars of `dataset_id` without a counterpart in `other_dataset_id`.
+        Rows are matched one to one by row hash: of a row found n times here and m < n times
+        there, the last n - m copies (by id) are missing.
+
+        The rows whose hash the other side lacks altogether come from an anti-join probing
+        ix_coche_dataset_row_hash, which the database runs without reading the rows
+        themselves. Only the hashes repeated within `dataset_id` are then counted on both sides.
+        """
+        other = Coche.__table__.alias("other")
+        statement = (
+            select(Coche.id, Coche.matricula)
+            .where(Coche.dataset_id == dataset_id)
+            .where(
+                ~select(other.c.id)
+                .where(other.c.dataset_id == other_dataset_id, other.c.row_hash == Coche.row_hash)
+                .exists()
+            )
+        )
+        missing = self.session.execute(statement).all()
+
+        repeated = (
+            select(Coche.row_hash, func.count(Coche.id).label("copies"))
+            .where(Coche.dataset_id == dataset_id, Coche.row_hash.is_not(None))
+            .group_by(Coche.row_hash)
+            .having(func.count(Coche.id) > 1)
+            .subquery()
+        )
+        other_copies = (
+            select(func.count(other.c.id))
+            .where(other.c.dataset_id == other_dataset_id, other.c.row_hash == repeated.c.row_hash)
+            .scalar_subquery()
+        )
+        # Hashes without any copy on the other side are all in `missing` already
+        excess = dict(
+            self.session.execute(
+                select(repeated.c.row_hash, repeated.c.copies - other_copies).where(
+                    other_copies.between(1, repeated.c.copies - 1)
+                )
+            ).all()
+        )
+        if excess:
+            rows = self.session.execute(
+                select(Coche.id, Coche.matricula, Coche.row_hash)
+                .where(Coche.dataset_id == dataset_id, Coche.row_hash.in_(excess))
+                .order_by(Coche.id.desc())
+            ).all()
+            for id, matricula, row_hash in rows:
+                if excess[row_hash]:
+                    excess[row_hash] -= 1
+                    missing.append((id, matricula))
+        return sorted(missing)
+
+    def count_rows(self, dataset_id: int) -> int:
+        return self.session.query(func.count(Coche.id)).filter(Coche.dataset_id == dataset_id).scalar()
+
+    def get_rows(self, ids: Sequence[int], fields: Sequence[str] = CAR_FIELDS) -> dict:
+        """{id: row (as a dict)} of the cars with `ids`"""
+        if not ids:
+            return {}
+        columns = [Coche.__table__.c.id, *car_columns([field for field in fields if field != "id"])]
+        rows = [dict(row._mapping) for row in self.session.execute(select(*columns).where(Coche.id.in_(ids)))]
+        return {row["id"]: row for row in decode_car_rows(rows, fields)}
+
+    def aggregate_rows(self, group_by: str, dataset_id: Optional[int] = None, dataset_ids=None) -> list:
+        """
+        (group, weight bin, count, price sum, consumption sum) of the cars, computed by a single
+        GROUP BY in the database. Grouping by the weight bin too lets one query return both
+        the per-group averages and the weight distribution.
+        """
+        group = CAR_GROUPS[group_by].label("car_group")
+        weight_bin = case(
+            *[(Coche.peso < upper, lower) for lower, upper in zip(WEIGHT_BINS, WEIGHT_BINS[1:])],
+            else_=WEIGHT_BINS[-1],
+        ).label("weight_bin")
+        query = self.session.query(
+            group, weight_bin, func.count(Coche.id), func.sum(Coche.precio_estimado), func.sum(Coche.consumo)
+        )
+        if dataset_id is not None:
+            query = query.filter(Coche.dataset_id == dataset_id)
+        if dataset_ids is not None:
+            query = query.filter(Coche.dataset_id.in_(dataset_ids))
+        rows = query.group_by(group, weight_bin).all()
+
+        if group_by in CAR_DICTIONARIES:
+            values = CAR_DICTIONARIES[group_by].decode_many(row[0] for row in rows)
+            rows = [(values[row[0]], *row[1:]) for row in rows]
+        return rows
+
+
+class DSZoneMapRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSZoneMap)
+
+    def rebuild(self, dataset_id: int) -> DSZoneMap:
+        """Recompute the zone map of a dataset from its cars; the caller commits"""
+        car_count, min_year, max_year, min_price, max_price = (
+            self.session.query(
+                func.count(Coche.id),
+                func.min(Coche.comienzo_de_produccion),
+                func.max(Coche.comienzo_de_produccion),
+                func.min(Coche.precio_estimado),
+                func.max(Coche.precio_estimado),
+            )
+            .filter(Coche.dataset_id == dataset_id)
+            .one()
+        )
+        ids = (
+            self.session.query(Coche.marca_id, Coche.combustible_id, Coche.pais_de_origen_id)
+            .filter(Coche.dataset_id == dataset_id)
+            .distinct()
+            .all()
+        )
+        names = ("marca", "combustible", "pais_de_origen")
+        decoded = [CAR_DICTIONARIES[name].decode_many(row[i] for row in ids) for i, name in enumerate(names)]
+        values = [tuple(decoded[i][id] for i, id in enumerate(row)) for row in ids]
+
+        zone_map = self.session.get(DSZoneMap, dataset_id) or DSZoneMap(dataset_id=dataset_id)
+        zone_map.car_count = car_count
+        zone_map.min_year, zone_map.max_year = min_year, max_year
+        zone_map.min_price, zone_map.max_price = min_price, max_price
+        zone_map.marcas = DSZoneMap.encode_values(marca for marca, _, _ in values)
+        zone_map.combustibles = DSZoneMap.encode_values(combustible for _, combustible, _ in values)
+        zone_map.paises = DSZoneMap.encode_values(pais for _, _, pais in values)
+        zone_map.minhash = self.car_model_signature(dataset_id).to_bytes()
+        self.session.add(zone_map)
+        return zone_map
+
+    def car_model_signature(self, dataset_id: int) -> MinHash:
+        """MinHash of the distinct (marca, modelo, motor) of the cars of a dataset, lowercased"""
+        rows = (
+            self.session.query(Coche.marca_id, Coche.modelo, Coche.motor_id)
+            .filter(Coche.dataset_id == dataset_id)
+            .distinct()
+            .all()
+        )
+        marcas = CAR_DICTIONARIES["marca"].decode_many(row[0] for row in rows)
+        motores = CAR_DICTIONARIES["motor"].decode_many(row[2] for row in rows)
+        return MinHash().update_many(
+            f"{marcas[marca_id]}|{modelo}|{motores[motor_id]}".lower() for marca_id, modelo, motor_id in rows
+        )
+
+    def get_signatures(self):
+        """(dataset id, MinHash) of the synchronized datasets with a car model signature"""
+        rows = (
+            self.session.query(DSZoneMap.dataset_id, DSZoneMap.minhash)
+            .join(DataSet, DataSet.id == DSZoneMap.dataset_id)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .filter(DSMetaData.dataset_doi.isnot(None), DSZoneMap.minhash.isnot(None))
+        )
+        for dataset_id, minhash in rows:
+            yield dataset_id, MinHash.from_bytes(minhash)
+
+    def unsigned_dataset_ids(self) -> list:
+        """Ids of the synchronized datasets without a car model signature, e.g. ingested before signatures"""
+        rows = (
+            self.session.query(DataSet.id)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .outerjoin(DSZoneMap, DSZoneMap.dataset_id == DataSet.id)
+            .filter(DSMetaData.dataset_doi.isnot(None), DSZoneMap.minhash.is_(None))
+        )
+        return [dataset_id for (dataset_id,) in rows]
+
 
 class DSDownloadRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSDownloadRecord)
 
+    @replica_reads()
     def total_dataset_downloads(self) -> int:
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
@@ -37,6 +383,7 @@ class DSViewRecordRepository(BaseRepository):
     def __init__(self):
         super().__init__(DSViewRecord)
 
+    @replica_reads()
     def total_dataset_views(self) -> int:
         max_id = self.model.query.with_entities(func.max(self.model.id)).scalar()
         return max_id if max_id is not None else 0
@@ -65,6 +412,7 @@ class DataSetRepository(BaseRepository):
         return (
             self.model.query.join(DSMetaData)
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.isnot(None))
+            .options(*dataset_loader_options("listing"))
             .order_by(self.model.created_at.desc())
             .all()
         )
@@ -73,6 +421,7 @@ class DataSetRepository(BaseRepository):
         return (
             self.model.query.join(DSMetaData)
             .filter(DataSet.user_id == current_user_id, DSMetaData.dataset_doi.is_(None))
+            .options(*dataset_loader_options("listing"))
             .order_by(self.model.created_at.desc())
             .all()
         )
@@ -84,16 +433,19 @@ class DataSetRepository(BaseRepository):
             .first()
         )
 
+    @replica_reads()
     def count_synchronized_datasets(self):
         return self.model.query.join(DSMetaData).filter(DSMetaData.dataset_doi.isnot(None)).count()
 
     def count_unsynchronized_datasets(self):
         return self.model.query.join(DSMetaData).filter(DSMetaData.dataset_doi.is_(None)).count()
 
+    @replica_reads()
     def latest_synchronized(self):
         return (
             self.model.query.join(DSMetaData)
             .filter(DSMetaData.dataset_doi.isnot(None))
+            .options(*dataset_loader_options("listing"))
             .order_by(desc(self.model.id))
             .limit(5)
             .all()
@@ -101,16 +453,141 @@ class DataSetRepository(BaseRepository):
 
     def get_all_synchronized(self):
         """Get all synchronized datasets"""
-        return self.model.query.join(DSMetaData).filter(DSMetaData.dataset_doi.isnot(None)).all()
+        return (
+            self.model.query.join(DSMetaData)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .options(*dataset_loader_options("summary"))
+            .all()
+        )
+
+    def get_recommendation_features(self):
+        """
+        (id, publication type, features) of every synchronized dataset, read with two queries;
+        the features are its ("tag", tag) and ("author", normalized name) pairs.
+        """
+        authors = {}
+        for dataset_id, name in (
+            self.session.query(DataSet.id, Author.name)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .join(Author, Author.ds_meta_data_id == DSMetaData.id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+        ):
+            authors.setdefault(dataset_id, set()).add(("author", name.lower().strip()))
+
+        rows = (
+            self.session.query(DataSet.id, DSMetaData.publication_type, DSMetaData.tags)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+        )
+        for dataset_id, publication_type, tags in rows:
+            features = {("tag", tag.strip()) for tag in (tags or "").split(",") if tag.strip()}
+            yield dataset_id, publication_type, features | authors.get(dataset_id, set())
+
+    def get_synchronized_by_ids(self, ids) -> list:
+        """Synchronized datasets with `ids`, in the order of `ids`"""
+        if not ids:
+            return []
+        datasets = {
+            dataset.id: dataset
+            for dataset in self.model.query.join(DSMetaData)
+            .filter(DataSet.id.in_(ids), DSMetaData.dataset_doi.isnot(None))
+            .options(*dataset_loader_options("summary"))
+        }
+        return [datasets[id] for id in ids if id in datasets]
+
+    @replica_reads()
+    def get_by_ids_or_dois(self, ids, dois, options=()) -> list:
+        """
+        (dataset, dataset DOI) of the datasets with any of `ids` or any of the dataset `dois`,
+        read with one query; `options` are its eager-loading options.
+        """
+        conditions = []
+        if ids:
+            conditions.append(DataSet.id.in_(ids))
+        if dois:
+            conditions.append(DSMetaData.dataset_doi.in_(dois))
+        if not conditions:
+            return []
+        return (
+            self.session.query(DataSet, DSMetaData.dataset_doi)
+            .join(DSMetaData, DSMetaData.id == DataSet.ds_meta_data_id)
+            .filter(or_(*conditions))
+            .options(*options)
+            .all()
+        )
 
     def get_all(self):
         """Get all datasets regardless of synchronization status"""
         return self.model.query.all()
 
 
+class DSRecommendationRepository(BaseRepository):
+    def __init__(self):
+        super().__init__(DSRecommendation)
+
+    def recommended_ids(self, dataset_id: int) -> list:
+        """Ids of the stored recommendations of a dataset, best first"""
+        return [
+            id
+            for (id,) in self.session.query(DSRecommendation.recommended_id)
+            .filter(DSRecommendation.dataset_id == dataset_id)
+            .order_by(DSRecommendation.rank)
+        ]
+
+    def cutoffs(self) -> dict:
+        """{dataset id: (stored recommendations, difference of the last one)}"""
+        rows = self.session.query(
+            DSRecommendation.dataset_id, func.count(DSRecommendation.id), func.max(DSRecommendation.difference)
+        ).group_by(DSRecommendation.dataset_id)
+        return {dataset_id: (count, difference) for dataset_id, count, difference in rows}
+
+    def recommending(self, recommended_ids) -> set:
+        """Ids of the datasets with any of `recommended_ids` among their stored recommendations"""
+        rows = self.session.query(DSRecommendation.dataset_id).filter(
+            DSRecommendation.recommended_id.in_(list(recommended_ids))
+        )
+        return {dataset_id for (dataset_id,) in rows.distinct()}
+
+    def replace_all(self, recommendations: dict, batch_size: int = 10_000) -> int:
+        """Store {dataset id: [(recommended id, difference), ...]} instead of every stored recommendation"""
+        self.delete_all(commit=False)
+        rows = [
+            {"dataset_id": dataset_id, "recommended_id": recommended_id, "rank": rank, "difference": difference}
+            for dataset_id, nearest in recommendations.items()
+            for rank, (recommended_id, difference) in enumerate(nearest)
+        ]
+        return self.bulk_create(rows, commit=False, batch_size=batch_size)
+
+    def replace(self, dataset_id: int, recommendations: list):
+        """Store the (recommended id, difference) pairs of a dataset, best first, instead of the previous ones"""
+        self.delete_where(dataset_id=dataset_id, commit=False)
+        self.bulk_create(
+            (
+                {"dataset_id": dataset_id, "recommended_id": recommended_id, "rank": rank, "difference": difference}
+                for rank, (recommended_id, difference) in enumerate(recommendations)
+            ),
+            commit=False,
+        )
+
+
 class DOIMappingRepository(BaseRepository):
     def __init__(self):
         super().__init__(DOIMapping)
 
     def get_new_doi(self, old_doi: str) -> str:
         return self.model.query.filter_by(dataset_doi_old=old_doi).first()
+
+    @replica_reads()
+    def get_new_dois(self, old_dois) -> dict:
+        """{old DOI: new DOI} of the mappings of `old_dois`, read with one IN query"""
+        if not old_dois:
+            return {}
+        rows = (
+            self.session.query(DOIMapping.dataset_doi_old, DOIMapping.dataset_doi_new)
+            .filter(DOIMapping.dataset_doi_old.in_(old_dois))
+            .order_by(DOIMapping.id)
+        )
+        new_dois = {}
+        for old_doi, new_doi in rows:
+            new_dois.setdefault(old_doi, new_doi)
+        return new_dois
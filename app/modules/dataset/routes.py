@@ -24,6 +24,7 @@ from app.modules.dataset.forms import DataSetForm, EditDataSetForm
 from app.modules.dataset.models import DSDownloadRecord
 from app.modules.dataset.services import (
     AuthorService,
+    CocheService,
     DataSetRecommendationService,
     DataSetService,
     DOIMappingService,
@@ -32,6 +33,7 @@ from app.modules.dataset.services import (
     DSViewRecordService,
 )
 from app.modules.zenodo.services import ZenodoService
+from core.database.routing import bookkeeping_writes
 
 logger = logging.getLogger(__name__)
 
@@ -43,6 +45,7 @@ zenodo_service = ZenodoService()
 doi_mapping_service = DOIMappingService()
 ds_view_record_service = DSViewRecordService()
 dataset_recommendation_service = DataSetRecommendationService()
+coche_service = CocheService()
 
 
 @dataset_bp.route("/dataset/upload", methods=["GET", "POST"])
@@ -227,12 +230,13 @@ def download_dataset(dataset_id):
 
     if not existing_record:
         # Record the download in your database
-        DSDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            dataset_id=dataset_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
+        with bookkeeping_writes():
+            DSDownloadRecordService().create(
+                user_id=current_user.id if current_user.is_authenticated else None,
+                dataset_id=dataset_id,
+                download_date=datetime.now(timezone.utc),
+                download_cookie=user_cookie,
+            )
 
     return resp
 
@@ -264,6 +268,7 @@ def subdomain_index(doi):
             "dataset/view_dataset.html",
             dataset=dataset,
             recommended_datasets=recommended_datasets,
+            car_aggregates=coche_service.dataset_aggregates(dataset),
         )
     )
     resp.set_cookie("view_cookie", user_cookie)
@@ -287,6 +292,7 @@ def get_unsynchronized_dataset(dataset_id):
         "dataset/view_dataset.html",
         dataset=dataset,
         recommended_datasets=recommended_datasets,
+        car_aggregates=coche_service.dataset_aggregates(dataset),
     )
 
 
@@ -1,32 +1,64 @@
 import hashlib
+import heapq
 import logging
 import os
+import re
 import shutil
 import uuid
 from typing import Optional
 
 from flask import request
 
-from app.modules.dataset.models import Author, Coche, CSVDataSet, DataSet, DSMetaData, DSMetrics, DSViewRecord
+from app import cache
+from app.modules.dataset.models import (
+    CAR_DICTIONARIES,
+    Author,
+    Coche,
+    CSVDataSet,
+    DataSet,
+    DSMetaData,
+    DSMetrics,
+    DSViewRecord,
+)
 from app.modules.dataset.repositories import (
+    CAR_FIELDS,
+    CAR_GROUPS,
+    CAR_ORDERS,
+    WEIGHT_BINS,
     AuthorRepository,
+    CocheRepository,
     DataSetRepository,
     DOIMappingRepository,
     DSDownloadRecordRepository,
     DSMetaDataRepository,
+    DSRecommendationRepository,
     DSViewRecordRepository,
+    DSZoneMapRepository,
 )
+from app.modules.dataset.sketches import DEFAULT_QUANTILES, SKETCH_COLUMNS, CarColumnSketches
+from app.modules.explore.search_backends import refresh_search_index
 from app.modules.hubfile.models import Hubfile
 from app.modules.hubfile.repositories import (
     HubfileDownloadRecordRepository,
     HubfileRepository,
     HubfileViewRecordRepository,
 )
+from core.database.routing import bookkeeping_writes
+from core.indexes.feature_index import FeatureIndex, ReloadingFeatureIndex, batch_nearest
+from core.indexes.trigram_index import ReloadingTrigramIndex
+from core.serialisers.cursor import decode_cursor, encode_cursor
+from core.serialisers.serializer import convert_value
 from core.services.BaseService import BaseService
+from core.sketches.minhash import MinHash, ReloadingLSHIndex
 
 logger = logging.getLogger(__name__)
 
 
+def normalize_matricula(matricula: str) -> str:
+    """Plate as stored and looked up: upper case, without spaces nor hyphens ("1234-abc" -> "1234ABC")"""
+    return re.sub(r"[\s-]", "", matricula or "").upper()
+
+
 def calculate_checksum_and_size(file_path):
     file_size = os.path.getsize(file_path)
     with open(file_path, "rb") as file:
@@ -35,6 +67,10 @@ def calculate_checksum_and_size(file_path):
         return hash_md5, file_size
 
 
+# Datasets a batch lookup may ask for at once, by id and DOI together
+MAX_BATCH_SIZE = 500
+
+
 class DataSetService(BaseService):
     def __init__(self):
         super().__init__(DataSetRepository())
@@ -45,6 +81,8 @@ class DataSetService(BaseService):
         self.hubfilerepository = HubfileRepository()
         self.dsviewrecord_repostory = DSViewRecordRepository()
         self.hubfileviewrecord_repository = HubfileViewRecordRepository()
+        self.zone_map_repository = DSZoneMapRepository()
+        self.coche_repository = CocheRepository()
 
     # Removed: move_feature_models - replaced by move_files
 
@@ -206,6 +244,7 @@ class DataSetService(BaseService):
 
         # Create hubfiles for uploaded CSV files
         total_coches_created = 0
+        seen_matriculas = set()
         for filename in csv_files:
             file_path = os.path.join(temp_folder, filename)
             file_size = os.path.getsize(file_path)
@@ -222,11 +261,19 @@ class DataSetService(BaseService):
             )
             self.repository.session.add(hubfile)
 
-            # Parse CSV and create Coche models
-            coches_created = self._parse_csv_and_create_coches(file_path, has_header, delimiter, dataset.id)
+            # Parse CSV and create Coche models, sketching the column distributions of the file
+            sketches = CarColumnSketches()
+            coches_created = self._parse_csv_and_create_coches(
+                file_path, has_header, delimiter, dataset.id, sketches=sketches, seen_matriculas=seen_matriculas
+            )
+            hubfile.sketches = sketches.to_bytes()
             total_coches_created += coches_created
 
+        self.zone_map_repository.rebuild(dataset.id)
         self.repository.session.commit()
+        cache.invalidate()
+        refresh_search_index([dataset.id])
+        refresh_recommendations([dataset.id])
         logger.info(f"Dataset created successfully with {num_files} CSV files and {total_coches_created} coches")
         return dataset
 
@@ -244,20 +291,27 @@ class DataSetService(BaseService):
             # Create new metadata for the new version
             dsmetadata = self.dsmetadata_repository.create(**form.get_dsmetadata())
 
-            # Copy authors from original dataset
-            for author in dataset.ds_meta_data.authors:
-                new_author = self.author_repository.create(
-                    commit=False,
-                    ds_meta_data_id=dsmetadata.id,
-                    name=author.name,
-                    affiliation=author.affiliation,
-                    orcid=author.orcid,
-                )
-                dsmetadata.authors.append(new_author)
+            # Copy authors from original dataset, with one INSERT
+            self.author_repository.bulk_create(
+                (
+                    {
+                        "ds_meta_data_id": dsmetadata.id,
+                        "name": author.name,
+                        "affiliation": author.affiliation,
+                        "orcid": author.orcid,
+                    }
+                    for author in dataset.ds_meta_data.authors
+                ),
+                commit=False,
+            )
+            self.dsmetadata_repository.session.expire(dsmetadata, ["authors"])
 
             # Create the new CSV dataset with incremented version
             new_dataset = CSVDataSet(
-                user_id=current_user.id, ds_meta_data_id=dsmetadata.id, version=dataset.version + 1
+                user_id=current_user.id,
+                ds_meta_data_id=dsmetadata.id,
+                version=dataset.version + 1,
+                parent_id=dataset.id,
             )
             if csv_form is not None:
                 new_dataset.has_header = csv_form.has_header.data
@@ -278,13 +332,17 @@ class DataSetService(BaseService):
 
             os.makedirs(new_dataset_dir, exist_ok=True)
 
-            # Copy existing files directly from old dataset
+            temp_folder = current_user.temp_folder()
+            uploaded = set(os.listdir(temp_folder)) if os.path.exists(temp_folder) else set()
+
+            # Copy existing files directly from old dataset; an upload of the same name replaces the file
+            inherited_files = []
             for old_file in dataset.files:
                 # Copy physical file
                 old_file_path = os.path.join(old_dataset_dir, old_file.name)
                 new_file_path = os.path.join(new_dataset_dir, old_file.name)
 
-                if os.path.exists(old_file_path):
+                if old_file.name not in uploaded and os.path.exists(old_file_path):
                     shutil.copy2(old_file_path, new_file_path)
 
                     # Create new file record linked to new dataset
@@ -293,12 +351,39 @@ class DataSetService(BaseService):
                         checksum=old_file.checksum,
                         size=old_file.size,
                         data_set_id=new_dataset.id,
+                        # Same content, so the sketches of the previous version still hold
+                        sketches=old_file.sketches,
                     )
                     self.repository.session.add(new_file)
+                    inherited_files.append(new_file_path)
+
+            seen_matriculas = set()
+            if len(inherited_files) == len(dataset.files):
+                # Every file is inherited: copy their cars without reparsing the files
+                inherited_coches = self.coche_repository.copy_rows(dataset.id, new_dataset.id)
+                seen_matriculas.update(
+                    matricula
+                    for (matricula,) in self.repository.session.query(Coche.matricula)
+                    .filter(Coche.dataset_id == new_dataset.id)
+                    .distinct()
+                )
+            else:
+                # Cars do not record their file: reparse the inherited ones, as they were ingested
+                inherited_coches = sum(
+                    self._parse_csv_and_create_coches(
+                        file_path,
+                        dataset.has_header,
+                        dataset.delimiter,
+                        new_dataset.id,
+                        seen_matriculas=seen_matriculas,
+                    )
+                    for file_path in inherited_files
+                    if file_path.endswith(".csv")
+                )
+            logger.info(f"Inherited {inherited_coches} coches of dataset {dataset.id}")
 
             # Add new uploaded files from temp folder
             total_coches_created = 0
-            temp_folder = current_user.temp_folder()
 
             # Validate CSV files format before processing
             validation_errors = []
@@ -333,17 +418,20 @@ class DataSetService(BaseService):
 
                         # Move the file from temp folder to new dataset directory
                         new_file_destination = os.path.join(new_dataset_dir, filename)
-                        if not os.path.exists(new_file_destination):
-                            shutil.move(file_path, new_file_destination)
-                        else:
-                            # File already exists, just remove from temp
-                            os.remove(file_path)
+                        shutil.move(file_path, new_file_destination)
 
                         # Parse CSV and create Coche models for new files
                         if filename.endswith(".csv"):
+                            sketches = CarColumnSketches()
                             coches_created = self._parse_csv_and_create_coches(
-                                new_file_destination, new_dataset.has_header, new_dataset.delimiter, new_dataset.id
+                                new_file_destination,
+                                new_dataset.has_header,
+                                new_dataset.delimiter,
+                                new_dataset.id,
+                                sketches=sketches,
+                                seen_matriculas=seen_matriculas,
                             )
+                            new_file.sketches = sketches.to_bytes()
                             total_coches_created += coches_created
 
             # Calculate and update metrics with average engine size and consumption
@@ -366,7 +454,11 @@ class DataSetService(BaseService):
                 dsmetadata.ds_metrics.average_engine_size = average_engine_size
                 dsmetadata.ds_metrics.average_consumption = average_consumption
 
+            self.zone_map_repository.rebuild(new_dataset.id)
             self.repository.session.commit()
+            cache.invalidate()
+            refresh_search_index([new_dataset.id])
+            refresh_recommendations([new_dataset.id])
             msg = f"Successfully created new version: {new_dataset.id} with version {new_dataset.version} and {total_coches_created} new coches"  # noqa: E501
             logger.info(msg)
 
@@ -493,78 +585,105 @@ class DataSetService(BaseService):
 
         return None
 
-    def _parse_csv_and_create_coches(self, file_path: str, has_header: bool, delimiter: str, dataset_id: int) -> int:
+    def _read_coches(self, file_path: str, has_header: bool, delimiter: str, dataset_id: int):
         """
-        Parse CSV file and create Coche models for each row.
-        Returns the number of coches created.
+        Yield a Coche (not added to the session) for each row of a CSV file,
+        skipping the rows that cannot be parsed.
         """
         import csv
         from datetime import datetime
 
-        coches_created = 0
-
-        try:
-            with open(file_path, "r", encoding="utf-8") as f:
-                reader = csv.DictReader(f, delimiter=delimiter) if has_header else csv.reader(f, delimiter=delimiter)
+        with open(file_path, "r", encoding="utf-8") as f:
+            reader = csv.DictReader(f, delimiter=delimiter) if has_header else csv.reader(f, delimiter=delimiter)
 
-                for row in reader:
-                    try:
-                        if has_header:
-                            # Map CSV columns to Coche model fields
-                            coche = Coche(
-                                dataset_id=dataset_id,
-                                modelo=row.get("Modelo", "").strip(),
-                                marca=row.get("Marca", "").strip(),
-                                motor=row.get("Motor", "").strip(),
-                                consumo=float(row.get("Consumo", 0)),
-                                combustible=row.get("Combustible", "").strip(),
-                                comienzo_de_produccion=int(row.get("Comienzo de producción", 0)),
-                                fin_de_produccion=(
-                                    int(row.get("Fin de producción", 0))
-                                    if row.get("Fin de producción", "").strip()
-                                    else 9999
-                                ),
-                                asientos=int(row.get("Asientos", 0)),
-                                puertas=int(row.get("Puertas", 0)),
-                                peso=int(row.get("Peso (kg)", 0)),
-                                carga_max=int(row.get("Carga máxima (kg)", 0)),
-                                pais_de_origen=row.get("País de origen", "").strip(),
-                                precio_estimado=int(row.get("Precio estimado (€)", 0)),
-                                matricula=row.get("Matrícula", "").strip(),
-                                fecha_matriculacion=datetime.strptime(
-                                    row.get("Fecha de matriculación", ""), "%d/%m/%Y"
-                                ),
-                            )
-                        else:
-                            # If no header, assume columns are in order
-                            coche = Coche(
-                                dataset_id=dataset_id,
-                                modelo=row[0].strip(),
-                                marca=row[1].strip(),
-                                motor=row[2].strip(),
-                                consumo=float(row[3]),
-                                combustible=row[4].strip(),
-                                comienzo_de_produccion=int(row[5]),
-                                fin_de_produccion=int(row[6]) if row[6].strip() else 9999,
-                                asientos=int(row[7]),
-                                puertas=int(row[8]),
-                                peso=int(row[9]),
-                                carga_max=int(row[10]),
-                                pais_de_origen=row[11].strip(),
-                                precio_estimado=int(row[12]),
-                                matricula=row[13].strip(),
-                                fecha_matriculacion=datetime.strptime(row[14], "%d/%m/%Y"),
-                            )
+            for row in reader:
+                try:
+                    if has_header:
+                        # Map CSV columns to Coche model fields
+                        coche = Coche(
+                            dataset_id=dataset_id,
+                            modelo=row.get("Modelo", "").strip(),
+                            marca=row.get("Marca", "").strip(),
+                            motor=row.get("Motor", "").strip(),
+                            consumo=float(row.get("Consumo", 0)),
+                            combustible=row.get("Combustible", "").strip(),
+                            comienzo_de_produccion=int(row.get("Comienzo de producción", 0)),
+                            fin_de_produccion=(
+                                int(row.get("Fin de producción", 0))
+                                if row.get("Fin de producción", "").strip()
+                                else 9999
+                            ),
+                            asientos=int(row.get("Asientos", 0)),
+                            puertas=int(row.get("Puertas", 0)),
+                            peso=int(row.get("Peso (kg)", 0)),
+                            carga_max=int(row.get("Carga máxima (kg)", 0)),
+                            pais_de_origen=row.get("País de origen", "").strip(),
+                            precio_estimado=int(row.get("Precio estimado (€)", 0)),
+                            matricula=normalize_matricula(row.get("Matrícula", "")),
+                            fecha_matriculacion=datetime.strptime(row.get("Fecha de matriculación", ""), "%d/%m/%Y"),
+                        )
+                    else:
+                        # If no header, assume columns are in order
+                        coche = Coche(
+                            dataset_id=dataset_id,
+                            modelo=row[0].strip(),
+                            marca=row[1].strip(),
+                            motor=row[2].strip(),
+                            consumo=float(row[3]),
+                            combustible=row[4].strip(),
+                            comienzo_de_produccion=int(row[5]),
+                            fin_de_produccion=int(row[6]) if row[6].strip() else 9999,
+                            asientos=int(row[7]),
+                            puertas=int(row[8]),
+                            peso=int(row[9]),
+                            carga_max=int(row[10]),
+                            pais_de_origen=row[11].strip(),
+                            precio_estimado=int(row[12]),
+                            matricula=normalize_matricula(row[13]),
+                            fecha_matriculacion=datetime.strptime(row[14], "%d/%m/%Y"),
+                        )
+                except (ValueError, KeyError, IndexError) as e:
+                    logger.warning(f"Skipping row due to parsing error: {e}")
+                    continue
 
-                        self.repository.session.add(coche)
-                        coches_created += 1
+                yield coche
+
+    def _parse_csv_and_create_coches(
+        self,
+        file_path: str,
+        has_header: bool,
+        delimiter: str,
+        dataset_id: int,
+        sketches=None,
+        seen_matriculas: Optional[set] = None,
+    ) -> int:
+        """
+        Parse CSV file and create Coche models for each row.
+        The rows are also added to `sketches` (CarColumnSketches) when given. A row whose
+        matrícula is in `seen_matriculas` (the plates of the dataset parsed so far, shared
+        across its files) is flagged as matricula_duplicada.
+        Returns the number of coches created.
+        """
+        coches_created = 0
+        duplicates = 0
+        seen_matriculas = set() if seen_matriculas is None else seen_matriculas
 
-                    except (ValueError, KeyError, IndexError) as e:
-                        logger.warning(f"Skipping row due to parsing error: {e}")
-                        continue
+        try:
+            for coche in self._read_coches(file_path, has_header, delimiter, dataset_id):
+                if coche.matricula in seen_matriculas:
+                    coche.matricula_duplicada = True
+                    duplicates += 1
+                else:
+                    seen_matriculas.add(coche.matricula)
+                self.repository.session.add(coche)
+                if sketches is not None:
+                    sketches.update(coche)
+                coches_created += 1
         except Exception as e:
             logger.error(f"Error parsing CSV file {file_path}: {e}")
 
+        if duplicates:
+            logger.warning(f"{duplicates} rows of {file_path} repeat a matrícula already in the dataset")
         return coches_created
 
     def _validate_csv_format(self, file_path: str, has_header: bool, delimiter: str) -> list:
@@ -653,17 +772,392 @@ class DataSetService(BaseService):
         return errors
 
     def update_dsmetadata(self, id, **kwargs):
-        return self.dsmetadata_repository.update(id, **kwargs)
-
-    def get_dataset_url(self, dataset: DataSet) -> str:
+        ds_meta_data = self.dsmetadata_repository.update(id, **kwargs)
+        cache.invalidate()
+        if ds_meta_data is not None and ds_meta_data.data_set is not None:
+            refresh_search_index([ds_meta_data.data_set.id])
+            refresh_recommendations([ds_meta_data.data_set.id])
+        return ds_meta_data
+
+    @staticmethod
+    def get_dataset_url(dataset: DataSet) -> str:
         domain = os.getenv("DOMAIN", "localhost")
         return f"http://{domain}/doi/{dataset.ds_meta_data.dataset_doi}"
 
+    @staticmethod
+    def parse_batch_keys(ids, dois) -> tuple:
+        """(ids, DOIs) of a batch lookup, at most MAX_BATCH_SIZE in all. Raises ValueError if malformed."""
+        ids, dois = ids or [], dois or []
+        if not isinstance(ids, list) or not isinstance(dois, list):
+            raise ValueError("ids and dois must be lists")
+        if not ids and not dois:
+            raise ValueError("Pass the ids and/or dois to look up")
+        if len(ids) + len(dois) > MAX_BATCH_SIZE:
+            raise ValueError(f"At most {MAX_BATCH_SIZE} ids and dois per request")
+        if any(isinstance(id, bool) or not isinstance(id, int) for id in ids):
+            raise ValueError("ids must be integers")
+        if any(not isinstance(doi, str) or not doi.strip() for doi in dois):
+            raise ValueError("dois must be non-empty strings")
+        return ids, [doi.strip() for doi in dois]
+
+    def get_batch(self, ids, dois, options=()) -> tuple:
+        """
+        ({id: dataset}, {DOI: (current DOI, dataset)}) of a batch lookup, without a query per
+        key: old DOIs are resolved to their current ones with DOIMappingService.resolve_dois,
+        then every dataset is read with one query, with the eager-loading `options`.
+        Keys matching no dataset are left out.
+        """
+        current_dois = DOIMappingService().resolve_dois(dois)
+        by_id, by_doi = {}, {}
+        for dataset, dataset_doi in self.repository.get_by_ids_or_dois(ids, set(current_dois.values()), options):
+            by_id[dataset.id] = dataset
+            if dataset_doi is not None:
+                by_doi[dataset_doi] = dataset
+        return (
+            {id: by_id[id] for id in ids if id in by_id},
+            {doi: (current, by_doi[current]) for doi, current in current_dois.items() if current in by_doi},
+        )
+
+
+# Author names only change when datasets are published or edited, which already moves the
+# result cache generation, so the index follows that generation.
+author_name_index = ReloadingTrigramIndex(
+    "author_names", lambda: ((name, name) for name in AuthorRepository().get_names()), scope=None
+)
+
 
 class AuthorService(BaseService):
+    MATCH_THRESHOLD = 0.6
+
     def __init__(self):
         super().__init__(AuthorRepository())
 
+    @classmethod
+    def match_names(cls, query: str) -> Optional[list]:
+        """
+        Author names similar to the query, best first, ignoring case, accents and small typos.
+        Every match is returned, so that filtering by them finds the same datasets as a
+        substring filter would. Returns None outside an application context, where the index
+        cannot be loaded.
+        """
+        matches = author_name_index.search(query, limit=None, threshold=cls.MATCH_THRESHOLD)
+        if matches is None:
+            return None
+        return [name for name, _ in matches]
+
+
+# Cars are never modified once ingested (a new version is a new dataset), so the cached
+# aggregates of a dataset live in a generation scope nothing invalidates.
+CAR_ROWS_SCOPE = "car_rows"
+
+
+def fold_car_aggregates(rows) -> list:
+    """
+    Fold the rows of CocheRepository.aggregate_rows into one entry per group, most
+    populated first, with its averages and its weight distribution.
+    """
+    groups = {}
+    for group, weight_bin, count, price_sum, consumption_sum in rows:
+        entry = groups.setdefault(group, {"count": 0, "price_sum": 0, "consumption_sum": 0, "bins": {}})
+        entry["count"] += count
+        # SUM of integers is a Decimal in MariaDB
+        entry["price_sum"] += float(price_sum or 0)
+        entry["consumption_sum"] += float(consumption_sum or 0)
+        entry["bins"][weight_bin] = entry["bins"].get(weight_bin, 0) + count
+
+    bounds = list(zip(WEIGHT_BINS, WEIGHT_BINS[1:] + (None,)))
+    aggregates = [
+        {
+            "group": group,
+            "count": entry["count"],
+            "average_price": round(entry["price_sum"] / entry["count"], 2),
+            "average_consumption": round(entry["consumption_sum"] / entry["count"], 2),
+            "weight_distribution": [
+                {"min": low, "max": high, "count": entry["bins"].get(low, 0)} for low, high in bounds
+            ],
+        }
+        for group, entry in groups.items()
+    ]
+    return sorted(aggregates, key=lambda aggregate: (-aggregate["count"], str(aggregate["group"])))
+
+
+# Rows of each kind detailed by a version diff (the summary counts all of them)
+DEFAULT_DIFF_LIMIT = 100
+MAX_DIFF_LIMIT = 1000
+
+
+class CocheService(BaseService):
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    TEXT_FILTERS = ("marca", "modelo", "combustible")
+    INTEGER_FILTERS = ("year_min", "year_max", "price_min", "price_max")
+
+    def __init__(self):
+        super().__init__(CocheRepository())
+
+    def get_page_size(self, page_size=None) -> int:
+        try:
+            page_size = int(page_size) if page_size is not None else self.DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            page_size = self.DEFAULT_PAGE_SIZE
+        return max(1, min(page_size, self.MAX_PAGE_SIZE))
+
+    @staticmethod
+    def parse_fields(fields: Optional[str]) -> tuple:
+        """Columns requested as "marca,modelo" (all of them when empty). Raises ValueError on unknown ones."""
+        if not fields:
+            return CAR_FIELDS
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in requested if field not in CAR_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return requested
+
+    def query_page(self, dataset_id=None, fields=None, cursor=None, page_size=None, order=None, **criteria) -> dict:
+        """
+        One page of published cars, optionally of a single dataset, with only the requested
+        columns and the cursor of the next page. Cars come in id order, or by production
+        year with order="year". Raises ValueError on malformed parameters.
+        """
+        order = order or "id"
+        if order not in CAR_ORDERS:
+            raise ValueError(f"Unknown order: {order}")
+        fields = self.parse_fields(fields)
+        page_size = self.get_page_size(page_size)
+
+        filters = {}
+        for name in self.TEXT_FILTERS:
+            value = (criteria.get(name) or "").strip()
+            if value:
+                filters[name] = value
+        for name in self.INTEGER_FILTERS:
+            value = criteria.get(name)
+            if value not in (None, ""):
+                try:
+                    filters[name] = int(value)
+                except (TypeError, ValueError) as exc:
+                    raise ValueError(f"{name} must be an integer") from exc
+
+        # Dictionary-encoded columns are filtered by the ids of every spelling of the value,
+        # so the match ignores case like explore; a value no car has matches nothing
+        for name in CAR_DICTIONARIES.keys() & filters.keys():
+            filters[f"{name}_ids"] = CAR_DICTIONARIES[name].ids_matching(filters.pop(name))
+            if not filters[f"{name}_ids"]:
+                return {"items": [], "next_cursor": None}
+
+        if dataset_id is not None:
+            filters["dataset_id"] = dataset_id
+        else:
+            filters["dataset_ids"] = self.repository.published_dataset_ids()
+
+        rows = self.repository.filter_page(
+            fields,
+            page_size=page_size + 1,
+            order=order,
+            after=decode_cursor(cursor, [int] * len(CAR_ORDERS[order])) if cursor else None,
+            **filters,
+        )
+        next_cursor = None
+        if len(rows) > page_size:
+            rows = rows[:page_size]
+            next_cursor = encode_cursor(*(rows[-1][column] for column in CAR_ORDERS[order]))
+
+        items = [{field: convert_value(row[field]) for field in fields} for row in rows]
+        return {"items": items, "next_cursor": next_cursor}
+
+    def find_by_matricula(self, matricula: str) -> dict:
+        """Every published dataset and car row where a plate appears. Raises ValueError on an empty plate."""
+        matricula = normalize_matricula(matricula)
+        if not matricula:
+            raise ValueError("matricula is required")
+
+        occurrences = [
+            {
+                "dataset": {"id": row["dataset_id"], "title": row["dataset_title"], "doi": row["dataset_doi"]},
+                "car": {field: convert_value(row[field]) for field in CAR_FIELDS},
+            }
+            for row in self.repository.find_by_matricula(matricula)
+        ]
+        return {"matricula": matricula, "occurrences": occurrences}
+
+    def dataset_aggregates(self, dataset: DataSet) -> dict:
+        """The aggregates of a dataset under every grouping, for the charts of its page"""
+        return {group_by: self.aggregates(group_by, dataset)["groups"] for group_by in CAR_GROUPS}
+
+    def aggregates(self, group_by=None, dataset: DataSet = None) -> dict:
+        """
+        Count, average price, average consumption and weight distribution of the cars of a
+        dataset (or of every published dataset) per marca, combustible, pais_de_origen or
+        decade. Raises ValueError on an unknown grouping.
+        """
+        group_by = group_by or "marca"
+        if group_by not in CAR_GROUPS:
+            raise ValueError(f"Unknown group_by: {group_by}")
+
+        if dataset is not None:
+            return cache.get_or_compute(
+                "cars:aggregates",
+                {"dataset": dataset.id, "version": dataset.version, "group_by": group_by},
+                lambda: {
+                    "group_by": group_by,
+                    "groups": fold_car_aggregates(self.repository.aggregate_rows(group_by, dataset_id=dataset.id)),
+                },
+                scope=CAR_ROWS_SCOPE,
+            )
+
+        # The set of published datasets changes with every publication
+        return cache.get_or_compute(
+            "cars:aggregates",
+            {"group_by": group_by},
+            lambda: {
+                "group_by": group_by,
+                "groups": fold_car_aggregates(
+                    self.repository.aggregate_rows(group_by, dataset_ids=self.repository.published_dataset_ids())
+                ),
+            },
+        )
+
+    @staticmethod
+    def get_diff_limit(limit=None) -> int:
+        """Rows of each kind a diff details, at most MAX_DIFF_LIMIT. Raises ValueError if it is not an integer."""
+        if limit in (None, ""):
+            return DEFAULT_DIFF_LIMIT
+        try:
+            return max(1, min(int(limit), MAX_DIFF_LIMIT))
+        except (TypeError, ValueError) as exc:
+            raise ValueError("limit must be an integer") from exc
+
+    def diff(self, dataset: DataSet, other: DataSet, limit: int = DEFAULT_DIFF_LIMIT) -> dict:
+        """
+        Rows added, removed and changed from `other` (usually the parent version) to `dataset`.
+        Rows are compared by row hash in the database; of the rows only one side has, those
+        whose matrícula is on both sides are reported as changed, with the fields that differ.
+        At most `limit` rows of each kind are detailed; the summary counts all of them.
+        """
+
+        def compute():
+            added = self.repository.rows_missing_from(dataset.id, other.id)
+            removed = self.repository.rows_missing_from(other.id, dataset.id)
+
+            # Pair the rows of a plate on both sides in id order
+            removed_by_matricula = {}
+            for id, matricula in removed:
+                removed_by_matricula.setdefault(matricula, []).append(id)
+            changed, added_ids = [], []
+            for id, matricula in added:
+                if removed_by_matricula.get(matricula):
+                    changed.append((removed_by_matricula[matricula].pop(0), id))
+                else:
+                    added_ids.append(id)
+            removed_ids = sorted(id for ids in removed_by_matricula.values() for id in ids)
+
+            shown = {
+                "added": added_ids[:limit],
+                "removed": removed_ids[:limit],
+                "changed": [id for pair in changed[:limit] for id in pair],
+            }
+            rows = self.repository.get_rows([id for ids in shown.values() for id in ids])
+
+            def car(id):
+                return {field: convert_value(rows[id][field]) for field in CAR_FIELDS}
+
+            changed_rows = []
+            for before_id, after_id in changed[:limit]:
+                before, after = car(before_id), car(after_id)
+                fields = [
+                    field for field in CAR_FIELDS if field not in ("id", "dataset_id") and before[field] != after[field]
+                ]
+                changed_rows.append(
+                    {"matricula": after["matricula"], "fields": fields, "before": before, "after": after}
+                )
+
+            return {
+                "dataset": dataset.id,
+                "against": other.id,
+                "summary": {
+                    "added": len(added_ids),
+                    "removed": len(removed_ids),
+                    "changed": len(changed),
+                    "unchanged": self.repository.count_rows(dataset.id) - len(added),
+                },
+                "added": [car(id) for id in shown["added"]],
+                "removed": [car(id) for id in shown["removed"]],
+                "changed": changed_rows,
+                "truncated": max(len(added_ids), len(removed_ids), len(changed)) > limit,
+            }
+
+        # Both datasets are immutable once ingested
+        return cache.get_or_compute(
+            "cars:diff",
+            {"dataset": dataset.id, "against": other.id, "limit": limit},
+            compute,
+            scope=CAR_ROWS_SCOPE,
+        )
+
+    @staticmethod
+    def parse_distribution_params(columns: Optional[str], quantiles: Optional[str]) -> tuple:
+        """Columns and quantiles of a ?columns=a,b&quantiles=0.5,0.9 query; ValueError when invalid"""
+        parsed_columns = tuple(column.strip() for column in columns.split(",") if column.strip()) if columns else ()
+        unknown = [column for column in parsed_columns if column not in SKETCH_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown columns: {', '.join(unknown)}")
+
+        if not quantiles:
+            return parsed_columns or tuple(SKETCH_COLUMNS), DEFAULT_QUANTILES
+        try:
+            parsed_quantiles = tuple(float(q) for q in quantiles.split(","))
+        except ValueError:
+            raise ValueError("quantiles must be numbers between 0 and 1")
+        if not all(0 <= q <= 1 for q in parsed_quantiles):
+            raise ValueError("quantiles must be numbers between 0 and 1")
+        return parsed_columns or tuple(SKETCH_COLUMNS), parsed_quantiles
+
+    def file_sketches(self, dataset: DataSet, hubfile: Hubfile) -> CarColumnSketches:
+        """
+        The stored sketches of a file; files ingested before sketching existed (or with
+        stale bins) are sketched from their CSV once and stored.
+        """
+        sketches = CarColumnSketches.from_bytes(hubfile.sketches)
+        if sketches is not None:
+            return sketches
+
+        from core.configuration.configuration import uploads_folder_name
+
+        sketches = CarColumnSketches()
+        path = os.path.join(uploads_folder_name(), f"user_{dataset.user_id}", f"dataset_{dataset.id}", hubfile.name)
+        has_header = getattr(dataset, "has_header", True)
+        delimiter = getattr(dataset, "delimiter", None) or ","
+        try:
+            for coche in DataSetService()._read_coches(path, has_header, delimiter, dataset.id):
+                sketches.update(coche)
+        except OSError as exc:
+            logger.warning(f"Could not sketch {path}: {exc}")
+            return sketches
+
+        hubfile.sketches = sketches.to_bytes()
+        self.repository.session.commit()
+        return sketches
+
+    def distributions(self, dataset: DataSet, columns=(), quantiles=DEFAULT_QUANTILES) -> dict:
+        """
+        Quantiles and histograms of the numeric car columns of a dataset version, merged
+        from the sketches of its files (no car row is read).
+        """
+        columns = tuple(columns) or tuple(SKETCH_COLUMNS)
+
+        def compute():
+            merged = CarColumnSketches()
+            for hubfile in dataset.files:
+                merged.merge(self.file_sketches(dataset, hubfile))
+            return {"columns": merged.summary(columns, quantiles)}
+
+        return cache.get_or_compute(
+            "cars:distributions",
+            {"dataset": dataset.id, "version": dataset.version, "columns": columns, "quantiles": quantiles},
+            compute,
+            scope=CAR_ROWS_SCOPE,
+        )
+
 
 class DSDownloadRecordService(BaseService):
     def __init__(self):
@@ -675,7 +1169,12 @@ class DSMetaDataService(BaseService):
         super().__init__(DSMetaDataRepository())
 
     def update(self, id, **kwargs):
-        return self.repository.update(id, **kwargs)
+        ds_meta_data = self.repository.update(id, **kwargs)
+        cache.invalidate()
+        if ds_meta_data is not None and ds_meta_data.data_set is not None:
+            refresh_search_index([ds_meta_data.data_set.id])
+            refresh_recommendations([ds_meta_data.data_set.id])
+        return ds_meta_data
 
     def filter_by_doi(self, doi: str) -> Optional[DSMetaData]:
         return self.repository.filter_by_doi(doi)
@@ -700,7 +1199,8 @@ class DSViewRecordService(BaseService):
         existing_record = self.the_record_exists(dataset=dataset, user_cookie=user_cookie)
 
         if not existing_record:
-            self.create_new_record(dataset=dataset, user_cookie=user_cookie)
+            with bookkeeping_writes():
+                self.create_new_record(dataset=dataset, user_cookie=user_cookie)
 
         return user_cookie
 
@@ -716,13 +1216,38 @@ class DOIMappingService(BaseService):
         else:
             return None
 
+    def resolve_dois(self, dois) -> dict:
+        """
+        {DOI: current DOI} of `dois`, following old -> new mappings as the DOI page redirects
+        do, with one IN query per step of the chains (a single one unless DOIs were remapped).
+        """
+        current = {doi: doi for doi in dois}
+        chains = {doi: {doi} for doi in current}
+        mappings, queried = {}, set()
+        pending = set(current)
+        while pending:
+            mappings.update(self.repository.get_new_dois(pending))
+            queried |= pending
+            pending = set()
+            for doi in current:
+                new_doi = mappings.get(current[doi])
+                # A mapping back into its own chain would redirect forever: stop there
+                while new_doi and new_doi not in chains[doi]:
+                    current[doi] = new_doi
+                    chains[doi].add(new_doi)
+                    new_doi = mappings.get(new_doi)
+                if current[doi] not in queried:
+                    pending.add(current[doi])
+        return current
+
 
 class SizeService:
 
     def __init__(self):
         pass
 
-    def get_human_readable_size(self, size: int) -> str:
+    @staticmethod
+    def get_human_readable_size(size: int) -> str:
         if size < 1024:
             return f"{size} bytes"
         elif size < 1024**2:
@@ -733,13 +1258,29 @@ class SizeService:
             return f"{round(size / (1024 ** 3), 2)} GB"
 
 
+# Tags, authors and publication types only change when datasets are published or edited,
+# which already moves the result cache generation, so the index follows that generation.
+recommendation_index = ReloadingFeatureIndex(
+    "recommendations", lambda: DataSetRepository().get_recommendation_features()
+)
+
+# Car model signatures only change when datasets are ingested, and join the index when
+# they are published; both move the result cache generation.
+content_index = ReloadingLSHIndex("car_models", lambda: DSZoneMapRepository().get_signatures())
+
+
 class DataSetRecommendationService:
     """Service for dataset recommendations based on similarity"""
 
     MAX_RECOMMENDATIONS = 3
+    # Datasets whose car models have at least this estimated Jaccard similarity get up to
+    # CONTENT_WEIGHT off their difference: identical fleets count as much as two shared tags
+    CONTENT_THRESHOLD = 0.5
+    CONTENT_WEIGHT = 2.0
 
     def __init__(self):
         self.dataset_repository = DataSetRepository()
+        self.recommendation_repository = DSRecommendationRepository()
 
     def _parse_tags(self, tags_string: str) -> set:
         """
@@ -787,26 +1328,121 @@ class DataSetRecommendationService:
 
         return difference
 
+    def _blend(self, index, content, dataset_id, group, features, signature, nearest) -> list:
+        """
+        Top recommendations from the metadata `nearest` ((id, difference) pairs) and the
+        datasets of similar car models: those the LSH index finds with an estimated Jaccard
+        similarity of at least CONTENT_THRESHOLD get CONTENT_WEIGHT * similarity off their
+        difference. Only those can overtake the metadata nearest, so nothing else is scored.
+        """
+        differences = dict(nearest)
+        if signature is not None:
+            for other, similarity in content.query(signature, self.CONTENT_THRESHOLD, exclude={dataset_id}):
+                if other in index:
+                    differences[other] = (
+                        index.difference_from(group, features, other) - self.CONTENT_WEIGHT * similarity
+                    )
+        best = heapq.nsmallest(self.MAX_RECOMMENDATIONS, ((difference, id) for id, difference in differences.items()))
+        return [(id, difference) for difference, id in best]
+
+    def _nearest_to(self, index, content, dataset_id) -> list:
+        group, features = index.entry(dataset_id)
+        nearest = index.nearest_to(dataset_id, self.MAX_RECOMMENDATIONS)
+        return self._blend(index, content, dataset_id, group, features, content.signature(dataset_id), nearest)
+
     def get_recommended_datasets(self, dataset: DataSet) -> list[DataSet]:
         """
         Get the most similar datasets to the given dataset.
 
+        The stored recommendations are read when there are some; otherwise (unsynchronized
+        datasets, or before the first refresh) they are looked up in the feature and content indexes.
+
         Args:
             dataset: The dataset to find recommendations for
 
         Returns:
             list[DataSet]: Up to 3 most similar datasets, sorted by similarity
         """
-
-        all_datasets = self.dataset_repository.get_all_synchronized()
-
-        current_dataset_id = dataset.id
-        other_datasets = [ds for ds in all_datasets if ds.id != current_dataset_id]
-
-        datasets_with_difference = [(ds, self.get_difference_level(dataset, ds)) for ds in other_datasets]
-
-        datasets_with_difference.sort(key=lambda x: x[1])
-
-        recommended = [ds for ds, _ in datasets_with_difference[: self.MAX_RECOMMENDATIONS]]
-
-        return recommended
+        ids = self.recommendation_repository.recommended_ids(dataset.id)
+        if not ids:
+            index = recommendation_index.current()
+            group = dataset.ds_meta_data.publication_type
+            features = {("tag", tag) for tag in self._parse_tags(dataset.ds_meta_data.tags or "")} | {
+                ("author", author.name.lower().strip()) for author in dataset.ds_meta_data.authors
+            }
+            nearest = index.nearest(group, features, self.MAX_RECOMMENDATIONS, exclude={dataset.id})
+            signature = MinHash.from_bytes(dataset.zone_map.minhash) if dataset.zone_map else None
+            nearest = self._blend(index, content_index.current(), dataset.id, group, features, signature, nearest)
+            ids = [id for id, _ in nearest]
+        return self.dataset_repository.get_synchronized_by_ids(ids)
+
+    def refresh(self, dataset_ids):
+        """
+        Recompute the stored recommendations that changes to `dataset_ids` (publications,
+        metadata edits) can affect: their own, those that list them, and those they now enter.
+        """
+        index = recommendation_index.current()
+        content = content_index.current()
+        changed = set(dataset_ids)
+        stale = changed | self.recommendation_repository.recommending(changed)
+
+        cutoffs = self.recommendation_repository.cutoffs()
+        for dataset_id in changed & index.keys():
+            differences = dict(index.differences_to(dataset_id))
+            signature = content.signature(dataset_id)
+            if signature is not None:
+                for other, similarity in content.query(signature, self.CONTENT_THRESHOLD, exclude={dataset_id}):
+                    if other in differences:
+                        differences[other] -= self.CONTENT_WEIGHT * similarity
+            for other, difference in differences.items():
+                count, cutoff = cutoffs.get(other, (None, None))
+                if count is not None and (count < self.MAX_RECOMMENDATIONS or difference <= cutoff):
+                    stale.add(other)
+
+        for dataset_id in stale:
+            nearest = self._nearest_to(index, content, dataset_id) if dataset_id in index else []
+            self.recommendation_repository.replace(dataset_id, nearest)
+        self.recommendation_repository.session.commit()
+        logger.info(f"Refreshed the recommendations of {len(stale)} datasets")
+
+    def rebuild(self) -> int:
+        """
+        Recompute the stored recommendations of every synchronized dataset at once, signing
+        the car models of the datasets without a signature first; returns the datasets.
+        """
+        zone_maps = DSZoneMapRepository()
+        unsigned = zone_maps.unsigned_dataset_ids()
+        for dataset_id in unsigned:
+            zone_maps.rebuild(dataset_id)
+        if unsigned:
+            zone_maps.session.commit()
+            cache.invalidate()
+            logger.info(f"Signed the car models of {len(unsigned)} datasets")
+
+        entries = list(self.dataset_repository.get_recommendation_features())
+        index = FeatureIndex()
+        for entry in entries:
+            index.add(*entry)
+        content = content_index.current()
+
+        recommendations = batch_nearest(entries, self.MAX_RECOMMENDATIONS)
+        for dataset_id, group, features in entries:
+            signature = content.signature(dataset_id)
+            if signature is not None:
+                recommendations[dataset_id] = self._blend(
+                    index, content, dataset_id, group, features, signature, recommendations[dataset_id]
+                )
+        self.recommendation_repository.replace_all(recommendations)
+        self.recommendation_repository.session.commit()
+        return len(recommendations)
+
+
+def refresh_recommendations(dataset_ids):
+    """Propagate changes of the given datasets to the stored recommendations"""
+    service = DataSetRecommendationService()
+    try:
+        service.refresh(dataset_ids)
+    except Exception as exc:
+        # Stale recommendations are harmless and repaired by the next refresh of the datasets
+        service.recommendation_repository.session.rollback()
+        logger.exception(f"Could not refresh the recommendations of datasets {dataset_ids}: {exc}")
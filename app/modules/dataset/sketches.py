@@ -0,0 +1,84 @@
+from typing import Optional
+
+import msgpack
+
+from core.sketches.histogram import FixedHistogram
+from core.sketches.kll import KLLSketch
+
+# Numeric Coche columns with a sketch, and the lower edges of their histogram bins.
+# fin_de_produccion is left out: 9999 stands for "still produced", not for a year.
+SKETCH_COLUMNS = {
+    "precio_estimado": tuple(range(0, 100_001, 5_000)),
+    "consumo": tuple(range(0, 21)),
+    "peso": tuple(range(0, 3_001, 250)),
+    "carga_max": tuple(range(0, 1_501, 100)),
+    "comienzo_de_produccion": tuple(range(1950, 2031, 5)),
+    "asientos": tuple(range(1, 10)),
+    "puertas": tuple(range(1, 7)),
+}
+
+DEFAULT_QUANTILES = (0.01, 0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95, 0.99)
+
+
+class CarColumnSketches:
+    """
+    A KLL quantile sketch and a fixed-bin histogram per numeric Coche column, built while
+    a file is ingested and stored (msgpack) in Hubfile.sketches. The sketches of the files
+    of a dataset version merge into the distributions of the whole version.
+    """
+
+    def __init__(self):
+        self.quantiles = {column: KLLSketch() for column in SKETCH_COLUMNS}
+        self.histograms = {column: FixedHistogram(edges) for column, edges in SKETCH_COLUMNS.items()}
+
+    def update(self, coche):
+        for column in SKETCH_COLUMNS:
+            value = getattr(coche, column)
+            if value is not None:
+                self.quantiles[column].update(value)
+                self.histograms[column].update(value)
+
+    def merge(self, other: "CarColumnSketches") -> "CarColumnSketches":
+        for column in SKETCH_COLUMNS:
+            self.quantiles[column].merge(other.quantiles[column])
+            self.histograms[column].merge(other.histograms[column])
+        return self
+
+    def to_bytes(self) -> bytes:
+        return msgpack.packb(
+            {
+                column: {"kll": self.quantiles[column].to_dict(), "histogram": self.histograms[column].counts}
+                for column in SKETCH_COLUMNS
+            }
+        )
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> Optional["CarColumnSketches"]:
+        """The stored sketches, or None when missing or built for other columns or bins"""
+        if not data:
+            return None
+        stored = msgpack.unpackb(data)
+        if set(stored) != set(SKETCH_COLUMNS) or any(
+            len(stored[column]["histogram"]) != len(edges) for column, edges in SKETCH_COLUMNS.items()
+        ):
+            return None
+
+        sketches = cls()
+        for column, edges in SKETCH_COLUMNS.items():
+            sketches.quantiles[column] = KLLSketch.from_dict(stored[column]["kll"])
+            sketches.histograms[column] = FixedHistogram(edges, stored[column]["histogram"])
+        return sketches
+
+    def summary(self, columns=None, quantiles=DEFAULT_QUANTILES) -> dict:
+        """Count, extremes, quantiles and histogram of each column"""
+        summary = {}
+        for column in columns or SKETCH_COLUMNS:
+            sketch = self.quantiles[column]
+            summary[column] = {
+                "count": sketch.count,
+                "min": sketch.min,
+                "max": sketch.max,
+                "quantiles": {str(q): value for q, value in zip(quantiles, sketch.quantiles(quantiles))},
+                "histogram": self.histograms[column].bins(),
+            }
+        return summary
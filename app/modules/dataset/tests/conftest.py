@@ -0,0 +1,86 @@
+"""Helpers shared by the dataset tests"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+from app import db
+from app.modules.dataset.models import Coche, CSVDataSet, DSMetaData, PublicationType
+from app.modules.dataset.services import DataSetService
+
+CSV_HEADER = (
+    "Modelo,Marca,Motor,Consumo,Combustible,Comienzo de producción,Fin de producción,Asientos,Puertas,"
+    "Peso (kg),Carga máxima (kg),País de origen,Precio estimado (€),Matrícula,Fecha de matriculación"
+)
+
+
+def csv_text(*rows) -> str:
+    return "\n".join([CSV_HEADER, *rows])
+
+
+def create_car(dataset_id, **fields):
+    """A 2015 Seat Ibiza of `dataset_id`, with `fields` overriding any of its columns"""
+    car = {
+        "modelo": "Ibiza",
+        "marca": "Seat",
+        "motor": "1.6",
+        "consumo": 5.5,
+        "combustible": "Gasolina",
+        "comienzo_de_produccion": 2015,
+        "asientos": 5,
+        "puertas": 5,
+        "peso": 1200,
+        "carga_max": 400,
+        "pais_de_origen": "España",
+        "precio_estimado": 10_000,
+        "matricula": "1234ABC",
+        "fecha_matriculacion": datetime(2020, 1, 1),
+    }
+    return Coche(dataset_id=dataset_id, **{**car, **fields})
+
+
+def car_model(marca, modelo, combustible, year, price) -> dict:
+    """Fields of a car of that make, model, fuel, production year and price, for create_car"""
+    return {
+        "marca": marca,
+        "modelo": modelo,
+        "combustible": combustible,
+        "comienzo_de_produccion": year,
+        "precio_estimado": price,
+    }
+
+
+def create_dataset(user_id, title, doi, cars=(), parent=None):
+    """CSV dataset (published when it has a `doi`) with a car per entry of `cars`, a dict of its fields"""
+    metadata = DSMetaData(title=title, description=title, publication_type=PublicationType.NONE, dataset_doi=doi)
+    db.session.add(metadata)
+    db.session.flush()
+    dataset = CSVDataSet(
+        user_id=user_id,
+        ds_meta_data_id=metadata.id,
+        version=parent.version + 1 if parent else 1,
+        parent_id=parent.id if parent else None,
+    )
+    db.session.add(dataset)
+    db.session.flush()
+    for car in cars:
+        db.session.add(create_car(dataset.id, **car))
+    db.session.commit()
+    return dataset
+
+
+def create_version(tmp_path, dataset, user_id, uploads=None, doi=None):
+    """New version of `dataset` with the `uploads` ({name: CSV text}) in the temp folder of the user"""
+    temp_folder = tmp_path / "temp"
+    temp_folder.mkdir()
+    for name, text in (uploads or {}).items():
+        (temp_folder / name).write_text(text, encoding="utf-8")
+    form = SimpleNamespace(
+        get_dsmetadata=lambda: {
+            "title": f"{dataset.name()} v2",
+            "description": "v2",
+            "publication_type": "NONE",
+            "dataset_doi": doi,
+        }
+    )
+    current_user = SimpleNamespace(id=user_id, temp_folder=lambda: str(temp_folder))
+    return DataSetService().create_new_version(dataset, form, current_user)
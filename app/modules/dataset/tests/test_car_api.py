@@ -0,0 +1,270 @@
+"""Tests for the row-level and aggregate car API"""
+
+import msgpack
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import Coche
+from app.modules.dataset.services import CocheService, DataSetService, fold_car_aggregates
+from app.modules.dataset.tests.conftest import car_model, create_dataset, csv_text
+from core.caching.result_cache import LRUMemoryCache
+
+
+@pytest.fixture(scope="module")
+def car_datasets(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    published = create_dataset(
+        user.id,
+        "Published cars",
+        "10.1234/published.cars",
+        [
+            car_model("Seat", "Ibiza", "Gasolina", 2012, 9000),
+            car_model("Seat", "Leon", "Diésel", 2016, 14000),
+            car_model("Toyota", "Prius", "Híbrido", 2019, 21000),
+            car_model("Seat", "Ibiza", "Gasolina", 2020, 16000),
+        ],
+    )
+    other = create_dataset(
+        user.id, "Other cars", "10.1234/other.cars", [car_model("Seat", "Ibiza", "Diésel", 2018, 12000)]
+    )
+    draft = create_dataset(user.id, "Draft cars", None, [car_model("Seat", "Ibiza", "Gasolina", 2015, 10000)])
+    return {"published": published, "other": other, "draft": draft}
+
+
+def test_dataset_cars_are_filtered_and_projected(test_client, car_datasets):
+    """Test that the cars of a dataset are filtered and only the requested fields are returned"""
+    dataset_id = car_datasets["published"].id
+
+    rv = test_client.get(f"/api/v1/datasets/{dataset_id}/cars?marca=Seat&modelo=Ibiza&fields=modelo,precio_estimado")
+
+    assert rv.status_code == 200
+    assert rv.get_json()["items"] == [
+        {"modelo": "Ibiza", "precio_estimado": 9000},
+        {"modelo": "Ibiza", "precio_estimado": 16000},
+    ]
+
+
+def test_dataset_cars_match_makes_and_fuels_ignoring_case(test_client, car_datasets):
+    """Test that the marca and combustible filters ignore case, like explore, and unknown values match nothing"""
+    url = f"/api/v1/datasets/{car_datasets['published'].id}/cars?fields=modelo"
+
+    assert rv_json(test_client, f"{url}&marca=SEAT&combustible=diésel")["items"] == [{"modelo": "Leon"}]
+    assert rv_json(test_client, f"{url}&marca=toyota")["items"] == [{"modelo": "Prius"}]
+    assert rv_json(test_client, f"{url}&marca=Lada")["items"] == []
+
+
+def test_car_rows_negotiate_msgpack(test_client, car_datasets):
+    """Test that the car rows come as MessagePack when the Accept header asks for it, and as JSON otherwise"""
+    url = f"/api/v1/datasets/{car_datasets['published'].id}/cars?marca=Toyota&fields=modelo,fecha_matriculacion"
+
+    rv = test_client.get(url, headers={"Accept": "application/msgpack"})
+    assert rv.status_code == 200
+    assert rv.mimetype == "application/msgpack"
+    assert "Accept" in rv.headers["Vary"]
+    assert msgpack.unpackb(rv.data) == rv_json(test_client, url)
+    assert msgpack.unpackb(rv.data)["items"] == [{"modelo": "Prius", "fecha_matriculacion": "2020-01-01T00:00:00"}]
+
+    rv = test_client.get(url, headers={"Accept": "application/x-msgpack"})
+    assert rv.mimetype == "application/x-msgpack"
+    assert test_client.get(url, headers={"Accept": "text/html"}).mimetype == "application/json"
+
+
+def rv_json(test_client, url):
+    rv = test_client.get(url, headers={"Accept": "application/json"})
+    assert rv.mimetype == "application/json"
+    return rv.get_json()
+
+
+def test_cars_span_published_datasets_only(test_client, car_datasets):
+    """Test that the cross-dataset endpoint ignores datasets without DOI"""
+    rv = test_client.get("/api/v1/cars?marca=Seat&modelo=Ibiza&fields=dataset_id")
+
+    dataset_ids = [item["dataset_id"] for item in rv.get_json()["items"]]
+    assert car_datasets["draft"].id not in dataset_ids
+    assert sorted(set(dataset_ids)) == sorted([car_datasets["published"].id, car_datasets["other"].id])
+
+
+def test_cars_filter_by_year_and_price_ranges(test_client, car_datasets):
+    """Test the production year and price range filters"""
+    rv = test_client.get(
+        "/api/v1/cars?year_min=2016&year_max=2019&price_max=20000&fields=modelo,comienzo_de_produccion"
+    )
+
+    assert rv.get_json()["items"] == [
+        {"modelo": "Leon", "comienzo_de_produccion": 2016},
+        {"modelo": "Ibiza", "comienzo_de_produccion": 2018},
+    ]
+
+
+def test_car_pages_cover_every_result_once(test_client, car_datasets):
+    """Test that following next_cursor returns every car exactly once"""
+    dataset_id = car_datasets["published"].id
+    seen, cursor = [], None
+    while True:
+        url = f"/api/v1/datasets/{dataset_id}/cars?page_size=3&fields=id"
+        rv = test_client.get(url + (f"&cursor={cursor}" if cursor else ""))
+        page = rv.get_json()
+        seen.extend(item["id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert len(seen) == 4
+    assert seen == sorted(set(seen))
+
+
+def test_car_pages_by_year_follow_production_year(test_client, car_datasets):
+    """Test that order=year pages through the cars by production year, then id"""
+    years, cursor = [], None
+    while True:
+        url = "/api/v1/cars?marca=Seat&order=year&page_size=2&fields=comienzo_de_produccion"
+        page = test_client.get(url + (f"&cursor={cursor}" if cursor else "")).get_json()
+        years.extend(item["comienzo_de_produccion"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert years == [2012, 2016, 2018, 2020]
+
+
+@pytest.mark.parametrize(
+    "query",
+    ["fields=marca,password", "year_min=recent", "cursor=not-a-cursor", "order=price"],
+)
+def test_cars_reject_malformed_parameters(test_client, car_datasets, query):
+    """Test that unknown fields, non-integer ranges and malformed cursors return 400"""
+    rv = test_client.get(f"/api/v1/cars?{query}")
+
+    assert rv.status_code == 400
+
+
+def test_cars_of_missing_or_unpublished_dataset_return_404(test_client, car_datasets):
+    """Test that the cars of an unknown or unpublished dataset are not exposed"""
+    assert test_client.get("/api/v1/datasets/999999/cars").status_code == 404
+    assert test_client.get(f"/api/v1/datasets/{car_datasets['draft'].id}/cars").status_code == 404
+
+
+def test_coche_service_serializes_dates_and_clamps_page_size(test_client, car_datasets):
+    """Test that dates are returned as ISO strings and the page size is bounded"""
+    service = CocheService()
+    page = service.query_page(dataset_id=car_datasets["published"].id, fields="fecha_matriculacion", page_size=1)
+
+    assert page["items"] == [{"fecha_matriculacion": "2020-01-01T00:00:00"}]
+    assert page["next_cursor"] is not None
+    assert service.get_page_size(10**6) == CocheService.MAX_PAGE_SIZE
+
+
+def test_fold_car_aggregates_merges_weight_bins():
+    """Test that the rows of every weight bin are folded into one entry per group"""
+    rows = [
+        ("Seat", 1000, 2, 20000, 11.0),
+        ("Seat", 1500, 1, 16000, 6.0),
+        ("Toyota", 1250, 3, 63000, 13.5),
+    ]
+
+    aggregates = fold_car_aggregates(rows)
+
+    assert [aggregate["group"] for aggregate in aggregates] == ["Seat", "Toyota"]
+    assert aggregates[1]["count"] == 3
+    seat = aggregates[0]
+    assert (seat["count"], seat["average_price"], seat["average_consumption"]) == (3, 12000.0, 5.67)
+    assert [bin["count"] for bin in seat["weight_distribution"]] == [0, 2, 0, 1, 0, 0, 0]
+    assert seat["weight_distribution"][-1] == {"min": 2500, "max": None, "count": 0}
+
+
+def test_dataset_car_aggregates_by_brand(test_client, car_datasets):
+    """Test that the aggregates of a dataset are grouped by brand by default"""
+    rv = test_client.get(f"/api/v1/datasets/{car_datasets['published'].id}/cars/aggregates")
+
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["group_by"] == "marca"
+    assert [(group["group"], group["count"], group["average_price"]) for group in body["groups"]] == [
+        ("Seat", 3, 13000.0),
+        ("Toyota", 1, 21000.0),
+    ]
+    assert body["groups"][0]["weight_distribution"][1] == {"min": 1000, "max": 1250, "count": 3}
+
+
+def test_car_aggregates_by_decade_span_published_datasets(test_client, car_datasets):
+    """Test the cross-dataset aggregates, which ignore datasets without DOI"""
+    rv = test_client.get("/api/v1/cars/aggregates?group_by=decade")
+
+    counts = {group["group"]: group["count"] for group in rv.get_json()["groups"]}
+    assert counts[2010] >= 3
+    assert counts[2010] == CocheService().aggregates("decade")["groups"][0]["count"]
+    assert sum(counts.values()) == CocheService().repository.count() - len(car_datasets["draft"].coches)
+
+
+def test_car_aggregates_reject_unknown_grouping_and_dataset(test_client, car_datasets):
+    """Test that an unknown group_by returns 400 and an unpublished dataset 404"""
+    assert test_client.get("/api/v1/cars/aggregates?group_by=matricula").status_code == 400
+    assert test_client.get(f"/api/v1/datasets/{car_datasets['draft'].id}/cars/aggregates").status_code == 404
+
+
+def test_dataset_car_aggregates_are_cached_per_version(test_client, car_datasets, monkeypatch):
+    """Test that the aggregates of a dataset are computed once per dataset version"""
+    # The testing configuration disables the result cache
+    monkeypatch.setitem(test_client.application.extensions, "result_cache", LRUMemoryCache())
+    dataset = car_datasets["other"]
+    service = CocheService()
+    calls = []
+    aggregate_rows = service.repository.aggregate_rows
+    monkeypatch.setattr(
+        service.repository,
+        "aggregate_rows",
+        lambda *args, **kwargs: calls.append(args) or aggregate_rows(*args, **kwargs),
+    )
+
+    first = service.aggregates("combustible", dataset)
+    assert service.aggregates("combustible", dataset) == first
+    dataset.version += 1
+    try:
+        service.aggregates("combustible", dataset)
+    finally:
+        dataset.version -= 1
+
+    assert len(calls) == 2
+
+
+def test_matricula_lookup_spans_published_datasets(test_client, car_datasets):
+    """Test that a plate, however it is written, is found in every published dataset"""
+    rv = test_client.get("/api/v1/cars/matricula/1234-abc")
+
+    assert rv.status_code == 200
+    body = rv.get_json()
+    assert body["matricula"] == "1234ABC"
+    dataset_ids = {occurrence["dataset"]["id"] for occurrence in body["occurrences"]}
+    assert car_datasets["draft"].id not in dataset_ids
+    assert {car_datasets["published"].id, car_datasets["other"].id} <= dataset_ids
+    other = next(item for item in body["occurrences"] if item["dataset"]["id"] == car_datasets["other"].id)
+    assert other["dataset"]["doi"] == "10.1234/other.cars"
+    assert (other["car"]["marca"], other["car"]["combustible"]) == ("Seat", "Diésel")
+
+    assert test_client.get("/api/v1/cars/matricula/0000ZZZ").get_json()["occurrences"] == []
+    assert test_client.get("/api/v1/cars/matricula/%20-%20").status_code == 400
+
+
+def test_ingest_flags_repeated_matriculas_across_files(test_client, tmp_path):
+    """Test that rows repeating a plate already seen in the dataset are flagged, not dropped"""
+    row = "Ibiza,Seat,1.6,5.5,Gasolina,2015,,5,5,1200,400,España,12000,{},01/01/2020"
+    first, second = tmp_path / "first.csv", tmp_path / "second.csv"
+    first.write_text(csv_text(row.format("1111 BBB"), row.format("2222BBB"), row.format("1111-bbb")))
+    second.write_text(csv_text(row.format("2222bbb"), row.format("3333BBB")))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Plates", None)
+
+    service, seen = DataSetService(), set()
+    for path in (first, second):
+        service._parse_csv_and_create_coches(str(path), True, ",", dataset.id, seen_matriculas=seen)
+    db.session.commit()
+
+    cars = Coche.query.filter_by(dataset_id=dataset.id).order_by(Coche.id).all()
+    assert [(car.matricula, car.matricula_duplicada) for car in cars] == [
+        ("1111BBB", False),
+        ("2222BBB", False),
+        ("1111BBB", True),
+        ("2222BBB", True),
+        ("3333BBB", False),
+    ]
@@ -0,0 +1,139 @@
+"""Tests for the dictionary-encoded car columns"""
+
+import pytest
+from sqlalchemy import event, insert, select
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import CAR_DICTIONARIES, Coche, CocheCombustible, CocheMarca
+from app.modules.dataset.repositories import DSZoneMapRepository
+from app.modules.dataset.tests.conftest import car_model, create_car, create_dataset
+from app.modules.explore.repositories import ExploreRepository
+
+
+@pytest.fixture(scope="module")
+def encoded_dataset(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(
+        user.id,
+        "Encoded cars",
+        "10.1234/encoded.cars",
+        [
+            car_model("Seat", "Ibiza", "Gasolina", 2012, 9000),
+            car_model("Seat", "Leon", "Diésel", 2016, 14000),
+            car_model("SEAT", "Arona", "GLP", 2020, 19000),
+        ],
+    )
+    DSZoneMapRepository().rebuild(dataset.id)
+    db.session.commit()
+    return dataset
+
+
+def test_repeated_strings_are_stored_once(test_client, encoded_dataset):
+    """Test that cars store ids into the dictionary tables and read back their strings"""
+    cars = Coche.query.filter_by(dataset_id=encoded_dataset.id).order_by(Coche.id).all()
+
+    assert [car.marca for car in cars] == ["Seat", "Seat", "SEAT"]
+    assert cars[0].marca_id == cars[1].marca_id != cars[2].marca_id
+    assert CocheMarca.query.filter_by(value="Seat").count() == 1
+    # The string attribute still works in SQL, as a subquery on the dictionary table
+    assert Coche.query.filter(Coche.combustible == "GLP", Coche.dataset_id == encoded_dataset.id).one() == cars[2]
+
+
+def test_reading_strings_loads_each_dictionary_once(test_client, encoded_dataset):
+    """Test that decoding the strings of many cars does not read the dictionary table per car"""
+    cars = Coche.query.filter_by(dataset_id=encoded_dataset.id).all()
+    CAR_DICTIONARIES["marca"].forget()
+    statements = []
+
+    def record(conn, cursor, statement, *args):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", record)
+    try:
+        assert sorted(car.marca for car in cars * 10) == ["SEAT"] * 10 + ["Seat"] * 20
+    finally:
+        event.remove(db.engine, "before_cursor_execute", record)
+
+    assert len(statements) == 1
+
+
+def test_unflushed_car_returns_the_assigned_string(test_client, encoded_dataset):
+    """Test that the strings of a car are readable before the flush resolves their ids"""
+    car = create_car(encoded_dataset.id, **car_model("Cupra", "Born", "Eléctrico", 2022, 35000))
+
+    assert (car.marca, car.marca_id) == ("Cupra", None)
+
+
+def test_resolve_inserts_missing_values_once(test_client):
+    """Test that resolving values inserts the unknown ones and reuses the known ones"""
+    dictionary = CAR_DICTIONARIES["pais_de_origen"]
+
+    first = dictionary.resolve(["Portugal", "Chequia"])
+    db.session.commit()
+    second = dictionary.resolve(["Chequia", "Portugal"])
+
+    assert first == second
+    assert dictionary.decode_many(first.values()) == {id: value for value, id in first.items()}
+    assert dictionary.ids_matching("portugal") == [first["Portugal"]]
+    assert dictionary.encode("Atlantis") is None
+
+
+def test_rolled_back_values_are_forgotten(test_client):
+    """Test that the ids of values inserted by a rolled back transaction leave the cache"""
+    dictionary = CAR_DICTIONARIES["motor"]
+
+    dictionary.resolve(["9.9 W16"])
+    db.session.rollback()
+
+    assert dictionary.encode("9.9 W16") is None
+    resolved = dictionary.resolve(["9.9 W16"])
+    db.session.commit()
+    assert dictionary.decode(resolved["9.9 W16"]) == "9.9 W16"
+
+
+def test_unknown_values_reload_the_dictionary_at_most_once_per_interval(test_client, monkeypatch):
+    """Test that lookups of values no row holds do not reload the table each time, while unknown ids do"""
+    dictionary = CAR_DICTIONARIES["combustible"]
+    dictionary.forget()
+    dictionary.decode_many([])
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if "FROM coche_combustible" in statement:
+            statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        for text in ("Plasma", "plasma", "Vapor"):
+            assert dictionary.ids_matching(text) == []
+            assert dictionary.encode(text) is None
+        assert statements == []
+
+        monkeypatch.setattr(dictionary, "MISS_RELOAD_SECONDS", 0)
+        assert dictionary.encode("Plasma") is None
+        assert len(statements) == 1
+
+        # An id added by another process is always read back
+        db.session.execute(insert(CocheCombustible.__table__), [{"value": "Hidrógeno"}])
+        new_id = db.session.execute(select(CocheCombustible.id).filter_by(value="Hidrógeno")).scalar_one()
+        assert dictionary.decode(new_id) == "Hidrógeno"
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+        db.session.rollback()
+        dictionary.forget()
+
+
+def test_car_filters_match_dictionary_values(test_client, encoded_dataset):
+    """Test that the car API and explore filter by the dictionary ids of every spelling, ignoring case"""
+    url = f"/api/v1/datasets/{encoded_dataset.id}/cars?fields=modelo,marca"
+
+    assert test_client.get(url + "&marca=Seat").get_json()["items"] == [
+        {"modelo": "Ibiza", "marca": "Seat"},
+        {"modelo": "Leon", "marca": "Seat"},
+        {"modelo": "Arona", "marca": "SEAT"},
+    ]
+    assert test_client.get(url + "&marca=Lada").get_json() == {"items": [], "next_cursor": None}
+    # Both conditions must hold for the same car, which explore checks on the ids of every spelling
+    assert ExploreRepository().car_matching_dataset_ids(marca="seat", combustible="glp") == [encoded_dataset.id]
+    assert ExploreRepository().car_matching_dataset_ids(marca="seat", combustible="eléctrico") == []
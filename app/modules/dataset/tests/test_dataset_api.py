@@ -0,0 +1,256 @@
+"""Tests for the generic dataset API and its compiled serializers"""
+
+import json
+from datetime import datetime
+
+import msgpack
+import pytest
+from sqlalchemy import event
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.api import dataset_serializer
+from app.modules.dataset.models import CSVDataSet, DataSet, DOIMapping, DSMetaData, DSViewRecord, PublicationType
+from app.modules.dataset.payloads import DataSetPayload, FilePayload
+from app.modules.dataset.services import MAX_BATCH_SIZE, DOIMappingService
+from app.modules.hubfile.models import Hubfile
+from core.serialisers.encoding import encode
+from core.serialisers.serializer import Serializer
+
+
+@pytest.fixture(scope="module")
+def api_datasets(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    datasets = []
+    for i in range(3):
+        metadata = DSMetaData(
+            title=f"API dataset {i}",
+            description="API",
+            publication_type=PublicationType.NONE,
+            dataset_doi=f"10.1234/api.{i}",
+        )
+        db.session.add(metadata)
+        db.session.flush()
+        dataset = CSVDataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+        db.session.add(dataset)
+        db.session.flush()
+        db.session.add(Hubfile(name=f"api_{i}.csv", checksum="e", size=2048, data_set_id=dataset.id))
+        datasets.append(dataset)
+    db.session.commit()
+    return datasets
+
+
+class Plain:
+    def __init__(self):
+        self.id = 7
+        self.created_at = datetime(2024, 5, 1, 12, 0)
+
+    def label(self):
+        return f"plain-{self.id}"
+
+
+def test_compiled_serializer_calls_methods_and_converts_datetimes():
+    """Test that methods are called, attributes read and datetimes converted, for plain classes too"""
+    serializer = Serializer({"id": "id", "label": "label", "created": "created_at", "missing": "nope"})
+
+    assert serializer.serialize(Plain()) == {
+        "id": 7,
+        "label": "plain-7",
+        "created": "2024-05-01T12:00:00",
+        "missing": None,
+    }
+    assert serializer.serialize_many([Plain(), Plain()], fields=("label",)) == [{"label": "plain-7"}] * 2
+    with pytest.raises(ValueError):
+        serializer.parse_fields("id,password")
+
+
+def test_dataset_list_serializes_files_with_a_fixed_number_of_queries(test_client, api_datasets):
+    """Test that the list endpoint nests the files and eager-loads them instead of one query per dataset"""
+    statements = []
+
+    def count(*args):
+        statements.append(args)
+
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        rv = test_client.get("/api/v1/datasets/")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert rv.status_code == 200
+    items = {item["dataset_id"]: item for item in rv.get_json()["items"]}
+    first = items[api_datasets[0].id]
+    assert first["name"] == "API dataset 0"
+    assert first["doi"].endswith("/doi/10.1234/api.0")
+    assert first["files"] == [{"file_id": api_datasets[0].files[0].id, "file_name": "api_0.csv", "size": "2.0 KB"}]
+    # Datasets with metadata, the CSV subclass table, and the files: not one query per dataset
+    assert len(statements) <= 4
+
+
+def test_dataset_api_sparse_fieldsets(test_client, api_datasets):
+    """Test that ?fields= restricts the returned fields and rejects unknown ones"""
+    dataset = api_datasets[1]
+
+    rv = test_client.get(f"/api/v1/datasets/{dataset.id}?fields=dataset_id,name")
+    assert rv.status_code == 200
+    assert rv.get_json() == {"dataset_id": dataset.id, "name": "API dataset 1"}
+
+    rv = test_client.get("/api/v1/datasets/?fields=dataset_id")
+    assert all(item.keys() == {"dataset_id"} for item in rv.get_json()["items"])
+    assert test_client.get("/api/v1/datasets/?fields=password").status_code == 400
+
+
+def test_loader_options_follow_the_requested_fields():
+    """Test that only the relationships of the requested fields are eager-loaded"""
+    assert dataset_serializer.loader_options(DataSet, ("dataset_id",)) == []
+    assert len(dataset_serializer.loader_options(DataSet, ("name", "doi"))) == 1
+    assert len(dataset_serializer.loader_options(DataSet)) == 2
+
+
+def test_dataset_list_pages_by_cursor(test_client, api_datasets):
+    """Test that ?limit= pages the list and next_cursor walks it to the end without repeating rows"""
+    seen, cursor = [], None
+    while True:
+        rv = test_client.get("/api/v1/datasets/?limit=2&fields=dataset_id" + (f"&cursor={cursor}" if cursor else ""))
+        assert rv.status_code == 200
+        page = rv.get_json()
+        assert len(page["items"]) <= 2
+        seen.extend(item["dataset_id"] for item in page["items"])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+
+    assert seen == sorted(seen) and len(seen) == len(set(seen))
+    assert {dataset.id for dataset in api_datasets} <= set(seen)
+    assert test_client.get("/api/v1/datasets/?cursor=not-a-cursor").status_code == 400
+
+
+def test_dataset_list_orders_and_filters_by_column_fields(test_client, api_datasets):
+    """Test ?order= (descending with -) across pages, equality filters, and the fields that cannot do either"""
+    first = test_client.get("/api/v1/datasets/?order=-created&limit=1&fields=dataset_id,created").get_json()
+    second = test_client.get(
+        f"/api/v1/datasets/?order=-created&limit=1&fields=dataset_id,created&cursor={first['next_cursor']}"
+    ).get_json()
+    assert (second["items"][0]["created"], second["items"][0]["dataset_id"]) < (
+        first["items"][0]["created"],
+        first["items"][0]["dataset_id"],
+    )
+
+    dataset = api_datasets[2]
+    rv = test_client.get(f"/api/v1/datasets/?dataset_id={dataset.id}&fields=dataset_id,name")
+    assert rv.get_json() == {"items": [{"dataset_id": dataset.id, "name": "API dataset 2"}], "next_cursor": None}
+
+    rv = test_client.get(f"/api/v1/datasets/?dataset_id={dataset.id}&fields=dataset_id&_=1700000000")
+    assert rv.get_json()["items"] == [{"dataset_id": dataset.id}]
+
+    assert test_client.get("/api/v1/datasets/?name=API").status_code == 400
+    assert test_client.get("/api/v1/datasets/?dataset_id=abc").status_code == 400
+    assert test_client.get("/api/v1/datasets/?order=doi").status_code == 400
+
+
+def test_dataset_list_streams_ndjson(test_client, api_datasets):
+    """Test that ?stream=ndjson returns every matching row, one JSON document per line"""
+    rv = test_client.get("/api/v1/datasets/?stream=ndjson&limit=1&fields=dataset_id,files")
+
+    assert rv.status_code == 200
+    assert rv.mimetype == "application/x-ndjson"
+    rows = [json.loads(line) for line in rv.get_data(as_text=True).splitlines()]
+    by_id = {row["dataset_id"]: row for row in rows}
+    assert {dataset.id for dataset in api_datasets} <= by_id.keys()
+    assert by_id[api_datasets[0].id]["files"][0]["file_name"] == "api_0.csv"
+
+
+def test_dataset_payload_is_typed_and_matches_to_dict(test_client, api_datasets):
+    """Test that to_payload builds the typed Structs that to_dict and the msgspec encoders render"""
+    dataset = db.session.get(DataSet, api_datasets[0].id)
+
+    with test_client.application.test_request_context():
+        payload = dataset.to_payload()
+        assert isinstance(payload, DataSetPayload)
+        assert isinstance(payload.files[0], FilePayload)
+        assert dataset.to_dict()["files"][0]["name"] == "api_0.csv"
+        assert msgpack.unpackb(encode(payload, "application/msgpack")) == json.loads(encode(payload))
+        assert json.loads(encode(payload))["created_at"] == dataset.created_at.isoformat()
+
+
+def test_dataset_api_negotiates_msgpack(test_client, api_datasets):
+    """Test that the generic dataset resource answers in MessagePack when asked to"""
+    rv = test_client.get(f"/api/v1/datasets/{api_datasets[0].id}", headers={"Accept": "application/msgpack"})
+
+    assert rv.mimetype == "application/msgpack"
+    assert msgpack.unpackb(rv.data)["name"] == "API dataset 0"
+    rv = test_client.get("/api/v1/datasets/999999", headers={"Accept": "application/msgpack"})
+    assert rv.status_code == 404 and msgpack.unpackb(rv.data) == {"message": "DataSet not found"}
+
+
+@pytest.fixture(scope="module")
+def doi_mappings(test_client, api_datasets):
+    """api.0 was published as old.0; api.1 as old.1a, then old.1b; old.x and old.y map to each other"""
+    mappings = [
+        DOIMapping(dataset_doi_old="10.1234/old.0", dataset_doi_new="10.1234/api.0"),
+        DOIMapping(dataset_doi_old="10.1234/old.1a", dataset_doi_new="10.1234/old.1b"),
+        DOIMapping(dataset_doi_old="10.1234/old.1b", dataset_doi_new="10.1234/api.1"),
+        DOIMapping(dataset_doi_old="10.1234/old.x", dataset_doi_new="10.1234/old.y"),
+        DOIMapping(dataset_doi_old="10.1234/old.y", dataset_doi_new="10.1234/old.x"),
+    ]
+    db.session.add_all(mappings)
+    db.session.commit()
+    return mappings
+
+
+def test_resolve_dois_follows_chains_and_stops_on_cycles(test_client, doi_mappings):
+    """Test that old DOIs resolve through chains of mappings, and that a cycle does not loop forever"""
+    assert DOIMappingService().resolve_dois(["10.1234/old.0", "10.1234/old.1a", "10.1234/old.x", "10.1234/none"]) == {
+        "10.1234/old.0": "10.1234/api.0",
+        "10.1234/old.1a": "10.1234/api.1",
+        "10.1234/old.x": "10.1234/old.y",
+        "10.1234/none": "10.1234/none",
+    }
+
+
+def test_batch_lookup_returns_datasets_in_request_order(test_client, api_datasets, doi_mappings):
+    """Test that ids and DOIs, old ones included, come back in request order with a fixed number of queries"""
+    statements = []
+
+    def count(*args):
+        statements.append(args)
+
+    views = DSViewRecord.query.count()
+    body = {
+        "ids": [api_datasets[2].id, 999999, api_datasets[0].id],
+        "dois": ["10.1234/old.1a", "10.1234/api.2", "10.1234/missing", "10.1234/old.0"],
+    }
+    event.listen(db.engine, "before_cursor_execute", count)
+    try:
+        rv = test_client.post("/api/v1/datasets/batch?fields=dataset_id,name,files", json=body)
+    finally:
+        event.remove(db.engine, "before_cursor_execute", count)
+
+    assert rv.status_code == 200
+    items = rv.get_json()["items"]
+    assert [item.get("id", item.get("doi")) for item in items] == body["ids"] + body["dois"]
+    assert [item["dataset"] and item["dataset"]["name"] for item in items] == [
+        "API dataset 2",
+        None,
+        "API dataset 0",
+        "API dataset 1",
+        "API dataset 2",
+        None,
+        "API dataset 0",
+    ]
+    assert items[3]["current_doi"] == "10.1234/api.1" and items[5]["current_doi"] is None
+    assert items[6]["dataset"]["files"][0]["file_name"] == "api_0.csv"
+    # Two steps of DOI mappings, the datasets, their subclass table and their files
+    assert len(statements) <= 6
+    assert DSViewRecord.query.count() == views
+
+
+def test_batch_lookup_validates_the_request(test_client):
+    """Test that batch lookups need ids or DOIs of the right types, and no more than MAX_BATCH_SIZE"""
+    assert test_client.post("/api/v1/datasets/batch", json={}).status_code == 400
+    assert test_client.post("/api/v1/datasets/batch", json={"ids": ["1"]}).status_code == 400
+    assert test_client.post("/api/v1/datasets/batch", json={"dois": [3]}).status_code == 400
+    assert test_client.post("/api/v1/datasets/batch", json={"ids": 3}).status_code == 400
+    rv = test_client.post("/api/v1/datasets/batch", json={"ids": list(range(MAX_BATCH_SIZE + 1))})
+    assert rv.status_code == 400
+    assert test_client.post("/api/v1/datasets/batch?fields=password", json={"ids": [1]}).status_code == 400
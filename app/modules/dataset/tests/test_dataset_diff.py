@@ -0,0 +1,192 @@
+"""Tests for the row hashes of the cars and the diff between dataset versions"""
+
+import os
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import Author, Coche
+from app.modules.dataset.tests.conftest import create_car, create_dataset, create_version, csv_text
+from app.modules.hubfile.models import Hubfile
+
+
+def car(matricula, price, modelo="Ibiza"):
+    return {"matricula": matricula, "precio_estimado": price, "modelo": modelo}
+
+
+@pytest.fixture(scope="module")
+def versions(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    v1 = create_dataset(
+        user.id,
+        "Diffed cars",
+        "10.1234/diffed.cars",
+        [car("1111AAA", 10_000), car("2222BBB", 20_000), car("3333CCC", 30_000)],
+    )
+    v2 = create_dataset(
+        user.id,
+        "Diffed cars v2",
+        "10.1234/diffed.cars.v2",
+        [car("1111AAA", 10_000), car("2222BBB", 21_000), car("4444DDD", 40_000)],
+        parent=v1,
+    )
+    draft = create_dataset(user.id, "Diffed draft", None, [], parent=v2)
+    return {"v1": v1, "v2": v2, "draft": draft}
+
+
+def test_row_hash_covers_the_content_only(test_client):
+    """Test that equal rows of different datasets hash alike, and any content change alters the hash"""
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Hashed cars", "10.1234/hashed.cars", [car("5555EEE", 10_000)])
+    stored = Coche.query.filter_by(dataset_id=dataset.id).one()
+
+    same = create_car(dataset.id + 1, **car("5555EEE", 10_000))
+    same.matricula_duplicada = True
+    assert stored.row_hash is not None
+    assert stored.row_hash == same.content_hash() == stored.content_hash()
+    assert create_car(dataset.id, **car("5555EEE", 10_001)).content_hash() != stored.row_hash
+    assert create_car(dataset.id, **car("5555EEE", 10_000, modelo="Leon")).content_hash() != stored.row_hash
+
+
+def test_diff_against_parent_reports_added_removed_and_changed(test_client, versions):
+    """Test that a version is diffed against its parent by default, pairing changed rows by matrícula"""
+    rv = test_client.get(f"/api/v1/datasets/{versions['v2'].id}/diff")
+
+    assert rv.status_code == 200
+    diff = rv.get_json()
+    assert diff["against"] == versions["v1"].id
+    assert diff["summary"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    assert [car["matricula"] for car in diff["added"]] == ["4444DDD"]
+    assert [car["matricula"] for car in diff["removed"]] == ["3333CCC"]
+    [changed] = diff["changed"]
+    assert (changed["matricula"], changed["fields"]) == ("2222BBB", ["precio_estimado"])
+    assert (changed["before"]["precio_estimado"], changed["after"]["precio_estimado"]) == (20_000, 21_000)
+    assert changed["after"]["marca"] == "Seat"
+    assert diff["truncated"] is False
+
+
+def test_diff_against_any_dataset_and_limit(test_client, versions):
+    """Test that ?against picks the other dataset and ?limit caps the detailed rows, not the summary"""
+    rv = test_client.get(f"/api/v1/datasets/{versions['v1'].id}/diff?against={versions['v2'].id}&limit=1")
+
+    assert rv.status_code == 200
+    diff = rv.get_json()
+    assert diff["summary"] == {"added": 1, "removed": 1, "changed": 1, "unchanged": 1}
+    assert [car["matricula"] for car in diff["added"]] == ["3333CCC"]
+    assert diff["changed"][0]["before"]["precio_estimado"] == 21_000
+
+
+def test_diff_counts_repeated_rows(test_client):
+    """Test that rows are matched one to one, so an extra copy of a row is reported as added"""
+    user = User.query.filter_by(email="test@example.com").first()
+    v1 = create_dataset(
+        user.id, "Repeated cars", "10.1234/repeated.cars", [car("5656MMM", 10_000), car("7878NNN", 20_000)]
+    )
+    v2 = create_dataset(
+        user.id,
+        "Repeated cars v2",
+        "10.1234/repeated.cars.v2",
+        [car("5656MMM", 10_000), car("7878NNN", 20_000), car("5656MMM", 10_000)],
+        parent=v1,
+    )
+
+    diff = test_client.get(f"/api/v1/datasets/{v2.id}/diff").get_json()
+    assert diff["summary"] == {"added": 1, "removed": 0, "changed": 0, "unchanged": 2}
+    assert [car["matricula"] for car in diff["added"]] == ["5656MMM"]
+
+    diff = test_client.get(f"/api/v1/datasets/{v1.id}/diff?against={v2.id}").get_json()
+    assert diff["summary"] == {"added": 0, "removed": 1, "changed": 0, "unchanged": 2}
+
+
+@pytest.mark.parametrize(
+    "query, status",
+    [("?against=abc", 400), ("?limit=many", 400), ("?against=999999", 404)],
+)
+def test_diff_rejects_invalid_parameters(test_client, versions, query, status):
+    """Test that malformed parameters return 400 and unknown datasets 404"""
+    assert test_client.get(f"/api/v1/datasets/{versions['v2'].id}/diff{query}").status_code == status
+
+
+def test_diff_requires_published_datasets_with_a_previous_version(test_client, versions):
+    """Test that a first version needs ?against, and unpublished datasets are not diffed"""
+    assert test_client.get(f"/api/v1/datasets/{versions['v1'].id}/diff").status_code == 400
+    assert test_client.get(f"/api/v1/datasets/{versions['draft'].id}/diff").status_code == 404
+    url = f"/api/v1/datasets/{versions['v2'].id}/diff?against={versions['draft'].id}"
+    assert test_client.get(url).status_code == 404
+
+
+def csv_row(matricula, price):
+    return f"Leon,Seat,2.0,6.1,Diésel,2018,,5,5,1300,450,España,{price},{matricula},01/02/2021"
+
+
+def test_new_version_inherits_the_cars_of_its_parent(test_client, tmp_path, monkeypatch):
+    """Test that a new version records its parent and copies its cars, flagging new rows that repeat them"""
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Inherited cars", "10.1234/inherited.cars", [car("6666FFF", 10_000)])
+    directory = tmp_path / f"user_{user.id}" / f"dataset_{dataset.id}"
+    directory.mkdir(parents=True)
+    (directory / "cars.csv").write_text(csv_text(), encoding="utf-8")
+    db.session.add(Hubfile(name="cars.csv", checksum="d", size=1, data_set_id=dataset.id))
+    db.session.add(Author(name="Ana Ruiz", affiliation="US", ds_meta_data_id=dataset.ds_meta_data_id))
+    db.session.commit()
+
+    new_version = create_version(
+        tmp_path,
+        dataset,
+        user.id,
+        {"more.csv": csv_text(csv_row("6666FFF", 18_000), csv_row("7777GGG", 19_000))},
+        doi="10.1234/inherited.cars.v2",
+    )
+
+    assert new_version.parent_id == dataset.id
+    assert new_version.parent.child_versions == [new_version]
+    assert [(author.name, author.affiliation) for author in new_version.ds_meta_data.authors] == [("Ana Ruiz", "US")]
+    cars = Coche.query.filter_by(dataset_id=new_version.id).order_by(Coche.id).all()
+    assert [(car.matricula, car.precio_estimado, car.matricula_duplicada) for car in cars] == [
+        ("6666FFF", 10_000, False),
+        ("6666FFF", 18_000, True),
+        ("7777GGG", 19_000, False),
+    ]
+    assert cars[0].row_hash == Coche.query.filter_by(dataset_id=dataset.id).one().row_hash
+    assert os.path.exists(directory.parent / f"dataset_{new_version.id}" / "cars.csv")
+
+
+def test_new_version_upload_replaces_the_file_of_the_same_name(test_client, tmp_path, monkeypatch):
+    """Test that uploading a file named as an inherited one replaces it and its cars"""
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Replaced cars", "10.1234/replaced.cars", [car("8888HHH", 10_000)])
+    directory = tmp_path / f"user_{user.id}" / f"dataset_{dataset.id}"
+    directory.mkdir(parents=True)
+    (directory / "cars.csv").write_text(csv_text(csv_row("8888HHH", 10_000)), encoding="utf-8")
+    db.session.add(Hubfile(name="cars.csv", checksum="d", size=1, data_set_id=dataset.id))
+    db.session.commit()
+
+    new_version = create_version(tmp_path, dataset, user.id, {"cars.csv": csv_text(csv_row("9999JJJ", 12_000))})
+
+    assert [file.name for file in new_version.files] == ["cars.csv"]
+    cars = Coche.query.filter_by(dataset_id=new_version.id).all()
+    assert [(car.matricula, car.matricula_duplicada) for car in cars] == [("9999JJJ", False)]
+    assert "9999JJJ" in (directory.parent / f"dataset_{new_version.id}" / "cars.csv").read_text(encoding="utf-8")
+
+
+def test_new_version_drops_the_cars_of_missing_files(test_client, tmp_path, monkeypatch):
+    """Test that the cars of a file missing on disk are not inherited along with the other files"""
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(
+        user.id, "Partly missing cars", "10.1234/missing.cars", [car("1212KKK", 10_000), car("3434LLL", 20_000)]
+    )
+    directory = tmp_path / f"user_{user.id}" / f"dataset_{dataset.id}"
+    directory.mkdir(parents=True)
+    (directory / "kept.csv").write_text(csv_text(csv_row("1212KKK", 10_000)), encoding="utf-8")
+    db.session.add(Hubfile(name="kept.csv", checksum="d", size=1, data_set_id=dataset.id))
+    db.session.add(Hubfile(name="gone.csv", checksum="e", size=1, data_set_id=dataset.id))
+    db.session.commit()
+
+    new_version = create_version(tmp_path, dataset, user.id)
+
+    assert [file.name for file in new_version.files] == ["kept.csv"]
+    assert [car.matricula for car in Coche.query.filter_by(dataset_id=new_version.id)] == ["1212KKK"]
@@ -1,13 +1,23 @@
 """Unit tests for dataset recommendation system"""
 
+import random
+from datetime import datetime
+
 import pytest
 
 from app import db
 from app.modules.auth.models import User
 from app.modules.conftest import login
-from app.modules.dataset.models import Author, CSVDataSet, DSMetaData, PublicationType
-from app.modules.dataset.repositories import DataSetRepository
-from app.modules.dataset.services import DataSetRecommendationService
+from app.modules.dataset.models import Author, Coche, CSVDataSet, DSMetaData, PublicationType
+from app.modules.dataset.repositories import DataSetRepository, DSZoneMapRepository
+from app.modules.dataset.services import (
+    DataSetRecommendationService,
+    DSMetaDataService,
+    content_index,
+    recommendation_index,
+)
+from core.indexes.feature_index import FeatureIndex, batch_nearest
+from core.sketches.minhash import LSHIndex, MinHash
 
 
 @pytest.fixture(scope="module")
@@ -349,3 +359,193 @@ def test_get_unsynchronized_dataset_with_recommendations(test_client):
 
     assert response.status_code == 200
     assert b"Unsync Dataset" in response.data
+
+
+def test_index_fallback_loads_the_indexes_once(test_client, monkeypatch):
+    """Test that datasets without stored recommendations do not reload the indexes on every view"""
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_test_dataset(user.id, "Fallback Once", tags="fallback-once")
+    loads = []
+    for index in (recommendation_index, content_index):
+        load = index.load
+        monkeypatch.setattr(index, "load", lambda load=load: loads.append(1) or load())
+        index.forget()
+
+    service = DataSetRecommendationService()
+    for _ in range(3):
+        service.get_recommended_datasets(dataset)
+
+    assert len(loads) == 2
+
+
+# ==================== FEATURE INDEX AND STORED RECOMMENDATIONS ====================
+
+
+def test_feature_index_nearest_matches_brute_force():
+    """Test that the index returns the exact nearest keys, including ones sharing no feature"""
+    rng = random.Random(3)
+    vocabulary = [("tag", f"t{i}") for i in range(12)] + [("author", f"a{i}") for i in range(8)]
+    index = FeatureIndex()
+    for key in range(300):
+        index.add(key, rng.choice(["NONE", "MISSING_CARS"]), rng.sample(vocabulary, rng.randint(0, 5)))
+
+    for key in range(0, 300, 7):
+        expected = sorted((index.difference(key, other), other) for other in index.keys() if other != key)[:3]
+        assert index.nearest_to(key, 3) == [(other, difference) for difference, other in expected]
+        assert dict(index.differences_to(key))[expected[0][1]] == expected[0][0]
+
+    index.remove(0)
+    assert 0 not in index and len(index) == 299
+
+
+def publish(dataset, doi):
+    DSMetaDataService().update(dataset.ds_meta_data_id, dataset_doi=doi)
+
+
+def test_published_datasets_store_and_read_their_recommendations(test_client, monkeypatch):
+    """Test that publishing stores the recommendations, and page views read them without the index"""
+    user = User.query.filter_by(email="test@example.com").first()
+    service = DataSetRecommendationService()
+    main_ds = create_test_dataset(user.id, "Stored Main", tags="stored-a, stored-b", authors_list=["Stored Author"])
+    twin = create_test_dataset(user.id, "Stored Twin", tags="stored-a, stored-b", authors_list=["Stored Author"])
+    cousin = create_test_dataset(user.id, "Stored Cousin", tags="stored-a", authors_list=["Stored Author"])
+    publish(main_ds, "10.1234/stored.main")
+    publish(twin, "10.1234/stored.twin")
+    publish(cousin, "10.1234/stored.cousin")
+
+    assert service.recommendation_repository.recommended_ids(main_ds.id)[:2] == [twin.id, cousin.id]
+    monkeypatch.setattr(recommendation_index, "current", lambda: pytest.fail("stored recommendations need no index"))
+    assert service.get_recommended_datasets(main_ds)[:2] == [twin, cousin]
+
+
+def test_metadata_changes_refresh_the_recommendations_they_affect(test_client):
+    """Test that a dataset edited to resemble another enters its stored recommendations"""
+    user = User.query.filter_by(email="test@example.com").first()
+    service = DataSetRecommendationService()
+    main_ds = create_test_dataset(user.id, "Refresh Main", tags="refresh-x, refresh-y, refresh-z")
+    publish(main_ds, "10.1234/refresh.main")
+    for i in range(3):
+        neighbour = create_test_dataset(user.id, f"Refresh Neighbour {i}", tags="refresh-x, refresh-y")
+        publish(neighbour, f"10.1234/refresh.neighbour.{i}")
+    newcomer = create_test_dataset(user.id, "Refresh Newcomer", tags="unrelated-tag")
+    publish(newcomer, "10.1234/refresh.newcomer")
+    assert newcomer.id not in service.recommendation_repository.recommended_ids(main_ds.id)
+
+    DSMetaDataService().update(newcomer.ds_meta_data_id, tags="refresh-x, refresh-y, refresh-z")
+
+    assert service.recommendation_repository.recommended_ids(main_ds.id)[0] == newcomer.id
+    assert service.get_recommended_datasets(main_ds)[0] == newcomer
+
+
+def test_batch_nearest_matches_the_feature_index():
+    """Test that the bitset rebuild returns the same recommendations as the incremental index"""
+    rng = random.Random(5)
+    vocabulary = [("tag", f"t{i}") for i in range(15)] + [("author", f"a{i}") for i in range(10)]
+    entries = [
+        (key * 2 + 1, rng.choice(["NONE", "MISSING_CARS", "SOLD_CARS"]), rng.sample(vocabulary, rng.randint(0, 6)))
+        for key in range(400)
+    ]
+    index = FeatureIndex()
+    for entry in entries:
+        index.add(*entry)
+
+    nearest = batch_nearest(entries, 3)
+
+    assert nearest == {key: index.nearest_to(key, 3) for key, _, _ in entries}
+
+
+def test_rebuild_stores_the_recommendations_of_every_published_dataset(test_client):
+    """Test that a full rebuild replaces the stored recommendations with the index results"""
+    user = User.query.filter_by(email="test@example.com").first()
+    service = DataSetRecommendationService()
+    dataset = create_test_dataset(user.id, "Rebuilt Dataset", tags="rebuilt")
+    dataset.ds_meta_data.dataset_doi = "10.1234/rebuilt.dataset"
+    db.session.commit()
+    assert service.recommendation_repository.recommended_ids(dataset.id) == []
+
+    rebuilt = service.rebuild()
+
+    index = recommendation_index.current()
+    assert rebuilt == len(index)
+    for dataset_id in index.keys():
+        expected = [id for id, _ in index.nearest_to(dataset_id, service.MAX_RECOMMENDATIONS)]
+        assert service.recommendation_repository.recommended_ids(dataset_id) == expected
+
+
+# ==================== CAR MODEL SIMILARITY ====================
+
+
+def test_minhash_estimates_jaccard_and_round_trips():
+    """Test that signatures estimate the Jaccard similarity of their token sets and survive storage"""
+    shared = [f"seat|ibiza|{i}" for i in range(60)]
+    first = MinHash().update_many(shared + [f"only-first|{i}" for i in range(20)])
+    second = MinHash().update_many(shared + [f"only-second|{i}" for i in range(20)])
+
+    assert abs(first.jaccard(second) - 60 / 100) < 0.2
+    assert MinHash.from_bytes(first.to_bytes()).values == first.values
+    assert MinHash().jaccard(first) == 0.0
+    with pytest.raises(ValueError):
+        first.jaccard(MinHash(num_perm=32))
+
+
+def test_lsh_index_finds_similar_sets_only():
+    """Test that banded LSH returns the near-duplicate set and skips unrelated ones"""
+    index = LSHIndex()
+    tokens = [f"seat|ibiza|{i}" for i in range(50)]
+    index.add("near", MinHash().update_many(tokens[:48] + ["vw|golf|1", "vw|golf|2"]))
+    for i in range(50):
+        index.add(f"far{i}", MinHash().update_many(f"other{i}|{j}" for j in range(50)))
+
+    matches = index.query(MinHash().update_many(tokens), threshold=0.5)
+
+    assert [key for key, _ in matches] == ["near"]
+    index.remove("near")
+    assert index.query(MinHash().update_many(tokens)) == []
+
+
+def add_cars(dataset, models):
+    for i, (marca, modelo, motor) in enumerate(models):
+        db.session.add(
+            Coche(
+                dataset_id=dataset.id,
+                modelo=modelo,
+                marca=marca,
+                motor=motor,
+                consumo=5.5,
+                combustible="Gasolina",
+                comienzo_de_produccion=2015,
+                asientos=5,
+                puertas=5,
+                peso=1200,
+                carga_max=400,
+                pais_de_origen="España",
+                precio_estimado=10_000,
+                matricula=f"{dataset.id:04d}{i:03d}"[:7],
+                fecha_matriculacion=datetime(2020, 1, 1),
+            )
+        )
+    DSZoneMapRepository().rebuild(dataset.id)
+    db.session.commit()
+
+
+def test_datasets_of_the_same_car_models_are_recommended(test_client):
+    """Test that a dataset sharing the car models but no metadata beats metadata-only neighbours"""
+    user = User.query.filter_by(email="test@example.com").first()
+    service = DataSetRecommendationService()
+    fleet = [("Seat", "Ibiza", "1.0 TSI"), ("Volkswagen", "Golf", "2.0 TDI"), ("Seat", "Leon", "1.5 TSI")]
+    main_ds = create_test_dataset(user.id, "Fleet Main", tags="fleet-a")
+    add_cars(main_ds, fleet)
+    publish(main_ds, "10.1234/fleet.main")
+    for i in range(3):
+        neighbour = create_test_dataset(user.id, f"Fleet Tagged {i}", tags="fleet-a, fleet-b")
+        add_cars(neighbour, [("Toyota", "Prius", "1.8 HEV")])
+        publish(neighbour, f"10.1234/fleet.tagged.{i}")
+    same_fleet = create_test_dataset(user.id, "Fleet Twin", tags="fleet-c")
+    add_cars(same_fleet, [("SEAT", "Ibiza", "1.0 TSI"), *fleet[1:]])
+    publish(same_fleet, "10.1234/fleet.twin")
+
+    assert service.recommendation_repository.recommended_ids(main_ds.id)[0] == same_fleet.id
+    assert service.get_recommended_datasets(main_ds)[0] == same_fleet
+
+    service.rebuild()
+    assert service.recommendation_repository.recommended_ids(main_ds.id)[0] == same_fleet.id
@@ -0,0 +1,155 @@
+"""Tests for the column sketches of the cars and the distributions endpoint"""
+
+import os
+import random
+from types import SimpleNamespace
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.services import CocheService, DataSetService
+from app.modules.dataset.sketches import SKETCH_COLUMNS, CarColumnSketches
+from app.modules.dataset.tests.conftest import create_dataset, create_version, csv_text
+from app.modules.hubfile.models import Hubfile
+from core.sketches.histogram import FixedHistogram
+from core.sketches.kll import KLLSketch
+
+
+def csv_content(prices):
+    return csv_text(
+        *(f"Ibiza,Seat,1.6,5.5,Gasolina,2015,,5,5,1200,400,España,{price},1234ABC,01/01/2020" for price in prices)
+    )
+
+
+def rank_error(sorted_values, value, fraction):
+    """Distance between the rank of `value` and the requested rank, as a share of the stream"""
+    below = sum(1 for v in sorted_values if v <= value)
+    return abs(below / len(sorted_values) - fraction)
+
+
+def test_kll_quantiles_stay_within_rank_error_in_bounded_space():
+    """Test that the sketch of 100,000 values answers quantiles within 2% of rank with a few hundred items"""
+    rng = random.Random(7)
+    values = [rng.lognormvariate(10, 0.6) for _ in range(100_000)]
+    sketch = KLLSketch(seed=1)
+    for value in values:
+        sketch.update(value)
+
+    ordered = sorted(values)
+    for fraction in (0.01, 0.1, 0.5, 0.9, 0.99):
+        assert rank_error(ordered, sketch.quantile(fraction), fraction) < 0.02
+    assert sum(len(level) for level in sketch.levels) < 1000
+    assert (sketch.min, sketch.max, sketch.count) == (ordered[0], ordered[-1], 100_000)
+    assert abs(sketch.cdf(ordered[25_000]) - 0.25) < 0.02
+
+
+def test_kll_merge_matches_the_union_of_streams():
+    """Test that merging the sketches of two streams summarizes both"""
+    low, high = KLLSketch(seed=1), KLLSketch(seed=2)
+    for value in range(50_000):
+        low.update(value)
+        high.update(value + 50_000)
+
+    merged = KLLSketch.from_dict(low.to_dict()).merge(high)
+
+    assert merged.count == 100_000
+    assert (merged.min, merged.max) == (0, 99_999)
+    assert abs(merged.quantile(0.5) - 50_000) < 2_000
+    assert abs(merged.quantile(0.25) - 25_000) < 2_000
+
+
+def test_fixed_histogram_bins_and_merge():
+    """Test that values fall in their bin, out-of-range values in the edge bins, and merges add counts"""
+    histogram = FixedHistogram([0, 10, 20])
+    for value in (-5, 3, 10, 19, 250):
+        histogram.update(value)
+    other = FixedHistogram([0, 10, 20], [1, 0, 1])
+
+    assert histogram.merge(other).counts == [3, 2, 2]
+    assert histogram.bins()[-1] == {"min": 20, "max": None, "count": 2}
+    with pytest.raises(ValueError):
+        histogram.merge(FixedHistogram([0, 5]))
+
+
+def test_column_sketches_round_trip_and_detect_stale_bins():
+    """Test that stored sketches are read back, and sketches of other bins are ignored"""
+    sketches = CarColumnSketches()
+    sketches.update(
+        SimpleNamespace(**{column: 12_000 if column == "precio_estimado" else 1 for column in SKETCH_COLUMNS})
+    )
+
+    restored = CarColumnSketches.from_bytes(sketches.to_bytes())
+
+    assert restored.summary(["precio_estimado"], [0.5])["precio_estimado"]["quantiles"] == {"0.5": 12_000}
+    assert restored.histograms["precio_estimado"].counts[2] == 1
+    assert CarColumnSketches.from_bytes(None) is None
+    stale = CarColumnSketches()
+    stale.histograms["peso"] = FixedHistogram([0, 1000])
+    assert CarColumnSketches.from_bytes(stale.to_bytes()) is None
+
+
+def write_dataset_file(uploads, dataset, name, prices):
+    directory = os.path.join(uploads, f"user_{dataset.user_id}", f"dataset_{dataset.id}")
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, name)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(csv_content(prices))
+    return path
+
+
+def test_distributions_merge_stored_and_backfilled_file_sketches(test_client, tmp_path, monkeypatch):
+    """Test that the distributions of a dataset merge its files, sketching the legacy ones from their CSV"""
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Sketched cars", "10.1234/sketched.cars")
+
+    ingested = write_dataset_file(str(tmp_path), dataset, "ingested.csv", [10_000, 20_000])
+    sketches = CarColumnSketches()
+    DataSetService()._parse_csv_and_create_coches(ingested, True, ",", dataset.id, sketches=sketches)
+    db.session.add(
+        Hubfile(name="ingested.csv", checksum="a", size=1, data_set_id=dataset.id, sketches=sketches.to_bytes())
+    )
+    write_dataset_file(str(tmp_path), dataset, "legacy.csv", [30_000, 40_000, 50_000])
+    legacy = Hubfile(name="legacy.csv", checksum="b", size=1, data_set_id=dataset.id)
+    db.session.add(legacy)
+    db.session.commit()
+
+    url = f"/api/v1/datasets/{dataset.id}/cars/distributions"
+    rv = test_client.get(url + "?columns=precio_estimado&quantiles=0,0.5,1")
+
+    assert rv.status_code == 200
+    price = rv.get_json()["columns"]["precio_estimado"]
+    assert (price["count"], price["min"], price["max"]) == (5, 10_000, 50_000)
+    assert price["quantiles"] == {"0.0": 10_000, "0.5": 30_000, "1.0": 50_000}
+    assert sum(bin["count"] for bin in price["histogram"]) == 5
+    assert CarColumnSketches.from_bytes(db.session.get(Hubfile, legacy.id).sketches) is not None
+
+
+@pytest.mark.parametrize("query", ["columns=password", "quantiles=half", "quantiles=1.5"])
+def test_distributions_reject_unknown_columns_and_quantiles(test_client, query):
+    """Test that unknown columns and quantiles outside [0, 1] return 400"""
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Distribution params", f"10.1234/params.{query}")
+
+    assert test_client.get(f"/api/v1/datasets/{dataset.id}/cars/distributions?{query}").status_code == 400
+    assert test_client.get("/api/v1/datasets/999999/cars/distributions").status_code == 404
+
+
+def test_new_version_reuses_sketches_of_inherited_files(test_client, tmp_path, monkeypatch):
+    """Test that a new version copies the stored sketches of the files it inherits"""
+    monkeypatch.setenv("UPLOADS_DIR", str(tmp_path))
+    user = User.query.filter_by(email="test@example.com").first()
+    dataset = create_dataset(user.id, "Versioned cars", "10.1234/versioned.cars")
+    write_dataset_file(str(tmp_path), dataset, "cars.csv", [15_000])
+    sketches = CarColumnSketches()
+    sketches.update(SimpleNamespace(**{column: 1 for column in SKETCH_COLUMNS}))
+    db.session.add(Hubfile(name="cars.csv", checksum="c", size=1, data_set_id=dataset.id, sketches=sketches.to_bytes()))
+    db.session.commit()
+
+    monkeypatch.setattr(DataSetService, "_read_coches", lambda *args: pytest.fail("inherited files are not reparsed"))
+
+    new_version = create_version(tmp_path, dataset, user.id, doi="10.1234/versioned.cars.v2")
+
+    assert [file.sketches for file in new_version.files] == [sketches.to_bytes()]
+    assert CocheService().distributions(new_version, ["asientos"], [0.5])["columns"]["asientos"]["count"] == 1
@@ -3,12 +3,17 @@ import tempfile
 from datetime import datetime
 
 import pytest
+from flask import current_app
+from sqlalchemy import event
 
 from app import db
 from app.modules.auth.models import User
 from app.modules.conftest import login, logout
-from app.modules.dataset.models import Coche, CSVDataSet, DSMetaData, PublicationType
+from app.modules.dataset.models import Author, Coche, CSVDataSet, DSMetaData, DSMetrics, PublicationType
+from app.modules.dataset.repositories import DataSetRepository
 from app.modules.dataset.services import DataSetService
+from app.modules.explore.repositories import ExploreRepository
+from app.modules.hubfile.models import Hubfile
 
 
 def create_metadata():
@@ -1323,3 +1328,137 @@ Model3,Brand,1.5 VTEC,Invalid,Gasolina,2018,,2,2,2216,395,País,26050,MAT0003,06
         assert consumption_avg == pytest.approx(4.95, 0.01)
     finally:
         os.remove(temp_path)
+
+
+# ==================== QUERY COUNT TESTS ====================
+
+
+def create_listed_dataset(user_id, index):
+    """Helper to create a synchronized dataset with metrics, authors and files"""
+    metadata = DSMetaData(
+        title=f"Listed Dataset {index}",
+        description="Listed",
+        publication_type=PublicationType.SOLD_CARS,
+        dataset_doi=f"10.1234/listed.{index}",
+        tags="sold,cars",
+        ds_metrics=DSMetrics(number_of_models="2", number_of_features="15"),
+    )
+    metadata.authors = [Author(name=f"Author {index}"), Author(name="Shared Author")]
+    db.session.add(metadata)
+    db.session.flush()
+
+    dataset = CSVDataSet(user_id=user_id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.flush()
+
+    for j in range(2):
+        db.session.add(Hubfile(name=f"listed_{index}_{j}.csv", checksum="abc", size=1024, data_set_id=dataset.id))
+    db.session.commit()
+
+
+def count_listing_statements(list_datasets):
+    """Count the SQL statements needed to list and serialize datasets"""
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    db.session.expire_all()
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        with current_app.test_request_context():
+            serialized = [dataset.to_dict() for dataset in list_datasets()]
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    return len(statements), len(serialized)
+
+
+@pytest.mark.parametrize(
+    "list_datasets",
+    [
+        lambda: ExploreRepository().filter(),
+        lambda: ExploreRepository().filter_page(page_size=50)[0],
+        lambda: DataSetRepository().get_synchronized(User.query.filter_by(email="test@example.com").first().id),
+    ],
+    ids=["explore", "explore_page", "synchronized"],
+)
+def test_listing_runs_constant_number_of_queries(test_client, list_datasets):
+    """Test that listing datasets does not issue one query per dataset (no N+1)"""
+    user = User.query.filter_by(email="test@example.com").first()
+
+    create_listed_dataset(user.id, f"{id(list_datasets)}-a")
+    few_statements, few_results = count_listing_statements(list_datasets)
+
+    for i in range(3):
+        create_listed_dataset(user.id, f"{id(list_datasets)}-b{i}")
+    many_statements, many_results = count_listing_statements(list_datasets)
+
+    assert many_results > few_results
+    assert many_statements == few_statements
+
+
+# ============================================================================
+# FACET TESTS
+# ============================================================================
+
+
+def create_faceted_dataset(user_id, title, publication_type, tags, engine_size, consumption):
+    """Helper to create a synchronized dataset with the fields used by the explore facets"""
+    metadata = DSMetaData(
+        title=title,
+        description="Faceted",
+        publication_type=publication_type,
+        dataset_doi=f"10.1234/{title.replace(' ', '.')}",
+        tags=tags,
+        ds_metrics=DSMetrics(average_engine_size=engine_size, average_consumption=consumption),
+    )
+    db.session.add(metadata)
+    db.session.flush()
+
+    dataset = CSVDataSet(user_id=user_id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.commit()
+    return dataset
+
+
+def test_facets_are_computed_in_one_query(test_client):
+    """Test that every facet is counted from a single query under the current filter"""
+    from app.modules.community.models import Community, CommunityDataset
+    from app.modules.explore.services import fold_facets
+
+    user = User.query.filter_by(email="test@example.com").first()
+    first = create_faceted_dataset(user.id, "Facet One", PublicationType.REGISTERED_CARS, "suv, Diesel", 1.4, 5.5)
+    second = create_faceted_dataset(user.id, "Facet Two", PublicationType.REGISTERED_CARS, "suv", 2.5, 8.0)
+    create_faceted_dataset(user.id, "Facet Three", PublicationType.SOLD_CARS, "diesel", 3.5, None)
+
+    community = Community(name="Facet community")
+    db.session.add(community)
+    db.session.flush()
+    for dataset in (first, second):
+        db.session.add(CommunityDataset(community_id=community.id, dataset_id=dataset.id, assigned_by=user.id))
+    db.session.commit()
+
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(db.engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        rows = ExploreRepository().facet_rows(title="Facet")
+    finally:
+        event.remove(db.engine, "before_cursor_execute", before_cursor_execute)
+
+    facets = fold_facets(rows)
+    assert len(statements) == 1
+    assert facets["total"] == 3
+    assert facets["publication_type"] == {"registered": 2, "sold": 1}
+    assert facets["community"] == {str(community.id): 2}
+    assert facets["tags"] == {"diesel": 2, "suv": 2}
+    assert [bucket["count"] for bucket in facets["engine_size"]] == [0, 1, 0, 1, 1]
+    assert [bucket["count"] for bucket in facets["consumption"]] == [0, 1, 1, 0, 0]
+
+    registered = fold_facets(ExploreRepository().facet_rows(title="Facet", publication_type="registered"))
+    assert registered["total"] == 2
+    assert registered["tags"] == {"diesel": 1, "suv": 2}
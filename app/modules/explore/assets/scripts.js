@@ -2,6 +2,16 @@ document.addEventListener('DOMContentLoaded', () => {
     send_query();
 });
 
+const SEARCH_DEBOUNCE_MS = 300;
+const SUGGEST_DEBOUNCE_MS = 100;
+// Filters on the attributes of the cars, answered from the per-dataset zone maps
+const CAR_FILTERS = ['marca', 'combustible', 'pais', 'year_min', 'year_max', 'price_min', 'price_max'];
+
+let nextCursor = null;
+let loadingPage = false;
+let searchTimer = null;
+let searchController = null;
+
 function send_query() {
 
     console.log("send query...")
@@ -13,136 +23,287 @@ function send_query() {
     const filters = document.querySelectorAll('#filters input, #filters select, #filters [type="radio"]');
 
     filters.forEach(filter => {
-        filter.addEventListener('input', () => {
-            const csrfToken = document.getElementById('csrf_token').value;
-
-            const searchCriteria = {
-                csrf_token: csrfToken,
-                title: document.querySelector('#title').value,
-                author: document.querySelector('#author').value,
-                tags: document.querySelector('#tags').value,
-                community: document.querySelector('#community').value,
-                publication_type: document.querySelector('#publication_type').value,
-                date_from: document.querySelector('#date_from').value,
-                date_to: document.querySelector('#date_to').value,
-                engine_size_min: document.querySelector('#engine_size_min').value,
-                engine_size_max: document.querySelector('#engine_size_max').value,
-                consumption_min: document.querySelector('#consumption_min').value,
-                consumption_max: document.querySelector('#consumption_max').value,
-                sorting: document.querySelector('[name="sorting"]:checked').value,
-            };
-
-            console.log(document.querySelector('#publication_type').value);
-
-            fetch('/explore', {
-                method: 'POST',
-                headers: {
-                    'Content-Type': 'application/json',
-                },
-                body: JSON.stringify(searchCriteria),
-            })
-                .then(response => response.json())
-                .then(data => {
-
-                    console.log(data);
-                    document.getElementById('results').innerHTML = '';
-
-                    // results counter
-                    const resultCount = data.length;
-                    const resultText = resultCount === 1 ? 'dataset' : 'datasets';
-                    document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
-
-                    if (resultCount === 0) {
-                        console.log("show not found icon");
-                        document.getElementById("results_not_found").style.display = "block";
-                    } else {
-                        document.getElementById("results_not_found").style.display = "none";
-                    }
-
-
-                    data.forEach(dataset => {
-                        let card = document.createElement('div');
-                        card.className = 'col-12';
-                        card.innerHTML = `
-                            <div class="card">
-                                <div class="card-body">
-                                    <div class="d-flex align-items-center justify-content-between">
-                                        <h3><a href="${dataset.url}">${dataset.title}</a></h3>
-                                        <div>
-                                            <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
-                                        </div>
-                                    </div>
-                                    <p class="text-secondary">${formatDate(dataset.created_at)}</p>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Description
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <p class="card-text">${dataset.description}</p>
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Authors
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.authors.map(author => `
-                                                <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
-                                            `).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row mb-2">
-
-                                        <div class="col-md-4 col-12">
-                                            <span class=" text-secondary">
-                                                Tags
-                                            </span>
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
-                                        </div>
-
-                                    </div>
-
-                                    <div class="row">
-
-                                        <div class="col-md-4 col-12">
-
-                                        </div>
-                                        <div class="col-md-8 col-12">
-                                            <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                View dataset
-                                            </a>
-                                            <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
-                                                Download (${dataset.total_size_in_human_format})
-                                            </a>
-                                        </div>
-
-
-                                    </div>
-
-                                </div>
-                            </div>
-                        `;
-
-                        document.getElementById('results').appendChild(card);
-                    });
-                });
+        filter.addEventListener('input', schedule_search);
+    });
+
+    ['title', 'author', 'tags', 'marca'].forEach(field => {
+        const input = document.getElementById(field);
+        let suggestTimer = null;
+        input.addEventListener('input', () => {
+            clearTimeout(suggestTimer);
+            suggestTimer = setTimeout(() => load_suggestions(field, input), SUGGEST_DEBOUNCE_MS);
+        });
+    });
+
+    // Infinite scroll: fetch the next page when the sentinel below the results becomes visible
+    const observer = new IntersectionObserver(entries => {
+        if (entries.some(entry => entry.isIntersecting) && nextCursor && !loadingPage) {
+            load_page(nextCursor);
+        }
+    });
+    observer.observe(document.getElementById('results_sentinel'));
+}
+
+function get_search_criteria() {
+    const csrfToken = document.getElementById('csrf_token').value;
+
+    const criteria = {
+        csrf_token: csrfToken,
+        title: document.querySelector('#title').value,
+        author: document.querySelector('#author').value,
+        tags: document.querySelector('#tags').value,
+        community: document.querySelector('#community').value,
+        publication_type: document.querySelector('#publication_type').value,
+        date_from: document.querySelector('#date_from').value,
+        date_to: document.querySelector('#date_to').value,
+        engine_size_min: document.querySelector('#engine_size_min').value,
+        engine_size_max: document.querySelector('#engine_size_max').value,
+        consumption_min: document.querySelector('#consumption_min').value,
+        consumption_max: document.querySelector('#consumption_max').value,
+        sorting: document.querySelector('[name="sorting"]:checked').value,
+    };
+    CAR_FILTERS.forEach(field => {
+        criteria[field] = document.getElementById(field).value;
+    });
+    return criteria;
+}
+
+// Fill the datalist of an input with the most popular values starting with what was typed.
+// Tags are comma-separated, so only the last one is completed.
+function load_suggestions(field, input) {
+    const parts = input.value.split(',');
+    const prefix = field === 'tags' ? parts.pop().trim() : input.value.trim();
+    const datalist = document.getElementById(`${field}_suggestions`);
+
+    if (!prefix) {
+        datalist.innerHTML = '';
+        return;
+    }
+
+    const params = new URLSearchParams({field: field, prefix: prefix});
+    fetch(`/explore/suggest?${params}`)
+        .then(response => response.json())
+        .then(data => {
+            const head = field === 'tags' && parts.length ? `${parts.join(',')}, ` : '';
+            datalist.innerHTML = '';
+            data.suggestions.forEach(suggestion => {
+                const option = document.createElement('option');
+                option.value = head + suggestion.value;
+                option.label = `${suggestion.value} (${suggestion.count})`;
+                datalist.appendChild(option);
+            });
+        })
+        .catch(error => console.error(error));
+}
+
+// Wait until the user stops typing before searching, so a word sends one request instead of one per key
+function schedule_search() {
+    clearTimeout(searchTimer);
+    searchTimer = setTimeout(() => load_page(null), SEARCH_DEBOUNCE_MS);
+}
+
+function load_page(cursor) {
+    const searchCriteria = get_search_criteria();
+    searchCriteria.cursor = cursor;
+
+    // Cancel the request in flight: its response belongs to criteria the user already changed
+    if (searchController) {
+        searchController.abort();
+    }
+    const controller = new AbortController();
+    searchController = controller;
+
+    loadingPage = true;
+
+    fetch('/explore', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(searchCriteria),
+        signal: controller.signal,
+    })
+        .then(response => response.json())
+        .then(data => {
+
+            console.log(data);
+
+            // A new search (no cursor) replaces the results, following pages are appended
+            if (!cursor) {
+                document.getElementById('results').innerHTML = '';
+            }
+            nextCursor = data.next_cursor;
+
+            // results counter
+            const resultCount = data.total;
+            const resultText = resultCount === 1 ? 'dataset' : 'datasets';
+            document.getElementById('results_number').textContent = `${resultCount} ${resultText} found`;
+
+            if (resultCount === 0) {
+                console.log("show not found icon");
+                document.getElementById("results_not_found").style.display = "block";
+            } else {
+                document.getElementById("results_not_found").style.display = "none";
+            }
+
+            data.items.forEach(dataset => {
+                document.getElementById('results').appendChild(render_dataset(dataset));
+            });
+        })
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error(error);
+            }
+        })
+        .finally(() => {
+            if (searchController === controller) {
+                searchController = null;
+                loadingPage = false;
+            }
         });
+
+    // Facet counts only change with the criteria, not with the page
+    if (!cursor) {
+        load_facets(searchCriteria, controller.signal);
+    }
+}
+
+function load_facets(searchCriteria, signal) {
+    fetch('/explore/facets', {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/json',
+        },
+        body: JSON.stringify(searchCriteria),
+        signal: signal,
+    })
+        .then(response => response.json())
+        .then(render_facets)
+        .catch(error => {
+            if (error.name !== 'AbortError') {
+                console.error(error);
+            }
+        });
+}
+
+function render_facets(facets) {
+    set_option_counts('#publication_type', facets.publication_type);
+    set_option_counts('#community', facets.community);
+
+    document.getElementById('tag_facets').innerHTML = Object.entries(facets.tags)
+        .map(([tag, count]) => `<span class="badge bg-secondary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag} (${count})</span>`)
+        .join('');
+
+    render_range_facets('engine_size_facets', facets.engine_size, 'engine_size_min', 'engine_size_max');
+    render_range_facets('consumption_facets', facets.consumption, 'consumption_min', 'consumption_max');
+}
+
+// Append "(count)" to the options of a select, keeping the original label to rewrite it on every search
+function set_option_counts(selector, counts) {
+    document.querySelectorAll(`${selector} option`).forEach(option => {
+        if (!option.dataset.label) {
+            option.dataset.label = option.text;
+        }
+        option.text = option.value ? `${option.dataset.label} (${counts[option.value] || 0})` : option.dataset.label;
     });
 }
 
+function render_range_facets(containerId, buckets, minInputId, maxInputId) {
+    document.getElementById(containerId).innerHTML = buckets
+        .filter(bucket => bucket.count > 0)
+        .map(bucket => {
+            const label = bucket.max === null ? `${bucket.min}+` : `${bucket.min} - ${bucket.max}`;
+            return `<span class="badge bg-secondary me-1" style="cursor: pointer;" onclick="set_range_as_query('${minInputId}', '${maxInputId}', ${bucket.min}, ${bucket.max})">${label} (${bucket.count})</span>`;
+        })
+        .join('');
+}
+
+function set_range_as_query(minInputId, maxInputId, min, max) {
+    document.getElementById(minInputId).value = min;
+    const maxInput = document.getElementById(maxInputId);
+    maxInput.value = max === null ? '' : max;
+    maxInput.dispatchEvent(new Event('input', {bubbles: true}));
+}
+
+function render_dataset(dataset) {
+    let card = document.createElement('div');
+    card.className = 'col-12';
+    card.innerHTML = `
+        <div class="card">
+            <div class="card-body">
+                <div class="d-flex align-items-center justify-content-between">
+                    <h3><a href="${dataset.url}">${dataset.title}</a></h3>
+                    <div>
+                        <span class="badge bg-primary" style="cursor: pointer;" onclick="set_publication_type_as_query('${dataset.publication_type}')">${dataset.publication_type}</span>
+                    </div>
+                </div>
+                <p class="text-secondary">${formatDate(dataset.created_at)}</p>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Description
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        <p class="card-text">${dataset.description}</p>
+                    </div>
+
+                </div>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Authors
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        ${dataset.authors.map(author => `
+                            <p class="p-0 m-0">${author.name}${author.affiliation ? ` (${author.affiliation})` : ''}${author.orcid ? ` (${author.orcid})` : ''}</p>
+                        `).join('')}
+                    </div>
+
+                </div>
+
+                <div class="row mb-2">
+
+                    <div class="col-md-4 col-12">
+                        <span class=" text-secondary">
+                            Tags
+                        </span>
+                    </div>
+                    <div class="col-md-8 col-12">
+                        ${dataset.tags.map(tag => `<span class="badge bg-primary me-1" style="cursor: pointer;" onclick="set_tag_as_query('${tag}')">${tag}</span>`).join('')}
+                    </div>
+
+                </div>
+
+                <div class="row">
+
+                    <div class="col-md-4 col-12">
+
+                    </div>
+                    <div class="col-md-8 col-12">
+                        <a href="${dataset.url}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                            View dataset
+                        </a>
+                        <a href="/dataset/download/${dataset.id}" class="btn btn-outline-primary btn-sm" id="search" style="border-radius: 5px;">
+                            Download (${dataset.total_size_in_human_format})
+                        </a>
+                    </div>
+
+
+                </div>
+
+            </div>
+        </div>
+    `;
+
+    return card;
+}
+
 function formatDate(dateString) {
     const options = {day: 'numeric', month: 'long', year: 'numeric', hour: 'numeric', minute: 'numeric'};
     const date = new Date(dateString);
@@ -150,9 +311,9 @@ function formatDate(dateString) {
 }
 
 function set_tag_as_query(tagName) {
-    const queryInput = document.getElementById('query');
-    queryInput.value = tagName.trim();
-    queryInput.dispatchEvent(new Event('input', {bubbles: true}));
+    const tagsInput = document.getElementById('tags');
+    tagsInput.value = tagName.trim();
+    tagsInput.dispatchEvent(new Event('input', {bubbles: true}));
 }
 
 function set_publication_type_as_query(publicationType) {
@@ -209,6 +370,11 @@ function clearFilters() {
     let consumptionMaxInput = document.querySelector('#consumption_max');
     consumptionMaxInput.value = ""; 
 
+    // Reset car attribute fields
+    CAR_FILTERS.forEach(field => {
+        document.getElementById(field).value = "";
+    });
+
     // Reset the sorting option
     let sortingOptions = document.querySelectorAll('[name="sorting"]');
     sortingOptions.forEach(option => {
@@ -289,6 +455,13 @@ document.addEventListener('DOMContentLoaded', () => {
         consumptionMaxInput.value = consumptionMaxParam;
     }
 
+    CAR_FILTERS.forEach(field => {
+        const param = urlParams.get(field);
+        if (param && param.trim() !== '') {
+            document.getElementById(field).value = param;
+        }
+    });
+
     const titleInput = document.getElementById('title');
     titleInput.dispatchEvent(new Event('input', {bubbles: true}));
 });
\ No newline at end of file
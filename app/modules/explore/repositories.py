@@ -1,15 +1,252 @@
 from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from sqlalchemy import String, and_, case, cast, distinct, exists, func, literal, null, or_, orm, select, union_all
 
 from app.modules.community.models import CommunityDataset
-from app.modules.dataset.models import Author, DataSet, DSMetaData, DSMetrics, PublicationType
+from app.modules.dataset.models import (
+    CAR_DICTIONARIES,
+    Author,
+    Coche,
+    DataSet,
+    DSMetaData,
+    DSMetrics,
+    DSZoneMap,
+    PublicationType,
+)
+from app.modules.dataset.repositories import dataset_loader_options
+from core.database.routing import replica_reads
 from core.repositories.BaseRepository import BaseRepository
+from core.serialisers.cursor import decode_cursor, encode_cursor
+
+# Parsers of the (created_at, id) keyset position of the dataset lists
+DATASET_POSITION = (datetime.fromisoformat, int)
+
+
+def dataset_cursor(dataset: DataSet) -> str:
+    """Cursor of the (created_at, id) keyset position of a dataset"""
+    return encode_cursor(dataset.created_at, dataset.id)
+
+
+# Bucket edges of the numeric facets; the last bucket is open-ended
+ENGINE_SIZE_BUCKETS = (0.0, 1.2, 1.6, 2.0, 3.0)
+CONSUMPTION_BUCKETS = (0.0, 5.0, 7.0, 9.0, 12.0)
+
+
+def bucket_index(column, edges):
+    """Index of the bucket of `edges` holding the value of `column`; NULL if missing or below the first edge"""
+    return case(*((column >= edge, index) for index, edge in reversed(list(enumerate(edges)))), else_=None)
+
+
+CAR_FILTER_FIELDS = ("marca", "combustible", "pais", "year_min", "year_max", "price_min", "price_max")
+
+
+def car_attribute_conditions(
+    marca="", combustible="", pais="", year_min="", year_max="", price_min="", price_max="", **kwargs
+) -> Tuple[list, list]:
+    """
+    Conditions of the car-attribute filters, both on the dataset zone maps and on the cars
+    themselves. Values that cannot be parsed are ignored, like the other explore filters.
+
+    A single condition is decided by the zone map alone (the dataset has a car of that make,
+    its max year is after the lower bound...); several must hold for the same car, so the
+    zone map only prunes and the surviving datasets are checked against `coche`.
+    """
+
+    def to_int(value):
+        try:
+            return int(float(value)) if value not in (None, "") else None
+        except (TypeError, ValueError):
+            return None
+
+    zone_conditions, car_conditions = [], []
+    for value, zone_column, name in (
+        (marca, DSZoneMap.marcas, "marca"),
+        (combustible, DSZoneMap.combustibles, "combustible"),
+        (pais, DSZoneMap.paises, "pais_de_origen"),
+    ):
+        value = str(value or "").strip().lower()
+        if value:
+            zone_conditions.append(zone_column.contains(f"|{value}|", autoescape=True))
+            # Every spelling of the value in the dictionary, so the match ignores case
+            car_conditions.append(getattr(Coche, f"{name}_id").in_(CAR_DICTIONARIES[name].ids_matching(value)))
+
+    for low, high, min_column, max_column, car_column in (
+        (year_min, year_max, DSZoneMap.min_year, DSZoneMap.max_year, Coche.comienzo_de_produccion),
+        (price_min, price_max, DSZoneMap.min_price, DSZoneMap.max_price, Coche.precio_estimado),
+    ):
+        low, high = to_int(low), to_int(high)
+        if low is not None:
+            zone_conditions.append(max_column >= low)
+            car_conditions.append(car_column >= low)
+        if high is not None:
+            zone_conditions.append(min_column <= high)
+            car_conditions.append(car_column <= high)
+
+    return zone_conditions, car_conditions
 
 
 class ExploreRepository(BaseRepository):
     def __init__(self):
         super().__init__(DataSet)
 
-    def filter(
+    @replica_reads()
+    def filter(self, sorting="newest", **criteria) -> List[DataSet]:
+        query = self._build_query(**criteria).options(*dataset_loader_options("listing"))
+
+        # Order by created_at
+        if sorting == "oldest":
+            query = query.order_by(DataSet.created_at.asc())
+        else:
+            query = query.order_by(DataSet.created_at.desc())
+
+        return query.distinct().all()
+
+    @replica_reads()
+    def filter_page(
+        self, cursor: Optional[str] = None, page_size: int = 20, sorting="newest", **criteria
+    ) -> Tuple[List[DataSet], Optional[str]]:
+        """
+        Keyset-paginated variant of filter, ordered by (created_at, id).
+
+        Returns the datasets of the page and the cursor of the next page,
+        or None when this is the last one.
+        """
+        query = self._build_query(**criteria).options(*dataset_loader_options("listing"))
+        ascending = sorting == "oldest"
+
+        if cursor:
+            created_at, dataset_id = decode_cursor(cursor, DATASET_POSITION)
+            if ascending:
+                query = query.filter(
+                    or_(
+                        DataSet.created_at > created_at,
+                        and_(DataSet.created_at == created_at, DataSet.id > dataset_id),
+                    )
+                )
+            else:
+                query = query.filter(
+                    or_(
+                        DataSet.created_at < created_at,
+                        and_(DataSet.created_at == created_at, DataSet.id < dataset_id),
+                    )
+                )
+
+        if ascending:
+            query = query.order_by(DataSet.created_at.asc(), DataSet.id.asc())
+        else:
+            query = query.order_by(DataSet.created_at.desc(), DataSet.id.desc())
+
+        # Fetch one extra row to know whether there is a next page
+        datasets = query.distinct().limit(page_size + 1).all()
+        if len(datasets) > page_size:
+            datasets = datasets[:page_size]
+            return datasets, dataset_cursor(datasets[-1])
+        return datasets, None
+
+    @replica_reads()
+    def count_filtered(self, **criteria) -> int:
+        query = self._build_query(**criteria)
+        return query.with_entities(func.count(distinct(DataSet.id))).scalar() or 0
+
+    @replica_reads()
+    def get_listing_by_ids(self, dataset_ids: List[int]) -> List[DataSet]:
+        """Load the datasets with the given ids for listing, in the order of the ids"""
+        if not dataset_ids:
+            return []
+        datasets = DataSet.query.filter(DataSet.id.in_(dataset_ids)).options(*dataset_loader_options("listing")).all()
+        by_id = {dataset.id: dataset for dataset in datasets}
+        return [by_id[dataset_id] for dataset_id in dataset_ids if dataset_id in by_id]
+
+    def get_indexable(self, dataset_ids: Optional[List[int]] = None) -> List[DataSet]:
+        """Synchronized datasets (the ones explore can return), all of them or only the given ids"""
+        query = (
+            DataSet.query.join(DSMetaData)
+            .filter(DSMetaData.dataset_doi.isnot(None))
+            .options(
+                *dataset_loader_options("summary"),
+                orm.selectinload(DataSet.community_assignments),
+                orm.selectinload(DataSet.zone_map),
+            )
+        )
+        if dataset_ids is not None:
+            query = query.filter(DataSet.id.in_(dataset_ids))
+        return query.order_by(DataSet.id).all()
+
+    @replica_reads()
+    def get_car_values(self, dataset_ids: List[int]) -> dict:
+        """Distinct car makes, fuels and countries of each dataset: {dataset_id: (marcas, combustibles, paises)}"""
+        values = {dataset_id: (set(), set(), set()) for dataset_id in dataset_ids}
+        if not dataset_ids:
+            return values
+        rows = (
+            self.session.query(Coche.dataset_id, Coche.marca_id, Coche.combustible_id, Coche.pais_de_origen_id)
+            .filter(Coche.dataset_id.in_(dataset_ids))
+            .distinct()
+            .all()
+        )
+        names = ("marca", "combustible", "pais_de_origen")
+        decoded = [CAR_DICTIONARIES[name].decode_many(row[i + 1] for row in rows) for i, name in enumerate(names)]
+        for dataset_id, *ids in rows:
+            for i, id in enumerate(ids):
+                values[dataset_id][i].add(decoded[i][id])
+        return values
+
+    @replica_reads()
+    def get_car_model_counts(self, dataset_ids: Optional[List[int]] = None) -> dict:
+        """Number of cars of each (marca, modelo) per dataset: {dataset_id: [(marca, modelo, count)]}"""
+        query = self.session.query(Coche.dataset_id, Coche.marca_id, Coche.modelo, func.count(Coche.id)).group_by(
+            Coche.dataset_id, Coche.marca_id, Coche.modelo
+        )
+        if dataset_ids is not None:
+            query = query.filter(Coche.dataset_id.in_(dataset_ids))
+
+        rows = query.all()
+        marcas = CAR_DICTIONARIES["marca"].decode_many(marca_id for _, marca_id, _, _ in rows)
+        counts = {}
+        for dataset_id, marca_id, modelo, count in rows:
+            counts.setdefault(dataset_id, []).append((marcas[marca_id], modelo, count))
+        return counts
+
+    @replica_reads()
+    def facet_rows(self, **criteria) -> list:
+        """
+        (facet, value, count) rows with the number of matching datasets per value of every
+        facet, counted by a single query: one GROUP BY per facet over the matching datasets,
+        joined with UNION ALL. Tags are grouped by the tag string of the dataset and the
+        numeric facets by the index of their bucket; the "total" row has no value.
+        """
+        matching = (
+            self._build_query(**criteria)
+            .outerjoin(DSMetrics, DSMetaData.ds_metrics_id == DSMetrics.id)
+            .with_entities(
+                DataSet.id.label("dataset_id"),
+                DSMetaData.publication_type.label("publication_type"),
+                DSMetaData.tags.label("tags"),
+                bucket_index(DSMetrics.average_engine_size, ENGINE_SIZE_BUCKETS).label("engine_size"),
+                bucket_index(DSMetrics.average_consumption, CONSUMPTION_BUCKETS).label("consumption"),
+            )
+            .distinct()
+            .cte("matching")
+        )
+
+        def counts(facet, value, count=func.count(), source=matching):
+            value = cast(value, String)
+            select_ = select(literal(facet).label("facet"), value.label("value"), count.label("count"))
+            return select_.select_from(source).group_by(value)
+
+        # A dataset may appear in a community more than once; the other facets see it once
+        in_communities = matching.join(CommunityDataset, CommunityDataset.dataset_id == matching.c.dataset_id)
+        statement = union_all(
+            select(literal("total"), cast(null(), String), func.count()).select_from(matching),
+            counts(
+                "community", CommunityDataset.community_id, func.count(distinct(matching.c.dataset_id)), in_communities
+            ),
+            *(counts(facet, matching.c[facet]) for facet in ("publication_type", "tags", "engine_size", "consumption")),
+        )
+        return self.session.execute(statement).all()
+
+    def _build_query(
         self,
         title="",
         author="",
@@ -22,7 +259,7 @@ class ExploreRepository(BaseRepository):
         engine_size_max="",
         consumption_min="",
         consumption_max="",
-        sorting="newest",
+        author_names=None,
         **kwargs,
     ):
         # Start with base query that ensures dataset_doi is not null
@@ -32,8 +269,10 @@ class ExploreRepository(BaseRepository):
         if title:
             query = query.filter(DSMetaData.title.ilike(f"%{title}%"))
 
-        # Filter by author
-        if author:
+        # Filter by author: names resolved by the fuzzy author index, or a plain substring
+        if author_names is not None:
+            query = query.filter(DSMetaData.authors.any(Author.name.in_(author_names)))
+        elif author:
             query = query.outerjoin(Author).filter(Author.name.ilike(f"%{author}%"))
 
         # Filter by tags (comma-separated)
@@ -123,10 +362,24 @@ class ExploreRepository(BaseRepository):
             except ValueError:
                 pass
 
-        # Order by created_at
-        if sorting == "oldest":
-            query = query.order_by(DataSet.created_at.asc())
-        else:
-            query = query.order_by(DataSet.created_at.desc())
+        # Filter by car attributes (marca, combustible, pais, year and price ranges)
+        return self._filter_by_cars(query, **kwargs)
 
-        return query.distinct().all()
+    @staticmethod
+    def _filter_by_cars(query, **criteria):
+        zone_conditions, car_conditions = car_attribute_conditions(**criteria)
+        if not zone_conditions:
+            return query
+        query = query.join(DSZoneMap, DSZoneMap.dataset_id == DataSet.id).filter(*zone_conditions)
+        if len(car_conditions) > 1:
+            query = query.filter(exists().where(Coche.dataset_id == DataSet.id, *car_conditions))
+        return query
+
+    @replica_reads()
+    def car_matching_dataset_ids(self, **criteria) -> Optional[List[int]]:
+        """Ids of the datasets having a car that matches the car-attribute filters, or None without any"""
+        zone_conditions, _ = car_attribute_conditions(**criteria)
+        if not zone_conditions:
+            return None
+        query = self._filter_by_cars(self.session.query(DataSet.id), **criteria)
+        return [dataset_id for (dataset_id,) in query]
@@ -1,9 +1,10 @@
-from flask import jsonify, render_template, request
+from flask import render_template, request
 
 from app.modules.community.services import CommunityService
 from app.modules.explore import explore_bp
 from app.modules.explore.forms import ExploreForm
 from app.modules.explore.services import ExploreService
+from core.serialisers.encoding import encoded_response
 
 
 @explore_bp.route("/explore", methods=["GET", "POST"])
@@ -16,6 +17,30 @@ def index():
         return render_template("explore/index.html", form=form, query=query, communities=communities)
 
     if request.method == "POST":
-        criteria = request.get_json()
-        datasets = ExploreService().filter(**criteria)
-        return jsonify([dataset.to_dict() for dataset in datasets])
+        criteria = request.get_json() or {}
+        cursor = criteria.pop("cursor", None)
+        page_size = criteria.pop("page_size", None)
+
+        try:
+            page = ExploreService().search_page(cursor=cursor, page_size=page_size, **criteria)
+        except ValueError as exc:
+            return encoded_response({"message": str(exc)}, 400)
+
+        return encoded_response(page)
+
+
+@explore_bp.route("/explore/facets", methods=["POST"])
+def facets():
+    criteria = request.get_json() or {}
+    return encoded_response(ExploreService().facets(**criteria))
+
+
+@explore_bp.route("/explore/suggest", methods=["GET"])
+def suggest():
+    field = request.args.get("field", "")
+    prefix = request.args.get("prefix", "")
+    try:
+        suggestions = ExploreService().suggest(field, prefix, request.args.get("limit"))
+    except ValueError as exc:
+        return encoded_response({"message": str(exc)}, 400)
+    return encoded_response({"field": field, "prefix": prefix, "suggestions": suggestions})
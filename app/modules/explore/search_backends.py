@@ -0,0 +1,488 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from flask import current_app, has_app_context
+
+from app.modules.dataset.models import CAR_DICTIONARIES, DataSet, PublicationType
+from app.modules.explore.repositories import DATASET_POSITION, ExploreRepository, car_attribute_conditions
+from core.serialisers.cursor import decode_cursor, encode_cursor
+
+logger = logging.getLogger(__name__)
+
+INDEX_MAPPING = {
+    "properties": {
+        "id": {"type": "integer"},
+        "title": {"type": "text", "fields": {"keyword": {"type": "keyword"}}},
+        "description": {"type": "text"},
+        "authors": {"type": "keyword"},
+        "tags": {"type": "keyword"},
+        "tags_text": {"type": "keyword"},
+        "community_ids": {"type": "integer"},
+        "publication_type": {"type": "keyword"},
+        "created_at": {"type": "date"},
+        "average_engine_size": {"type": "float"},
+        "average_consumption": {"type": "float"},
+        "marcas": {"type": "keyword"},
+        "combustibles": {"type": "keyword"},
+        "paises": {"type": "keyword"},
+        "min_year": {"type": "integer"},
+        "max_year": {"type": "integer"},
+        "min_price": {"type": "integer"},
+        "max_price": {"type": "integer"},
+    }
+}
+
+
+def parse_criteria(
+    title="",
+    author="",
+    tags="",
+    community="",
+    publication_type="",
+    date_from="",
+    date_to="",
+    engine_size_min="",
+    engine_size_max="",
+    consumption_min="",
+    consumption_max="",
+    marca="",
+    combustible="",
+    pais="",
+    year_min="",
+    year_max="",
+    price_min="",
+    price_max="",
+    author_names=None,
+    dataset_ids=None,
+    **kwargs,
+) -> dict:
+    """
+    Typed version of the explore criteria, with the same leniency as the database query:
+    values that cannot be parsed are ignored instead of failing the search. Car makes,
+    fuels and countries become every spelling of the value in their dictionary, so they
+    match ignoring case like the database query.
+    """
+
+    def to_float(value):
+        try:
+            return float(value) if value else None
+        except ValueError:
+            return None
+
+    def to_int(value):
+        try:
+            return int(float(value)) if value else None
+        except ValueError:
+            return None
+
+    def spellings(name, value):
+        value = value.strip()
+        if not value:
+            return None
+        dictionary = CAR_DICTIONARIES[name]
+        return set(dictionary.decode_many(dictionary.ids_matching(value)).values())
+
+    def to_date(value):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d") if value else None
+        except ValueError:
+            return None
+
+    parsed = {
+        "title": title.lower() or None,
+        "author": author.lower() or None,
+        "author_names": set(author_names) if author_names is not None else None,
+        "tags": [tag.strip().lower() for tag in tags.split(",")] if tags else [],
+        "community": None,
+        "publication_type": None,
+        "date_from": to_date(date_from),
+        "date_to": to_date(date_to),
+        "engine_size": (to_float(engine_size_min), to_float(engine_size_max)),
+        "consumption": (to_float(consumption_min), to_float(consumption_max)),
+        "marcas": spellings("marca", marca),
+        "combustibles": spellings("combustible", combustible),
+        "paises": spellings("pais_de_origen", pais),
+        "year": (to_int(year_min), to_int(year_max)),
+        "price": (to_int(price_min), to_int(price_max)),
+        "dataset_ids": set(dataset_ids) if dataset_ids is not None else None,
+    }
+    if parsed["date_to"] is not None:
+        parsed["date_to"] += timedelta(days=1)
+    if community:
+        try:
+            parsed["community"] = int(community)
+        except ValueError:
+            pass
+    if publication_type:
+        for enum_member in PublicationType:
+            if enum_member.value.lower() == publication_type.lower():
+                parsed["publication_type"] = enum_member.value
+    return parsed
+
+
+def build_document(dataset: DataSet, marcas=(), combustibles=(), paises=()) -> dict:
+    metadata = dataset.ds_meta_data
+    metrics = metadata.ds_metrics
+    zone_map = dataset.zone_map
+    return {
+        "id": dataset.id,
+        "title": metadata.title,
+        "description": metadata.description,
+        "authors": [author.name for author in metadata.authors],
+        "tags": [tag.strip() for tag in (metadata.tags or "").split(",") if tag.strip()],
+        "tags_text": metadata.tags or "",
+        "community_ids": [assignment.community_id for assignment in dataset.community_assignments],
+        "publication_type": metadata.publication_type.value,
+        "created_at": dataset.created_at,
+        "average_engine_size": metrics.average_engine_size if metrics else None,
+        "average_consumption": metrics.average_consumption if metrics else None,
+        "marcas": sorted(marcas),
+        "combustibles": sorted(combustibles),
+        "paises": sorted(paises),
+        "min_year": zone_map.min_year if zone_map else None,
+        "max_year": zone_map.max_year if zone_map else None,
+        "min_price": zone_map.min_price if zone_map else None,
+        "max_price": zone_map.max_price if zone_map else None,
+    }
+
+
+class SearchBackend:
+    """
+    Answers the explore queries. Every backend returns the same datasets, in the same
+    order, for the same criteria; they differ in where the matching is done.
+    """
+
+    def filter(self, sorting="newest", **criteria) -> List[DataSet]:
+        raise NotImplementedError
+
+    def filter_page(
+        self, cursor: Optional[str] = None, page_size: int = 20, sorting="newest", **criteria
+    ) -> Tuple[List[DataSet], Optional[str]]:
+        raise NotImplementedError
+
+    def count_filtered(self, **criteria) -> int:
+        raise NotImplementedError
+
+    def refresh(self, dataset_ids: List[int]):
+        """Bring the given datasets up to date after they were created or modified"""
+
+    def reindex(self) -> int:
+        """Rebuild the whole index, returning the number of indexed datasets"""
+        return 0
+
+
+class DatabaseSearchBackend(SearchBackend):
+    """Searches MariaDB directly through ExploreRepository; there is no index to maintain"""
+
+    def __init__(self, repository: ExploreRepository = None):
+        self.repository = repository or ExploreRepository()
+
+    def filter(self, sorting="newest", **criteria):
+        return self.repository.filter(sorting=sorting, **criteria)
+
+    def filter_page(self, cursor=None, page_size=20, sorting="newest", **criteria):
+        return self.repository.filter_page(cursor=cursor, page_size=page_size, sorting=sorting, **criteria)
+
+    def count_filtered(self, **criteria):
+        return self.repository.count_filtered(**criteria)
+
+
+class DocumentSearchBackend(SearchBackend):
+    """
+    Base of the backends searching an index of dataset documents. They only return
+    (created_at, id) hits; the datasets themselves are then loaded from the database.
+    """
+
+    def __init__(self, repository: ExploreRepository = None):
+        self.repository = repository or ExploreRepository()
+
+    def search_hits(self, criteria: dict, sorting="newest", after=None, limit=None) -> List[Tuple[datetime, int]]:
+        raise NotImplementedError
+
+    def count_hits(self, criteria: dict) -> int:
+        raise NotImplementedError
+
+    def parse(self, criteria: dict) -> dict:
+        """
+        parse_criteria. Documents hold the same summary of the cars as the zone maps, which
+        decides a single car-attribute filter; several must hold for the same car, which only
+        `coche` knows, so only then are the matching datasets looked up in the database.
+        """
+        _, car_conditions = car_attribute_conditions(**criteria)
+        dataset_ids = self.repository.car_matching_dataset_ids(**criteria) if len(car_conditions) > 1 else None
+        return parse_criteria(dataset_ids=dataset_ids, **criteria)
+
+    def filter(self, sorting="newest", **criteria):
+        hits = self.search_hits(self.parse(criteria), sorting=sorting)
+        return self.repository.get_listing_by_ids([dataset_id for _, dataset_id in hits])
+
+    def filter_page(self, cursor=None, page_size=20, sorting="newest", **criteria):
+        after = decode_cursor(cursor, DATASET_POSITION) if cursor else None
+        hits = self.search_hits(self.parse(criteria), sorting=sorting, after=after, limit=page_size + 1)
+
+        next_cursor = None
+        if len(hits) > page_size:
+            hits = hits[:page_size]
+            next_cursor = encode_cursor(*hits[-1])
+        return self.repository.get_listing_by_ids([dataset_id for _, dataset_id in hits]), next_cursor
+
+    def count_filtered(self, **criteria):
+        return self.count_hits(self.parse(criteria))
+
+    def build_documents(self, dataset_ids: Optional[List[int]] = None) -> List[dict]:
+        datasets = self.repository.get_indexable(dataset_ids)
+        car_values = self.repository.get_car_values([dataset.id for dataset in datasets])
+        return [build_document(dataset, *car_values[dataset.id]) for dataset in datasets]
+
+
+class InMemorySearchBackend(DocumentSearchBackend):
+    """
+    Keeps the documents in a dict of the process. Meant for development and tests: it
+    implements the same semantics as the Elasticsearch backend without a server.
+    """
+
+    def __init__(self, repository: ExploreRepository = None):
+        super().__init__(repository)
+        self.documents = None
+
+    def _documents(self) -> dict:
+        if self.documents is None:
+            self.reindex()
+        return self.documents
+
+    def reindex(self):
+        self.documents = {document["id"]: document for document in self.build_documents()}
+        return len(self.documents)
+
+    def refresh(self, dataset_ids):
+        if self.documents is None:
+            return
+        for dataset_id in dataset_ids:
+            self.documents.pop(dataset_id, None)
+        for document in self.build_documents(list(dataset_ids)):
+            self.documents[document["id"]] = document
+
+    @staticmethod
+    def _in_range(value, bounds) -> bool:
+        low, high = bounds
+        if low is None and high is None:
+            return True
+        if value is None:
+            return False
+        return (low is None or value >= low) and (high is None or value <= high)
+
+    def _matches(self, document: dict, criteria: dict) -> bool:
+        if criteria["dataset_ids"] is not None and document["id"] not in criteria["dataset_ids"]:
+            return False
+        if criteria["title"] and criteria["title"] not in document["title"].lower():
+            return False
+        if criteria["author_names"] is not None:
+            if not criteria["author_names"].intersection(document["authors"]):
+                return False
+        elif criteria["author"] and not any(criteria["author"] in name.lower() for name in document["authors"]):
+            return False
+        if any(tag not in document["tags_text"].lower() for tag in criteria["tags"]):
+            return False
+        if criteria["community"] is not None and criteria["community"] not in document["community_ids"]:
+            return False
+        if criteria["publication_type"] and document["publication_type"] != criteria["publication_type"]:
+            return False
+        if criteria["date_from"] and document["created_at"] < criteria["date_from"]:
+            return False
+        if criteria["date_to"] and document["created_at"] >= criteria["date_to"]:
+            return False
+        for field in ("marcas", "combustibles", "paises"):
+            if criteria[field] is not None and criteria[field].isdisjoint(document[field]):
+                return False
+        for field in ("year", "price"):
+            low, high = criteria[field]
+            if low is not None and not self._in_range(document[f"max_{field}"], (low, None)):
+                return False
+            if high is not None and not self._in_range(document[f"min_{field}"], (None, high)):
+                return False
+        return self._in_range(document["average_engine_size"], criteria["engine_size"]) and self._in_range(
+            document["average_consumption"], criteria["consumption"]
+        )
+
+    def search_hits(self, criteria, sorting="newest", after=None, limit=None):
+        descending = sorting != "oldest"
+        hits = sorted(
+            (
+                (document["created_at"], document["id"])
+                for document in self._documents().values()
+                if self._matches(document, criteria)
+            ),
+            reverse=descending,
+        )
+        if after is not None:
+            hits = [hit for hit in hits if (hit < after if descending else hit > after)]
+        return hits[:limit] if limit is not None else hits
+
+    def count_hits(self, criteria):
+        return sum(1 for document in self._documents().values() if self._matches(document, criteria))
+
+
+def _wildcard(value: str) -> str:
+    escaped = value.replace("\\", "\\\\").replace("*", "\\*").replace("?", "\\?")
+    return f"*{escaped}*"
+
+
+def _epoch_millis(value: datetime) -> int:
+    return int(value.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+
+class ElasticsearchSearchBackend(DocumentSearchBackend):
+    """
+    Searches an Elasticsearch index of dataset documents, kept up to date by `refresh`
+    and rebuilt with `reindex` (rosemary search:reindex).
+    """
+
+    BULK_CHUNK_SIZE = 500
+
+    def __init__(self, client, index: str = "datasets", repository: ExploreRepository = None):
+        super().__init__(repository)
+        self.client = client
+        self.index = index
+
+    @classmethod
+    def from_config(cls, config):
+        from elasticsearch import Elasticsearch
+
+        return cls(Elasticsearch(config["ELASTICSEARCH_URL"]), index=config["ELASTICSEARCH_INDEX"])
+
+    def build_query(self, criteria: dict) -> dict:
+        filters = []
+        if criteria["dataset_ids"] is not None:
+            filters.append({"terms": {"id": sorted(criteria["dataset_ids"])}})
+        if criteria["title"]:
+            filters.append(
+                {"wildcard": {"title.keyword": {"value": _wildcard(criteria["title"]), "case_insensitive": True}}}
+            )
+        if criteria["author_names"] is not None:
+            filters.append({"terms": {"authors": sorted(criteria["author_names"])}})
+        elif criteria["author"]:
+            filters.append(
+                {"wildcard": {"authors": {"value": _wildcard(criteria["author"]), "case_insensitive": True}}}
+            )
+        for tag in criteria["tags"]:
+            filters.append({"wildcard": {"tags_text": {"value": _wildcard(tag), "case_insensitive": True}}})
+        if criteria["community"] is not None:
+            filters.append({"term": {"community_ids": criteria["community"]}})
+        if criteria["publication_type"]:
+            filters.append({"term": {"publication_type": criteria["publication_type"]}})
+
+        created_at = {}
+        if criteria["date_from"]:
+            created_at["gte"] = criteria["date_from"].isoformat()
+        if criteria["date_to"]:
+            created_at["lt"] = criteria["date_to"].isoformat()
+        if created_at:
+            filters.append({"range": {"created_at": created_at}})
+
+        for field, (low, high) in (
+            ("average_engine_size", criteria["engine_size"]),
+            ("average_consumption", criteria["consumption"]),
+        ):
+            bounds = {key: value for key, value in (("gte", low), ("lte", high)) if value is not None}
+            if bounds:
+                filters.append({"range": {field: bounds}})
+
+        for field in ("marcas", "combustibles", "paises"):
+            if criteria[field] is not None:
+                filters.append({"terms": {field: sorted(criteria[field])}})
+        for field in ("year", "price"):
+            low, high = criteria[field]
+            if low is not None:
+                filters.append({"range": {f"max_{field}": {"gte": low}}})
+            if high is not None:
+                filters.append({"range": {f"min_{field}": {"lte": high}}})
+
+        return {"bool": {"filter": filters}}
+
+    def search_hits(self, criteria, sorting="newest", after=None, limit=None):
+        order = "asc" if sorting == "oldest" else "desc"
+        body = {
+            "query": self.build_query(criteria),
+            "sort": [{"created_at": order}, {"id": order}],
+            "_source": ["created_at"],
+        }
+        if after is not None:
+            body["search_after"] = [_epoch_millis(after[0]), after[1]]
+
+        hits = []
+        while limit is None or len(hits) < limit:
+            size = self.BULK_CHUNK_SIZE if limit is None else min(limit - len(hits), self.BULK_CHUNK_SIZE)
+            response = self.client.search(index=self.index, size=size, **body)
+            page = response["hits"]["hits"]
+            hits.extend((datetime.fromisoformat(hit["_source"]["created_at"]), int(hit["_id"])) for hit in page)
+            if len(page) < size:
+                break
+            body["search_after"] = page[-1]["sort"]
+        return hits
+
+    def count_hits(self, criteria):
+        return self.client.count(index=self.index, query=self.build_query(criteria))["count"]
+
+    def _actions(self, documents):
+        for document in documents:
+            source = dict(document, created_at=document["created_at"].isoformat())
+            yield {"_index": self.index, "_id": document["id"], "_source": source}
+
+    def reindex(self):
+        from elasticsearch import helpers
+
+        self.client.indices.delete(index=self.index, ignore_unavailable=True)
+        self.client.indices.create(index=self.index, mappings=INDEX_MAPPING)
+        indexed, _ = helpers.bulk(self.client, self._actions(self.build_documents()), chunk_size=self.BULK_CHUNK_SIZE)
+        self.client.indices.refresh(index=self.index)
+        return indexed
+
+    def refresh(self, dataset_ids):
+        from elasticsearch import helpers
+
+        documents = self.build_documents(list(dataset_ids))
+        indexed_ids = {document["id"] for document in documents}
+        actions = list(self._actions(documents))
+        actions.extend(
+            {"_op_type": "delete", "_index": self.index, "_id": dataset_id}
+            for dataset_id in dataset_ids
+            if dataset_id not in indexed_ids
+        )
+        # Deleting a dataset that was never indexed is not an error
+        helpers.bulk(self.client, actions, raise_on_error=False, refresh="wait_for")
+
+
+def create_search_backend(config) -> SearchBackend:
+    backend = config.get("SEARCH_BACKEND", "database")
+    if backend == "database":
+        return DatabaseSearchBackend()
+    if backend == "memory":
+        return InMemorySearchBackend()
+    if backend == "elasticsearch":
+        return ElasticsearchSearchBackend.from_config(config)
+    raise ValueError(f"Unknown SEARCH_BACKEND: {backend}")
+
+
+def get_search_backend(repository: ExploreRepository = None) -> SearchBackend:
+    """
+    Backend configured with SEARCH_BACKEND. The database backend runs on the caller's
+    repository; index backends are created once per application.
+    """
+    if not has_app_context() or current_app.config.get("SEARCH_BACKEND", "database") == "database":
+        return DatabaseSearchBackend(repository)
+    if "search_backend" not in current_app.extensions:
+        current_app.extensions["search_backend"] = create_search_backend(current_app.config)
+    return current_app.extensions["search_backend"]
+
+
+def refresh_search_index(dataset_ids: List[int]):
+    """Propagate changes of the given datasets to the search index, if there is one, and to the suggestions"""
+    from app.modules.explore.suggestions import refresh_suggestions
+
+    try:
+        get_search_backend().refresh(dataset_ids)
+        refresh_suggestions(dataset_ids)
+    except Exception as exc:
+        # The database is the source of truth; a failed index update is repaired by a reindex
+        logger.exception(f"Could not refresh the search index for datasets {dataset_ids}: {exc}")
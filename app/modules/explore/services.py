@@ -1,8 +1,111 @@
-from app.modules.explore.repositories import ExploreRepository
+from flask import has_request_context, request
+
+from app import cache
+from app.modules.dataset.models import PublicationType
+from app.modules.dataset.services import AuthorService
+from app.modules.explore.repositories import (
+    CAR_FILTER_FIELDS,
+    CONSUMPTION_BUCKETS,
+    ENGINE_SIZE_BUCKETS,
+    ExploreRepository,
+)
+from app.modules.explore.search_backends import get_search_backend
+from app.modules.explore.suggestions import get_suggestion_index
 from core.services.BaseService import BaseService
 
+FILTER_FIELDS = (
+    "title",
+    "author",
+    "tags",
+    "community",
+    "publication_type",
+    "date_from",
+    "date_to",
+    "engine_size_min",
+    "engine_size_max",
+    "consumption_min",
+    "consumption_max",
+) + CAR_FILTER_FIELDS
+
+
+MAX_TAG_FACETS = 20
+
+
+def normalize_criteria(criteria: dict) -> dict:
+    """Keep only the known filter fields, stripped, dropping the empty ones"""
+    normalized = {}
+    for field in FILTER_FIELDS:
+        value = criteria.get(field)
+        if value is None:
+            continue
+        value = str(value).strip()
+        if value:
+            normalized[field] = value
+    return normalized
+
+
+def resolve_author(criteria: dict) -> dict:
+    """
+    Replace the author text by the author names it matches through the trigram index, so
+    that "jose garcia" or "Jsoe García" find "José García". Outside an application context
+    the text is left for the backends to match as a substring.
+    """
+    if not criteria.get("author"):
+        return criteria
+    author_names = AuthorService.match_names(criteria["author"])
+    if author_names is None:
+        return criteria
+    return {**criteria, "author_names": author_names}
+
+
+def _buckets(counts, edges) -> list:
+    bounds = zip(edges, edges[1:] + (None,))
+    return [{"min": low, "max": high, "count": count} for (low, high), count in zip(bounds, counts)]
+
+
+def fold_facets(rows) -> dict:
+    """
+    Fold the (facet, value, count) rows returned by ExploreRepository.facet_rows into the
+    counts of every facet. Tags come counted per tag string: each string adds its count to
+    every tag it holds, once even if repeated.
+    """
+    total = 0
+    publication_types = {}
+    communities = {}
+    tags = {}
+    buckets = {"engine_size": [0] * len(ENGINE_SIZE_BUCKETS), "consumption": [0] * len(CONSUMPTION_BUCKETS)}
+
+    for facet, value, count in rows:
+        if facet == "total":
+            total = count
+        elif value is None:
+            continue
+        elif facet == "publication_type":
+            publication_types[PublicationType[value].value] = count
+        elif facet == "community":
+            communities[value] = count
+        elif facet == "tags":
+            for tag in {tag.strip().lower() for tag in value.split(",") if tag.strip()}:
+                tags[tag] = tags.get(tag, 0) + count
+        else:
+            buckets[facet][int(value)] += count
+
+    top_tags = sorted(tags.items(), key=lambda item: (-item[1], item[0]))[:MAX_TAG_FACETS]
+    return {
+        "total": total,
+        "publication_type": publication_types,
+        "community": communities,
+        "tags": dict(top_tags),
+        "engine_size": _buckets(buckets["engine_size"], ENGINE_SIZE_BUCKETS),
+        "consumption": _buckets(buckets["consumption"], CONSUMPTION_BUCKETS),
+    }
+
 
 class ExploreService(BaseService):
+    DEFAULT_PAGE_SIZE = 20
+    MAX_PAGE_SIZE = 100
+    MAX_SUGGESTIONS = 25
+
     def __init__(self):
         super().__init__(ExploreRepository())
 
@@ -22,18 +125,93 @@ class ExploreService(BaseService):
         sorting="newest",
         **kwargs,
     ):
-        return self.repository.filter(
-            title,
-            author,
-            tags,
-            community,
-            publication_type,
-            date_from,
-            date_to,
-            engine_size_min,
-            engine_size_max,
-            consumption_min,
-            consumption_max,
-            sorting,
-            **kwargs,
+        criteria = resolve_author(
+            dict(
+                title=title,
+                author=author,
+                tags=tags,
+                community=community,
+                publication_type=publication_type,
+                date_from=date_from,
+                date_to=date_to,
+                engine_size_min=engine_size_min,
+                engine_size_max=engine_size_max,
+                consumption_min=consumption_min,
+                consumption_max=consumption_max,
+                **kwargs,
+            )
         )
+        return self.search_backend.filter(sorting=sorting, **criteria)
+
+    @property
+    def search_backend(self):
+        return get_search_backend(self.repository)
+
+    def get_page_size(self, page_size=None) -> int:
+        try:
+            page_size = int(page_size) if page_size is not None else self.DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            page_size = self.DEFAULT_PAGE_SIZE
+        return max(1, min(page_size, self.MAX_PAGE_SIZE))
+
+    def filter_page(self, cursor=None, page_size=None, sorting="newest", **criteria):
+        """
+        Return one page of the datasets matching the criteria and the cursor of the next page.
+        Raises ValueError if the cursor is malformed.
+        """
+        return self.search_backend.filter_page(
+            cursor=cursor,
+            page_size=self.get_page_size(page_size),
+            sorting=sorting,
+            **resolve_author(normalize_criteria(criteria)),
+        )
+
+    def search_page(self, cursor=None, page_size=None, sorting="newest", **criteria) -> dict:
+        """
+        Serialized page of results (items, next cursor and total), served from the result
+        cache when the same criteria were already requested since the last publication.
+        """
+        criteria = normalize_criteria(criteria)
+        page_size = self.get_page_size(page_size)
+        params = {
+            "criteria": criteria,
+            "cursor": cursor,
+            "page_size": page_size,
+            "sorting": sorting,
+            # Serialized datasets embed absolute URLs built from the request host
+            "host": request.host_url if has_request_context() else "",
+        }
+
+        def compute():
+            datasets, next_cursor = self.filter_page(cursor=cursor, page_size=page_size, sorting=sorting, **criteria)
+            return {
+                "items": [dataset.to_payload() for dataset in datasets],
+                "next_cursor": next_cursor,
+                "total": self.estimate_total(**criteria),
+            }
+
+        return cache.get_or_compute("explore:page", params, compute)
+
+    def facets(self, **criteria) -> dict:
+        """Counts of every facet value under the given criteria, cached like the result pages"""
+        criteria = normalize_criteria(criteria)
+        return cache.get_or_compute(
+            "explore:facets", criteria, lambda: fold_facets(self.repository.facet_rows(**resolve_author(criteria)))
+        )
+
+    def estimate_total(self, **criteria) -> int:
+        criteria = normalize_criteria(criteria)
+        return cache.get_or_compute(
+            "explore:total", criteria, lambda: self.search_backend.count_filtered(**resolve_author(criteria))
+        )
+
+    def suggest(self, field: str, prefix: str, limit=None) -> list:
+        """
+        Most popular values of a filter field starting with the prefix.
+        Raises ValueError if the field has no suggestions.
+        """
+        try:
+            limit = int(limit) if limit is not None else 10
+        except (TypeError, ValueError):
+            limit = 10
+        return get_suggestion_index().suggest(field, prefix, max(1, min(limit, self.MAX_SUGGESTIONS)))
@@ -0,0 +1,99 @@
+from collections import Counter
+from typing import List, Optional
+
+from flask import current_app, has_app_context
+
+from app.modules.dataset.models import DataSet
+from app.modules.explore.repositories import ExploreRepository
+from core.caching.generation_loader import GenerationLoader
+from core.indexes.prefix_index import PrefixIndex
+
+SUGGESTION_FIELDS = ("title", "tags", "author", "marca", "modelo")
+
+
+def dataset_contributions(dataset: DataSet, car_counts=()) -> dict:
+    """
+    Values a dataset adds to each suggestion field, with their popularity: one per
+    dataset for metadata values, one per car for makes and models.
+    """
+    metadata = dataset.ds_meta_data
+    contributions = {field: Counter() for field in SUGGESTION_FIELDS}
+    contributions["title"][metadata.title] += 1
+    for tag in {tag.strip().lower() for tag in (metadata.tags or "").split(",") if tag.strip()}:
+        contributions["tags"][tag] += 1
+    for author in metadata.authors:
+        contributions["author"][author.name] += 1
+    for marca, modelo, count in car_counts:
+        contributions["marca"][marca] += count
+        contributions["modelo"][modelo] += count
+    return contributions
+
+
+class SuggestionIndex(GenerationLoader):
+    """
+    Prefix indexes of the values users can type in the explore filters, with the values
+    each dataset contributes, as an (indexes, contributions) pair.
+
+    The pair is rebuilt when the result cache generation moves (see GenerationLoader).
+    Publications made by this process are applied by `refresh` to a copy of the indexes
+    they touch, which then replaces the pair.
+    """
+
+    def __init__(self, repository: ExploreRepository = None):
+        super().__init__()
+        self.repository = repository or ExploreRepository()
+
+    @staticmethod
+    def _apply(indexes: dict, contributions: dict, sign: int):
+        for field, values in contributions.items():
+            for value, weight in values.items():
+                indexes[field].add(value, sign * weight)
+
+    def _load(self, dataset_ids: Optional[List[int]] = None) -> dict:
+        datasets = self.repository.get_indexable(dataset_ids)
+        car_counts = self.repository.get_car_model_counts(dataset_ids)
+        return {dataset.id: dataset_contributions(dataset, car_counts.get(dataset.id, ())) for dataset in datasets}
+
+    def build(self) -> tuple:
+        indexes = {field: PrefixIndex() for field in SUGGESTION_FIELDS}
+        contributions = self._load()
+        for values in contributions.values():
+            self._apply(indexes, values, 1)
+        return indexes, contributions
+
+    def _refreshed(self, loaded: tuple, dataset_ids: List[int]) -> tuple:
+        indexes, contributions = dict(loaded[0]), dict(loaded[1])
+        previous = [contributions.pop(dataset_id) for dataset_id in dataset_ids if dataset_id in contributions]
+        current = self._load(list(dataset_ids))
+        contributions.update(current)
+
+        touched = {field for values in [*previous, *current.values()] for field, counts in values.items() if counts}
+        for field in touched:
+            indexes[field] = indexes[field].copy()
+        for values in previous:
+            self._apply(indexes, values, -1)
+        for values in current.values():
+            self._apply(indexes, values, 1)
+        return indexes, contributions
+
+    def refresh(self, dataset_ids: List[int]):
+        """Update the contributions of the given datasets, if the indexes were already built"""
+        self.update(lambda loaded: self._refreshed(loaded, dataset_ids))
+
+    def suggest(self, field: str, prefix: str, limit: int = 10) -> list:
+        if field not in SUGGESTION_FIELDS:
+            raise ValueError(f"Unknown suggestion field: {field}")
+        indexes, _ = self.get()
+        return [{"value": value, "count": count} for value, count in indexes[field].suggest(prefix, limit)]
+
+
+def get_suggestion_index() -> SuggestionIndex:
+    if "suggestion_index" not in current_app.extensions:
+        current_app.extensions["suggestion_index"] = SuggestionIndex()
+    return current_app.extensions["suggestion_index"]
+
+
+def refresh_suggestions(dataset_ids: List[int]):
+    """Update the suggestions of the given datasets, if the index was already built in this process"""
+    if has_app_context() and "suggestion_index" in current_app.extensions:
+        current_app.extensions["suggestion_index"].refresh(dataset_ids)
@@ -0,0 +1,117 @@
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import Author, CSVDataSet, DSMetaData, PublicationType
+from app.modules.explore.search_backends import InMemorySearchBackend, parse_criteria
+from app.modules.explore.services import ExploreService
+from core.indexes.trigram_index import ReloadingTrigramIndex, TrigramIndex
+
+
+def test_trigram_index_ranks_by_similarity():
+    """Test que el índice de trigramas ordena por similitud y desempata por longitud"""
+    index = TrigramIndex()
+    index.add(1, "José García")
+    index.add(2, "José García López")
+    index.add(3, "Marta Ruiz")
+
+    assert [key for key, _ in index.search("jose garcia")] == [1, 2]
+    assert index.search("Jsoe Garcia", threshold=0.5)[0][0] == 1
+    assert index.search("ruiz") == [(3, 1.0)]
+    assert index.search("xyz") == []
+
+
+def test_trigram_index_ignores_accents_and_short_queries_use_substrings():
+    """Test que se ignoran tildes y las consultas cortas buscan por subcadena"""
+    index = TrigramIndex()
+    index.add("a", "Begoña Muñoz")
+    index.add("b", "Ana Pérez")
+
+    assert index.search("begona munoz") == [("a", 1.0)]
+    assert index.search("mu") == [("a", 1.0)]
+    assert index.search("PÉ") == [("b", 1.0)]
+
+
+def test_trigram_index_add_replaces_and_remove_drops():
+    """Test que volver a añadir una clave reemplaza su texto y eliminarla la quita del índice"""
+    index = TrigramIndex()
+    index.add(1, "Lucía Gómez")
+    index.add(1, "Lucía Romero")
+
+    assert index.search("gomez") == []
+    assert index.search("romero") == [(1, 1.0)]
+
+    index.remove(1)
+    assert index.search("romero") == []
+    assert len(index) == 0
+
+
+def test_trigram_index_without_limit_returns_every_match():
+    """Test que sin límite se devuelven todas las coincidencias"""
+    index = TrigramIndex()
+    for key in range(300):
+        index.add(key, f"García {key}")
+
+    assert len(index.search("garcia", limit=None)) == 300
+
+
+def test_reloading_trigram_index_loads_once(test_client):
+    """Test que el índice recargable no se vuelve a cargar en cada búsqueda sin caché compartida"""
+    loads = []
+
+    def load():
+        loads.append(1)
+        return [(1, "José García")]
+
+    index = ReloadingTrigramIndex("loads-once", load, scope="trigram-test")
+    with test_client.application.app_context():
+        for _ in range(5):
+            assert index.search("garcia") == [(1, 1.0)]
+
+    assert len(loads) == 1
+
+
+def test_parse_criteria_author_names_take_precedence():
+    """Test que los nombres resueltos sustituyen al filtro por subcadena en los índices de documentos"""
+    backend = InMemorySearchBackend()
+    document = {"title": "", "authors": ["José Pérez"], "tags_text": "", "community_ids": [], "publication_type": ""}
+    document.update({"created_at": None, "average_engine_size": None, "average_consumption": None})
+
+    criteria = parse_criteria(author="jsoe", author_names=["José Pérez"])
+    assert backend._matches(document, criteria)
+
+    criteria = parse_criteria(author="jose", author_names=[])
+    assert not backend._matches(document, criteria)
+
+
+@pytest.fixture(scope="module")
+def author_dataset(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    metadata = DSMetaData(
+        title="Fuzzy authors",
+        description="Author matching",
+        publication_type=PublicationType.NONE,
+        dataset_doi="10.1234/fuzzy.authors",
+    )
+    metadata.authors = [Author(name="Begoña Muñoz Echeverría")]
+    db.session.add(metadata)
+    db.session.flush()
+    dataset = CSVDataSet(user_id=user.id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.commit()
+    return dataset
+
+
+@pytest.mark.parametrize("author", ["begona munoz", "Begoña Muñoz", "Begona Munyoz Echeverria", "echeverria"])
+def test_explore_author_filter_is_fuzzy(author_dataset, author):
+    """Test que el filtro de autor encuentra el dataset sin tildes y con erratas"""
+    datasets = ExploreService().filter(author=author)
+
+    assert author_dataset.id in [dataset.id for dataset in datasets]
+
+
+def test_explore_author_filter_skips_unrelated_names(author_dataset):
+    """Test que un autor sin parecido no devuelve el dataset"""
+    datasets = ExploreService().filter(author="Marta Ruiz")
+
+    assert author_dataset.id not in [dataset.id for dataset in datasets]
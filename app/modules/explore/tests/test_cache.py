@@ -0,0 +1,272 @@
+import threading
+import time
+
+import pytest
+from cachelib import FileSystemCache, NullCache
+from flask import Flask
+
+from app.modules.dataset.services import DataSetService
+from core.caching.generation_loader import GenerationLoader
+from core.caching.result_cache import LRUMemoryCache, ResultCache, create_backend
+from core.caching.single_flight import SingleFlight
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return app
+
+
+def test_memory_cache_evicts_least_recently_used():
+    """Test que la caché en memoria descarta la entrada usada hace más tiempo"""
+    backend = LRUMemoryCache(threshold=2)
+    backend.set("a", 1)
+    backend.set("b", 2)
+    assert backend.get("a") == 1
+
+    backend.set("c", 3)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == 1
+    assert backend.get("c") == 3
+    assert len(backend) == 2
+
+
+def test_memory_cache_expires_entries(monkeypatch):
+    """Test que las entradas caducan al superar su TTL"""
+    backend = LRUMemoryCache(default_timeout=10)
+    now = time.monotonic()
+    monkeypatch.setattr(time, "monotonic", lambda: now)
+    backend.set("key", "value")
+    backend.set("forever", "value", timeout=0)
+
+    monkeypatch.setattr(time, "monotonic", lambda: now + 11)
+
+    assert backend.get("key") is None
+    assert backend.get("forever") == "value"
+
+
+def test_memory_cache_returns_copies():
+    """Test que modificar un valor devuelto no altera la caché"""
+    backend = LRUMemoryCache()
+    backend.set("items", [1, 2])
+    backend.get("items").append(3)
+
+    assert backend.get("items") == [1, 2]
+
+
+@pytest.mark.parametrize(
+    "cache_type, backend_class",
+    [("memory", LRUMemoryCache), ("filesystem", FileSystemCache), ("null", NullCache)],
+)
+def test_init_app_selects_backend(tmp_path, cache_type, backend_class):
+    """Test que CACHE_TYPE selecciona el backend"""
+    app = make_app(CACHE_TYPE=cache_type, CACHE_DIR=str(tmp_path))
+    ResultCache(app)
+
+    assert isinstance(app.extensions["result_cache"], backend_class)
+
+
+def test_unknown_backend_raises():
+    """Test que un CACHE_TYPE desconocido falla al arrancar"""
+    with pytest.raises(ValueError):
+        create_backend({"CACHE_TYPE": "memcached", "CACHE_DEFAULT_TIMEOUT": 1, "CACHE_THRESHOLD": 1})
+
+
+def test_get_or_compute_computes_once_per_generation():
+    """Test que el resultado se calcula una vez hasta que se invalida la generación"""
+    app = make_app(CACHE_TYPE="memory")
+    cache = ResultCache(app)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"total": len(calls)}
+
+    with app.app_context():
+        assert cache.get_or_compute("explore:total", {"title": "a"}, compute) == {"total": 1}
+        assert cache.get_or_compute("explore:total", {"title": "a"}, compute) == {"total": 1}
+
+        cache.invalidate()
+
+        assert cache.get_or_compute("explore:total", {"title": "a"}, compute) == {"total": 2}
+
+
+def test_get_or_compute_outside_app_context_does_not_cache():
+    """Test que sin contexto de aplicación se calcula siempre"""
+    cache = ResultCache()
+    calls = []
+
+    cache.get_or_compute("explore:total", {}, lambda: calls.append(1) or 1)
+    cache.get_or_compute("explore:total", {}, lambda: calls.append(1) or 1)
+
+    assert len(calls) == 2
+
+
+def run_concurrently(target, count=8):
+    threads = [threading.Thread(target=target) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=5)
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    """Test que las llamadas simultáneas con la misma clave comparten una ejecución"""
+    flights = SingleFlight()
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+    results = []
+
+    def slow_query():
+        calls.append(1)
+        started.set()
+        release.wait(timeout=5)
+        return ["dataset"]
+
+    def request():
+        results.append(flights.do("explore", slow_query))
+
+    leader = threading.Thread(target=request)
+    leader.start()
+    started.wait(timeout=5)
+    followers = [threading.Thread(target=request) for _ in range(5)]
+    for follower in followers:
+        follower.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(timeout=5)
+
+    assert len(calls) == 1
+    assert results == [["dataset"]] * 6
+    assert flights.in_flight() == 0
+
+
+def test_single_flight_shares_errors_and_retries_afterwards():
+    """Test que un error se propaga a los que esperan y no queda cacheado"""
+    flights = SingleFlight()
+
+    def failing():
+        raise RuntimeError("db down")
+
+    with pytest.raises(RuntimeError):
+        flights.do("explore", failing)
+
+    assert flights.do("explore", lambda: "ok") == "ok"
+
+
+def test_get_or_compute_coalesces_identical_misses():
+    """Test que N peticiones idénticas simultáneas ejecutan la consulta una sola vez"""
+    app = make_app(CACHE_TYPE="memory")
+    cache = ResultCache(app)
+    calls = []
+    results = []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"total": 3}
+
+    def request():
+        with app.app_context():
+            results.append(cache.get_or_compute("explore:total", {"title": "hot"}, compute))
+
+    run_concurrently(request)
+
+    assert len(calls) == 1
+    assert results == [{"total": 3}] * 8
+
+
+def test_filesystem_generation_is_shared_between_instances(tmp_path):
+    """Test que la invalidación es visible para otros procesos que comparten el backend"""
+    first_app = make_app(CACHE_TYPE="filesystem", CACHE_DIR=str(tmp_path))
+    second_app = make_app(CACHE_TYPE="filesystem", CACHE_DIR=str(tmp_path))
+    cache = ResultCache()
+    cache.init_app(first_app)
+    cache.init_app(second_app)
+
+    with first_app.app_context():
+        key = cache.make_key("explore:page", {})
+    with second_app.app_context():
+        assert cache.make_key("explore:page", {}) == key
+        cache.invalidate()
+    with first_app.app_context():
+        assert cache.make_key("explore:page", {}) != key
+
+
+def test_update_dsmetadata_invalidates_cache(monkeypatch):
+    """Test que actualizar metadatos de un dataset invalida la caché de resultados"""
+    from app import cache, create_app
+
+    service = DataSetService()
+    monkeypatch.setattr(service.dsmetadata_repository, "update", lambda id, **kwargs: None)
+
+    with create_app().app_context():
+        generation = cache.generation()
+        service.update_dsmetadata(1, dataset_doi="10.1234/x")
+        assert cache.generation() == generation + 1
+
+
+class CountingLoader(GenerationLoader):
+    def __init__(self, scope, max_age=60, delay=0.0):
+        super().__init__(scope, max_age=max_age)
+        self.delay = delay
+        self.builds = 0
+
+    def build(self):
+        time.sleep(self.delay)
+        self.builds += 1
+        return self.builds
+
+
+def test_generation_loader_builds_once_for_concurrent_lookups():
+    """Test que las consultas concurrentes con la estructura caducada esperan a una única reconstrucción"""
+    from app import cache
+
+    app = make_app()
+    loader = CountingLoader("loader-test", delay=0.05)
+    results = []
+
+    def lookup():
+        with app.app_context():
+            results.append(loader.get())
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert (loader.builds, results) == (1, [1] * 8)
+    with app.app_context():
+        assert loader.get() == 1
+        cache.invalidate("loader-test")
+        assert loader.get() == 2
+
+
+def test_generation_loader_without_shared_cache_rebuilds_after_max_age():
+    """Test que sin caché compartida la estructura se reconstruye al caducar, no en cada consulta"""
+    loader = CountingLoader("loader-age-test", max_age=0.05)
+
+    with make_app().app_context():
+        assert [loader.get(), loader.get()] == [1, 1]
+        time.sleep(0.06)
+        assert loader.get() == 2
+        loader.update(lambda value: value * 10)
+        assert loader.get() == 20
+
+
+def test_generation_loader_with_memory_cache_rebuilds_after_max_age():
+    """Test que con la caché en memoria, que los demás procesos no invalidan, la estructura también caduca"""
+    from app import cache
+
+    app = make_app(CACHE_TYPE="memory")
+    cache.init_app(app)
+    loader = CountingLoader("loader-memory-test", max_age=0.05)
+
+    with app.app_context():
+        assert [loader.get(), loader.get()] == [1, 1]
+        time.sleep(0.06)
+        assert loader.get() == 2
@@ -0,0 +1,189 @@
+import json
+import time
+
+import pytest
+from flask import session
+from sqlalchemy import create_engine, insert
+from sqlalchemy.exc import OperationalError
+
+from app import db, replicas
+from app.modules.auth.identity_cache import identity_cache
+from app.modules.auth.models import User
+from app.modules.community.models import Community
+from app.modules.community.repositories import CommunityRepository
+from app.modules.dataset.models import DataSet, DSMetaData, PublicationType
+from app.modules.explore.repositories import ExploreRepository
+from core.database.routing import (
+    PRIMARY_UNTIL_KEY,
+    REPLICA_BIND,
+    WROTE_KEY,
+    ReplicaRouter,
+    bookkeeping_writes,
+    replica_reads,
+)
+
+
+@pytest.fixture(scope="module")
+def test_client(test_client):
+    """
+    Extiende el fixture test_client con una comunidad que solo existe en la base de datos principal.
+    """
+    with test_client.application.app_context():
+        CommunityRepository().create(name="primary-only", description="Solo en la principal")
+
+    yield test_client
+
+
+def attach_replica(test_client, url):
+    engine = create_engine(url)
+    db.engines[REPLICA_BIND] = engine
+    test_client.application.extensions[ReplicaRouter.EXTENSION]["down_until"] = 0.0
+    with test_client.session_transaction() as session:
+        session.pop(PRIMARY_UNTIL_KEY, None)
+    return engine
+
+
+@pytest.fixture
+def replica(test_client, tmp_path):
+    """Una segunda base de datos SQLite como réplica, con una comunidad que la principal no tiene"""
+    engine = attach_replica(test_client, f"sqlite:///{tmp_path / 'replica.db'}")
+    db.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(Community), [{"id": 1000, "name": "replica-only", "description": "En la réplica"}])
+        connection.execute(
+            insert(DSMetaData),
+            [{"id": 1000, "title": "Replica", "description": "", "publication_type": PublicationType.NONE}],
+        )
+        connection.execute(
+            insert(DataSet), [{"id": 1000, "user_id": 1, "ds_meta_data_id": 1000, "DataSetType": "data_set"}]
+        )
+    db.session.expunge_all()
+
+    yield engine
+
+    db.engines.pop(REPLICA_BIND)
+    engine.dispose()
+    db.session.expunge_all()
+
+
+@pytest.fixture
+def broken_replica(test_client, tmp_path):
+    """Una réplica cuyo fichero no se puede abrir"""
+    engine = attach_replica(test_client, f"sqlite:///{tmp_path / 'missing' / 'replica.db'}")
+    yield engine
+    db.engines.pop(REPLICA_BIND)
+    engine.dispose()
+
+
+def test_get_requests_read_from_the_replica(test_client, replica):
+    """Test que las peticiones GET leen de la réplica y el resto del código de la principal"""
+    response = test_client.get("/community")
+
+    assert response.status_code == 200
+    assert b"replica-only" in response.data
+    assert b"primary-only" not in response.data
+    assert CommunityRepository().get_by_name("primary-only") is not None
+    assert CommunityRepository().get_by_name("replica-only") is None
+
+
+def test_replica_reads_stay_on_the_primary_once_the_session_writes(test_client, replica):
+    """Test que replica_reads lee de la réplica hasta que la sesión escribe"""
+    repository = CommunityRepository()
+    try:
+        with replica_reads():
+            assert repository.get_by_name("replica-only") is not None
+            assert repository.get_by_name("primary-only") is None
+
+            repository.create(commit=False, name="written", description="Escrita en la principal")
+            assert repository.get_by_name("written") is not None
+            assert repository.get_by_name("primary-only") is not None
+    finally:
+        db.session.rollback()
+        db.session.info[WROTE_KEY] = False
+
+
+def test_clients_that_wrote_read_from_the_primary(test_client, replica):
+    """Test que tras escribir, las peticiones del mismo cliente leen de la principal durante un tiempo"""
+    response = test_client.post(
+        "/signup/", data=dict(name="Replica", surname="Sticky", email="sticky@example.com", password="test1234")
+    )
+    assert response.status_code == 302
+    with test_client.session_transaction() as session:
+        assert session[PRIMARY_UNTIL_KEY] > time.time()
+
+    assert b"primary-only" in test_client.get("/community").data
+
+    with test_client.session_transaction() as session:
+        session[PRIMARY_UNTIL_KEY] = time.time() - 1
+    assert b"replica-only" in test_client.get("/community").data
+
+    test_client.get("/logout")
+
+
+def test_failing_replica_falls_back_to_the_primary(test_client, broken_replica):
+    """Test que si la réplica falla se lee de la principal y se deja de usar durante un tiempo"""
+    response = test_client.get("/community")
+
+    assert response.status_code == 200
+    assert b"primary-only" in response.data
+    assert test_client.application.extensions[ReplicaRouter.EXTENSION]["down_until"] > time.monotonic()
+
+
+def test_bookkeeping_writes_do_not_keep_the_client_on_the_primary(test_client, replica):
+    """Test que los registros de visitas y descargas no obligan al cliente a leer de la principal"""
+    with test_client.application.test_request_context("/", method="GET"):
+        replicas.start_request()
+        with bookkeeping_writes():
+            CommunityRepository().create(name="bookkeeping", description="Registro")
+        assert CommunityRepository().get_by_name("bookkeeping") is not None
+        replicas.end_request(None)
+        assert PRIMARY_UNTIL_KEY not in session
+
+        replicas.start_request()
+        CommunityRepository().create(name="not-bookkeeping", description="Escritura")
+        replicas.end_request(None)
+        assert session[PRIMARY_UNTIL_KEY] > time.time()
+
+
+def test_streamed_lists_read_from_the_replica(test_client, replica):
+    """Test que los listados en streaming leen de la réplica aunque se generen tras la petición"""
+    response = test_client.get("/api/v1/datasets/?stream=ndjson&fields=dataset_id")
+
+    assert response.status_code == 200
+    assert [json.loads(line)["dataset_id"] for line in response.data.splitlines()] == [1000]
+
+
+def test_failing_replica_keeps_pending_changes(test_client, broken_replica):
+    """Test que si la réplica falla con cambios pendientes no se deshacen: el error se propaga"""
+    pending = Community(name="pending", description="Pendiente")
+    try:
+        with db.session.no_autoflush, replica_reads():
+            db.session.add(pending)
+            with pytest.raises(OperationalError):
+                CommunityRepository().get_by_name("primary-only")
+            assert pending in db.session.new
+    finally:
+        db.session.rollback()
+        db.session.info[WROTE_KEY] = False
+
+
+def test_identity_cache_loads_from_the_primary(test_client, replica):
+    """Test que la caché de identidad lee el usuario de la principal aunque la réplica vaya con retraso"""
+    user_id = User.query.filter_by(email="test@example.com").one().id
+    db.session.expunge_all()
+
+    with replica_reads():
+        assert User.query.get(user_id) is None
+        assert identity_cache.load_user(user_id).email == "test@example.com"
+
+
+def test_union_reads_do_not_count_as_writes(test_client, replica):
+    """Test que las consultas UNION (facetas) se leen de la réplica sin marcar la sesión como escrita"""
+    db.session.info[WROTE_KEY] = False
+    try:
+        with replica_reads():
+            assert ExploreRepository().facet_rows() == [("total", None, 0)]
+            assert not db.session.info.get(WROTE_KEY)
+    finally:
+        db.session.rollback()
+        db.session.info[WROTE_KEY] = False
@@ -17,6 +17,7 @@ def test_filter_with_title(monkeypatch):
     mock_dataset = MagicMock()
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -34,6 +35,7 @@ def test_filter_with_author(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.outerjoin.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
@@ -52,6 +54,7 @@ def test_filter_with_single_tag(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -70,6 +73,7 @@ def test_filter_with_multiple_tags(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -88,6 +92,7 @@ def test_filter_with_valid_community(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -106,6 +111,7 @@ def test_filter_with_invalid_community(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -127,6 +133,7 @@ def test_filter_with_date_from(monkeypatch):
     mock_created_at.__ge__ = MagicMock(return_value=True)
 
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -148,6 +155,7 @@ def test_filter_with_date_to(monkeypatch):
     mock_created_at.__lt__ = MagicMock(return_value=True)
 
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -170,6 +178,7 @@ def test_filter_with_date_range(monkeypatch):
     mock_created_at.__lt__ = MagicMock(return_value=True)
 
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -189,6 +198,7 @@ def test_filter_with_engine_size_min(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -206,6 +216,7 @@ def test_filter_with_engine_size_range(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -223,6 +234,7 @@ def test_filter_with_consumption_min(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -240,6 +252,7 @@ def test_filter_sorting_newest(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -257,6 +270,7 @@ def test_filter_sorting_oldest(monkeypatch):
 
     mock_query = MagicMock()
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
     mock_query.distinct.return_value = mock_query
@@ -277,6 +291,7 @@ def test_filter_combined_filters(monkeypatch):
     mock_created_at.__ge__ = MagicMock(return_value=True)
 
     mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
     mock_query.outerjoin.return_value = mock_query
     mock_query.filter.return_value = mock_query
     mock_query.order_by.return_value = mock_query
@@ -290,3 +305,80 @@ def test_filter_combined_filters(monkeypatch):
         # Debe haber múltiples llamadas a filter
         assert mock_query.filter.call_count >= 4
         assert mock_query.order_by.called
+
+
+def test_cursor_roundtrip():
+    """Test que el cursor codifica y decodifica (created_at, id)"""
+    from datetime import datetime
+
+    from app.modules.explore.repositories import DATASET_POSITION, dataset_cursor
+    from core.serialisers.cursor import decode_cursor
+
+    dataset = MagicMock()
+    dataset.created_at = datetime(2025, 5, 1, 12, 30)
+    dataset.id = 42
+
+    assert decode_cursor(dataset_cursor(dataset), DATASET_POSITION) == (datetime(2025, 5, 1, 12, 30), 42)
+
+
+def test_decode_invalid_cursor_raises():
+    """Test que un cursor mal formado lanza ValueError"""
+    import pytest
+
+    from app.modules.explore.repositories import DATASET_POSITION
+    from core.serialisers.cursor import decode_cursor
+
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor", DATASET_POSITION)
+
+
+def test_filter_page_returns_next_cursor_when_more_results(monkeypatch):
+    """Test que filter_page pide page_size + 1 filas y devuelve cursor si hay más"""
+    from datetime import datetime
+
+    repo = ExploreRepository()
+
+    rows = []
+    for i in range(3):
+        row = MagicMock()
+        row.created_at = datetime(2025, 1, 3 - i)
+        row.id = 3 - i
+        rows.append(row)
+
+    mock_query = MagicMock()
+    mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
+    mock_query.filter.return_value = mock_query
+    mock_query.order_by.return_value = mock_query
+    mock_query.distinct.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.all.return_value = rows
+
+    with patch("app.modules.explore.repositories.DataSet") as mock_ds:
+        mock_ds.query = mock_query
+        datasets, next_cursor = repo.filter_page(page_size=2)
+
+    mock_query.limit.assert_called_once_with(3)
+    assert datasets == rows[:2]
+    assert next_cursor is not None
+
+
+def test_filter_page_last_page_has_no_cursor(monkeypatch):
+    """Test que la última página no devuelve cursor"""
+    repo = ExploreRepository()
+
+    mock_query = MagicMock()
+    mock_query.join.return_value = mock_query
+    mock_query.options.return_value = mock_query
+    mock_query.filter.return_value = mock_query
+    mock_query.order_by.return_value = mock_query
+    mock_query.distinct.return_value = mock_query
+    mock_query.limit.return_value = mock_query
+    mock_query.all.return_value = [MagicMock()]
+
+    with patch("app.modules.explore.repositories.DataSet") as mock_ds:
+        mock_ds.query = mock_query
+        datasets, next_cursor = repo.filter_page(page_size=2)
+
+    assert len(datasets) == 1
+    assert next_cursor is None
@@ -1,5 +1,7 @@
 from datetime import datetime
 
+import msgpack
+
 from app import create_app
 
 
@@ -8,7 +10,7 @@ class DummyDataset:
         self.id = id
         self.title = title
 
-    def to_dict(self):
+    def to_payload(self):
         return {"id": self.id, "title": self.title}
 
 
@@ -74,21 +76,41 @@ def test_explore_index_get_shows_communities(monkeypatch):
 
 
 def test_explore_index_post_returns_json(monkeypatch):
-    """Test que POST /explore retorna JSON"""
+    """Test que POST /explore retorna JSON paginado"""
     app = setup_app(monkeypatch)
 
     from app.modules.explore.services import ExploreService
 
     datasets = [DummyDataset(1, "Dataset1"), DummyDataset(2, "Dataset2")]
-    monkeypatch.setattr(ExploreService, "filter", lambda self, **kwargs: datasets)
+    monkeypatch.setattr(ExploreService, "filter_page", lambda self, **kwargs: (datasets, None))
+    monkeypatch.setattr(ExploreService, "estimate_total", lambda self, **kwargs: 2)
 
     with app.test_client() as client:
         rv = client.post("/explore", json={}, content_type="application/json")
         assert rv.status_code == 200
         assert rv.is_json
         data = rv.get_json()
-        assert len(data) == 2
-        assert data[0]["id"] == 1
+        assert len(data["items"]) == 2
+        assert data["items"][0]["id"] == 1
+        assert data["total"] == 2
+        assert data["next_cursor"] is None
+
+
+def test_explore_index_post_negotiates_msgpack(monkeypatch):
+    """Test que POST /explore responde en MessagePack si el Accept lo pide, con el mismo contenido que en JSON"""
+    app = setup_app(monkeypatch)
+
+    from app.modules.explore.services import ExploreService
+
+    datasets = [DummyDataset(1, "Dataset1")]
+    monkeypatch.setattr(ExploreService, "filter_page", lambda self, **kwargs: (datasets, None))
+    monkeypatch.setattr(ExploreService, "estimate_total", lambda self, **kwargs: 1)
+
+    with app.test_client() as client:
+        rv = client.post("/explore", json={}, headers={"Accept": "application/msgpack"})
+        assert rv.status_code == 200
+        assert rv.mimetype == "application/msgpack"
+        assert msgpack.unpackb(rv.data) == client.post("/explore", json={}).get_json()
 
 
 def test_explore_index_post_with_filters(monkeypatch):
@@ -99,11 +121,12 @@ def test_explore_index_post_with_filters(monkeypatch):
 
     captured_criteria = {}
 
-    def fake_filter(self, **kwargs):
+    def fake_filter_page(self, **kwargs):
         captured_criteria.update(kwargs)
-        return [DummyDataset(1)]
+        return [DummyDataset(1)], None
 
-    monkeypatch.setattr(ExploreService, "filter", fake_filter)
+    monkeypatch.setattr(ExploreService, "filter_page", fake_filter_page)
+    monkeypatch.setattr(ExploreService, "estimate_total", lambda self, **kwargs: 1)
 
     with app.test_client() as client:
         rv = client.post("/explore", json={"title": "test", "author": "john"}, content_type="application/json")
@@ -118,10 +141,72 @@ def test_explore_index_post_empty_criteria(monkeypatch):
 
     from app.modules.explore.services import ExploreService
 
-    monkeypatch.setattr(ExploreService, "filter", lambda self, **kwargs: [])
+    monkeypatch.setattr(ExploreService, "filter_page", lambda self, **kwargs: ([], None))
+    monkeypatch.setattr(ExploreService, "estimate_total", lambda self, **kwargs: 0)
 
     with app.test_client() as client:
         rv = client.post("/explore", json={}, content_type="application/json")
         assert rv.status_code == 200
         data = rv.get_json()
-        assert data == []
+        assert data == {"items": [], "next_cursor": None, "total": 0}
+
+
+def test_explore_index_post_forwards_cursor_and_page_size(monkeypatch):
+    """Test que POST /explore pasa el cursor y el tamaño de página al servicio"""
+    app = setup_app(monkeypatch)
+
+    from app.modules.explore.services import ExploreService
+
+    captured = {}
+
+    def fake_filter_page(self, cursor=None, page_size=None, **kwargs):
+        captured.update(cursor=cursor, page_size=page_size, criteria=kwargs)
+        return [DummyDataset(3)], "next-cursor"
+
+    monkeypatch.setattr(ExploreService, "filter_page", fake_filter_page)
+    monkeypatch.setattr(ExploreService, "estimate_total", lambda self, **kwargs: 10)
+
+    with app.test_client() as client:
+        rv = client.post("/explore", json={"title": "a", "cursor": "abc", "page_size": 5})
+        data = rv.get_json()
+        assert captured["cursor"] == "abc"
+        assert captured["page_size"] == 5
+        assert "cursor" not in captured["criteria"]
+        assert data["next_cursor"] == "next-cursor"
+
+
+def test_explore_index_post_invalid_cursor_returns_400(monkeypatch):
+    """Test que un cursor inválido devuelve 400"""
+    app = setup_app(monkeypatch)
+
+    from app.modules.explore.services import ExploreService
+
+    def fake_filter_page(self, **kwargs):
+        raise ValueError("Invalid cursor: bad")
+
+    monkeypatch.setattr(ExploreService, "filter_page", fake_filter_page)
+
+    with app.test_client() as client:
+        rv = client.post("/explore", json={"cursor": "bad"})
+        assert rv.status_code == 400
+
+
+def test_explore_facets_returns_counts(monkeypatch):
+    """Test que POST /explore/facets devuelve los contadores de las facetas"""
+    app = setup_app(monkeypatch)
+
+    from app.modules.explore.services import ExploreService
+
+    captured = {}
+
+    def fake_facets(self, **criteria):
+        captured.update(criteria)
+        return {"total": 42, "publication_type": {"registered": 42}}
+
+    monkeypatch.setattr(ExploreService, "facets", fake_facets)
+
+    with app.test_client() as client:
+        rv = client.post("/explore/facets", json={"title": "a"})
+        assert rv.status_code == 200
+        assert rv.get_json()["publication_type"] == {"registered": 42}
+        assert captured == {"title": "a"}
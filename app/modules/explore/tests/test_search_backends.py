@@ -0,0 +1,303 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.community.models import Community, CommunityDataset
+from app.modules.dataset.models import Author, Coche, CSVDataSet, DSMetaData, DSMetrics, DSZoneMap, PublicationType
+from app.modules.dataset.repositories import DSZoneMapRepository
+from app.modules.explore.repositories import ExploreRepository
+from app.modules.explore.search_backends import (
+    DatabaseSearchBackend,
+    ElasticsearchSearchBackend,
+    InMemorySearchBackend,
+    parse_criteria,
+)
+
+BACKENDS = ["database", "memory", "elasticsearch"]
+
+
+def create_car(dataset_id, marca, combustible, year=2015, price=20000):
+    return Coche(
+        dataset_id=dataset_id,
+        modelo="Modelo",
+        marca=marca,
+        motor="1.6 TDI",
+        consumo=5.0,
+        combustible=combustible,
+        comienzo_de_produccion=year,
+        asientos=5,
+        puertas=5,
+        peso=1300,
+        carga_max=450,
+        pais_de_origen="Alemania",
+        precio_estimado=price,
+        matricula="1234ABC",
+        fecha_matriculacion=datetime(2020, 1, 1),
+    )
+
+
+def create_dataset(user_id, title, created_at, publication_type, tags, engine_size, consumption, author, doi=True):
+    metadata = DSMetaData(
+        title=title,
+        description="Search backend dataset",
+        publication_type=publication_type,
+        dataset_doi=f"10.1234/{title.replace(' ', '.')}" if doi else None,
+        tags=tags,
+        ds_metrics=DSMetrics(average_engine_size=engine_size, average_consumption=consumption),
+    )
+    metadata.authors = [Author(name=author)]
+    db.session.add(metadata)
+    db.session.flush()
+
+    dataset = CSVDataSet(user_id=user_id, ds_meta_data_id=metadata.id, created_at=created_at)
+    db.session.add(dataset)
+    db.session.flush()
+    return dataset
+
+
+@pytest.fixture(scope="module")
+def datasets(test_client):
+    """
+    Cinco datasets sincronizados y uno sin sincronizar, indexados por un nombre corto.
+    """
+    user = User.query.filter_by(email="test@example.com").first()
+    created = {
+        "golf": create_dataset(
+            user.id, "Golf fleet", datetime(2024, 1, 10), PublicationType.SOLD_CARS, "compact, diesel", 1.6, 4.8, "Ana"
+        ),
+        "civic": create_dataset(
+            user.id, "Civic fleet", datetime(2024, 2, 10), PublicationType.SOLD_CARS, "compact", 1.5, 6.2, "Luis"
+        ),
+        "x5": create_dataset(
+            user.id,
+            "X5 registry",
+            datetime(2024, 3, 10),
+            PublicationType.REGISTERED_CARS,
+            "suv, diesel",
+            3.0,
+            9.5,
+            "Ana",
+        ),
+        "leaf": create_dataset(
+            user.id,
+            "Leaf registry",
+            datetime(2024, 4, 10),
+            PublicationType.REGISTERED_CARS,
+            "electric",
+            None,
+            None,
+            "Eva",
+        ),
+        "panda": create_dataset(
+            user.id, "Panda parking", datetime(2024, 5, 10), PublicationType.PARKED_CARS, "city", 1.2, 5.5, "Luis"
+        ),
+        "draft": create_dataset(
+            user.id,
+            "Golf draft",
+            datetime(2024, 6, 10),
+            PublicationType.SOLD_CARS,
+            "compact",
+            1.6,
+            4.8,
+            "Ana",
+            doi=False,
+        ),
+    }
+
+    community = Community(name="Diesel lovers")
+    db.session.add(community)
+    db.session.flush()
+    for name in ("golf", "x5"):
+        db.session.add(CommunityDataset(community_id=community.id, dataset_id=created[name].id, assigned_by=user.id))
+
+    db.session.add(create_car(created["golf"].id, "Volkswagen", "Diésel"))
+    db.session.add(create_car(created["x5"].id, "BMW", "Diésel"))
+    db.session.add(create_car(created["x5"].id, "BMW", "Gasolina", year=2019, price=45000))
+    for name in ("golf", "x5"):
+        DSZoneMapRepository().rebuild(created[name].id)
+    db.session.commit()
+
+    created["community_id"] = community.id
+    return created
+
+
+@pytest.fixture(params=BACKENDS)
+def backend(request, datasets):
+    if request.param == "database":
+        yield DatabaseSearchBackend()
+        return
+    if request.param == "memory":
+        yield InMemorySearchBackend()
+        return
+
+    url = os.getenv("ELASTICSEARCH_TEST_URL")
+    if not url:
+        pytest.skip("ELASTICSEARCH_TEST_URL is not set")
+    from elasticsearch import Elasticsearch
+
+    backend = ElasticsearchSearchBackend(Elasticsearch(url), index="datasets_test")
+    backend.reindex()
+    yield backend
+    backend.client.indices.delete(index="datasets_test", ignore_unavailable=True)
+
+
+def names(datasets, results):
+    by_id = {dataset.id: name for name, dataset in datasets.items() if name != "community_id"}
+    return [by_id[dataset.id] for dataset in results]
+
+
+@pytest.mark.parametrize(
+    "criteria, expected",
+    [
+        ({}, ["panda", "leaf", "x5", "civic", "golf"]),
+        ({"title": "FLEET"}, ["civic", "golf"]),
+        ({"author": "ana"}, ["x5", "golf"]),
+        ({"tags": "diesel"}, ["x5", "golf"]),
+        ({"tags": "compact, diesel"}, ["golf"]),
+        ({"publication_type": "registered"}, ["leaf", "x5"]),
+        ({"date_from": "2024-02-10", "date_to": "2024-04-10"}, ["leaf", "x5", "civic"]),
+        ({"engine_size_min": "1.5", "engine_size_max": "2"}, ["civic", "golf"]),
+        ({"consumption_max": "5.5"}, ["panda", "golf"]),
+        ({"engine_size_min": "not-a-number"}, ["panda", "leaf", "x5", "civic", "golf"]),
+        ({"marca": "bmw"}, ["x5"]),
+        ({"combustible": "Diésel", "pais": "alemania"}, ["x5", "golf"]),
+        ({"price_min": "30000"}, ["x5"]),
+        ({"year_min": "2016", "year_max": "2020"}, ["x5"]),
+        ({"combustible": "diésel", "year_min": "2018"}, []),
+        ({"marca": "BMW", "combustible": "gasolina", "price_max": "50000"}, ["x5"]),
+        ({"year_max": "not-a-year"}, ["panda", "leaf", "x5", "civic", "golf"]),
+    ],
+)
+def test_backend_filter(datasets, backend, criteria, expected):
+    """Test que todos los backends devuelven los mismos datasets sincronizados, más nuevos primero"""
+    assert names(datasets, backend.filter(**criteria)) == expected
+    assert backend.count_filtered(**criteria) == len(expected)
+
+
+def test_backend_filter_by_community(datasets, backend):
+    """Test que todos los backends filtran por comunidad"""
+    results = backend.filter(community=str(datasets["community_id"]))
+    assert names(datasets, results) == ["x5", "golf"]
+
+
+def test_backend_filter_oldest_first(datasets, backend):
+    """Test que todos los backends ordenan por antigüedad"""
+    assert names(datasets, backend.filter(sorting="oldest", tags="compact")) == ["golf", "civic"]
+
+
+@pytest.mark.parametrize("sorting", ["newest", "oldest"])
+def test_backend_pages_cover_every_result_once(datasets, backend, sorting):
+    """Test que recorrer las páginas devuelve cada resultado una sola vez y en orden"""
+    seen = []
+    cursor = None
+    while True:
+        page, cursor = backend.filter_page(cursor=cursor, page_size=2, sorting=sorting)
+        assert len(page) <= 2
+        seen.extend(names(datasets, page))
+        if cursor is None:
+            break
+
+    expected = ["panda", "leaf", "x5", "civic", "golf"]
+    assert seen == (expected if sorting == "newest" else expected[::-1])
+
+
+def test_backend_refresh_picks_up_changes(datasets, backend):
+    """Test que refresh actualiza el índice tras modificar un dataset"""
+    metadata = datasets["civic"].ds_meta_data
+    metadata.title = "Civic hatchback"
+    db.session.commit()
+    try:
+        backend.refresh([datasets["civic"].id])
+        assert names(datasets, backend.filter(title="hatchback")) == ["civic"]
+    finally:
+        metadata.title = "Civic fleet"
+        db.session.commit()
+        backend.refresh([datasets["civic"].id])
+
+
+def test_documents_include_metrics_and_car_values(datasets):
+    """Test que los documentos incluyen las métricas y las marcas/combustibles de los coches"""
+    documents = {document["id"]: document for document in InMemorySearchBackend().build_documents()}
+
+    x5 = documents[datasets["x5"].id]
+    assert datasets["draft"].id not in documents
+    assert x5["average_engine_size"] == 3.0
+    assert x5["marcas"] == ["BMW"]
+    assert x5["combustibles"] == ["Diésel", "Gasolina"]
+    assert x5["paises"] == ["Alemania"]
+    assert (x5["min_year"], x5["max_year"], x5["min_price"], x5["max_price"]) == (2015, 2019, 20000, 45000)
+    assert x5["community_ids"] == [datasets["community_id"]]
+
+
+@pytest.mark.parametrize(
+    "criteria, expected",
+    [
+        ({"marca": "bmw"}, ["x5"]),
+        ({"combustible": "DIÉSEL"}, ["x5", "golf"]),
+        ({"pais": "alemania"}, ["x5", "golf"]),
+        ({"price_min": "30000"}, ["x5"]),
+        ({"marca": "no-such-make"}, []),
+    ],
+)
+def test_document_backends_decide_single_car_filters_in_the_index(datasets, monkeypatch, criteria, expected):
+    """Test que un solo filtro de coche se resuelve con los campos indexados, sin consultar los coches"""
+    backend = InMemorySearchBackend()
+    backend.reindex()
+
+    def car_matching_dataset_ids(**criteria):
+        raise AssertionError("car filters should not reach the database")
+
+    monkeypatch.setattr(backend.repository, "car_matching_dataset_ids", car_matching_dataset_ids)
+
+    assert names(datasets, backend.filter(**criteria)) == expected
+
+
+def test_elasticsearch_query_mirrors_database_filters():
+    """Test que la consulta de Elasticsearch replica los filtros de la base de datos (sin servidor)"""
+    backend = ElasticsearchSearchBackend(client=None)
+
+    query = backend.build_query(
+        parse_criteria(title="Golf*", tags="suv,diesel", publication_type="SOLD", engine_size_min="1.2")
+    )
+
+    filters = query["bool"]["filter"]
+    assert {"wildcard": {"title.keyword": {"value": "*golf\\**", "case_insensitive": True}}} in filters
+    assert {"wildcard": {"tags_text": {"value": "*diesel*", "case_insensitive": True}}} in filters
+    assert {"term": {"publication_type": "sold"}} in filters
+    assert {"range": {"average_engine_size": {"gte": 1.2}}} in filters
+    assert len(filters) == 5
+
+
+def test_elasticsearch_query_filters_on_the_car_summary(datasets):
+    """Test que la consulta de Elasticsearch filtra por los valores y rangos de coches indexados"""
+    backend = ElasticsearchSearchBackend(client=None)
+
+    filters = backend.build_query(parse_criteria(marca="bmw", year_min="2016"))["bool"]["filter"]
+
+    assert {"terms": {"marcas": ["BMW"]}} in filters
+    assert {"range": {"max_year": {"gte": 2016}}} in filters
+
+
+def test_zone_map_summarizes_cars(datasets):
+    """Test que el zone map guarda rangos y conjuntos de valores de los coches del dataset"""
+    zone_map = datasets["x5"].zone_map
+
+    assert zone_map.car_count == 2
+    assert (zone_map.min_year, zone_map.max_year) == (2015, 2019)
+    assert (zone_map.min_price, zone_map.max_price) == (20000, 45000)
+    assert DSZoneMap.decode_values(zone_map.marcas) == {"bmw"}
+    assert DSZoneMap.decode_values(zone_map.combustibles) == {"diésel", "gasolina"}
+
+
+def test_single_car_filter_is_answered_by_zone_maps():
+    """Test que un único filtro de coche no consulta la tabla coche y varios sí"""
+    repository = ExploreRepository()
+
+    single = str(repository._build_query(marca="bmw").statement)
+    combined = str(repository._build_query(marca="bmw", year_min="2018").statement)
+
+    assert "ds_zone_map" in single and "FROM coche" not in single
+    assert "FROM coche" in combined
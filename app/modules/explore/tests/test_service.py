@@ -1,3 +1,5 @@
+from app import cache, create_app
+from app.modules.dataset.services import AuthorService
 from app.modules.explore.services import ExploreService
 
 
@@ -5,7 +7,7 @@ class DummyDataset:
     def __init__(self, id=1):
         self.id = id
 
-    def to_dict(self):
+    def to_payload(self):
         return {"id": self.id}
 
 
@@ -54,16 +56,19 @@ def test_explore_service_filter_delegates_to_repository(monkeypatch):
             "consumption_min": consumption_min,
             "consumption_max": consumption_max,
             "sorting": sorting,
+            "author_names": kwargs.get("author_names"),
         }
         return dummy_datasets
 
     monkeypatch.setattr(service.repository, "filter", fake_filter)
+    monkeypatch.setattr(AuthorService, "match_names", classmethod(lambda cls, query: ["John Doe"]))
 
     result = service.filter(title="test", author="john", sorting="oldest")
 
     assert result == dummy_datasets
     assert captured["args"]["title"] == "test"
     assert captured["args"]["author"] == "john"
+    assert captured["args"]["author_names"] == ["John Doe"]
     assert captured["args"]["sorting"] == "oldest"
 
 
@@ -92,3 +97,112 @@ def test_explore_service_filter_empty_params(monkeypatch):
 
     result = service.filter()
     assert result == []
+
+
+def test_explore_service_page_size_is_capped():
+    """Test que el tamaño de página se limita al máximo"""
+    service = ExploreService()
+
+    assert service.get_page_size(None) == ExploreService.DEFAULT_PAGE_SIZE
+    assert service.get_page_size("abc") == ExploreService.DEFAULT_PAGE_SIZE
+    assert service.get_page_size(10_000) == ExploreService.MAX_PAGE_SIZE
+    assert service.get_page_size(0) == 1
+
+
+def test_explore_service_estimate_total_is_cached(monkeypatch):
+    """Test que el total se calcula una vez para criterios equivalentes"""
+    service = ExploreService()
+    calls = []
+
+    def fake_count_filtered(**criteria):
+        calls.append(criteria)
+        return 7
+
+    monkeypatch.setattr(service.repository, "count_filtered", fake_count_filtered)
+
+    with create_app().app_context():
+        assert service.estimate_total(title=" cached-total-test ", csrf_token="x") == 7
+        assert service.estimate_total(title="cached-total-test", author="") == 7
+    assert calls == [{"title": "cached-total-test"}]
+
+
+def test_explore_service_search_page_is_served_from_cache(monkeypatch):
+    """Test que una búsqueda repetida no vuelve a consultar el repositorio"""
+    service = ExploreService()
+    calls = []
+
+    def fake_filter_page(cursor=None, page_size=20, sorting="newest", **criteria):
+        calls.append(criteria)
+        return [DummyDataset(1), DummyDataset(2)], "next"
+
+    monkeypatch.setattr(service.repository, "filter_page", fake_filter_page)
+    monkeypatch.setattr(service.repository, "count_filtered", lambda **criteria: 2)
+
+    with create_app().app_context():
+        first = service.search_page(title="hot")
+        second = service.search_page(title=" hot ")
+        service.search_page()
+
+    assert first == second == {"items": [{"id": 1}, {"id": 2}], "next_cursor": "next", "total": 2}
+    assert calls == [{"title": "hot"}, {}]
+
+
+def test_explore_service_search_page_recomputed_after_invalidation(monkeypatch):
+    """Test que publicar un dataset invalida las búsquedas cacheadas"""
+    service = ExploreService()
+    results = [[DummyDataset(1)], [DummyDataset(1), DummyDataset(2)]]
+
+    monkeypatch.setattr(service.repository, "filter_page", lambda **kwargs: (results.pop(0), None))
+    monkeypatch.setattr(service.repository, "count_filtered", lambda **criteria: len(results))
+
+    with create_app().app_context():
+        assert len(service.search_page()["items"]) == 1
+        assert len(service.search_page()["items"]) == 1
+        cache.invalidate()
+        assert len(service.search_page()["items"]) == 2
+
+
+def test_fold_facets_splits_tag_strings_and_fills_buckets():
+    """Test que las cadenas de tags se reparten entre sus tags y los índices de bucket se rellenan"""
+    from app.modules.explore.services import fold_facets
+
+    rows = [
+        ("total", None, 3),
+        ("community", "10", 1),
+        ("community", "11", 1),
+        ("publication_type", "SOLD_CARS", 2),
+        ("publication_type", "OTHER", 1),
+        ("tags", "a,b", 1),
+        ("tags", "A, a", 1),
+        ("tags", "", 1),
+        ("engine_size", "0", 1),
+        ("engine_size", None, 2),
+        ("consumption", "4", 1),
+    ]
+
+    facets = fold_facets(rows)
+
+    assert facets["total"] == 3
+    assert facets["community"] == {"10": 1, "11": 1}
+    assert facets["publication_type"] == {"sold": 2, "other": 1}
+    assert facets["tags"] == {"a": 2, "b": 1}
+    assert facets["engine_size"][0] == {"min": 0.0, "max": 1.2, "count": 1}
+    assert sum(bucket["count"] for bucket in facets["engine_size"]) == 1
+    assert facets["consumption"][-1] == {"min": 12.0, "max": None, "count": 1}
+
+
+def test_explore_service_facets_are_cached(monkeypatch):
+    """Test que las facetas se cachean junto a las páginas de resultados"""
+    service = ExploreService()
+    calls = []
+
+    def fake_facet_rows(**criteria):
+        calls.append(criteria)
+        return []
+
+    monkeypatch.setattr(service.repository, "facet_rows", fake_facet_rows)
+
+    with create_app().app_context():
+        assert service.facets(tags="suv")["total"] == 0
+        assert service.facets(tags=" suv ", cursor="ignored")["total"] == 0
+    assert calls == [{"tags": "suv"}]
@@ -0,0 +1,175 @@
+import random
+import string
+import time
+from datetime import datetime
+
+import pytest
+
+from app import db
+from app.modules.auth.models import User
+from app.modules.dataset.models import Author, Coche, CSVDataSet, DSMetaData, PublicationType
+from app.modules.explore.suggestions import SuggestionIndex
+from core.indexes.prefix_index import PrefixIndex
+
+
+def test_prefix_index_ranks_by_popularity():
+    """Test que las sugerencias se ordenan por popularidad"""
+    index = PrefixIndex()
+    index.add("Golf", 3)
+    index.add("Gol", 1)
+    index.add("Galaxy", 10)
+    index.add("Polo", 20)
+
+    assert index.suggest("go") == [("Golf", 3), ("Gol", 1)]
+    assert index.suggest("g", limit=2) == [("Galaxy", 10), ("Golf", 3)]
+    assert index.suggest("x") == []
+
+
+def test_prefix_index_ignores_accents_and_case():
+    """Test que el prefijo se compara sin tildes ni mayúsculas"""
+    index = PrefixIndex()
+    index.add("José García")
+    index.add("Citroën")
+
+    assert index.suggest("jose") == [("José García", 1)]
+    assert index.suggest("CITROE") == [("Citroën", 1)]
+
+
+def test_prefix_index_remove_drops_values_without_weight():
+    """Test que un valor desaparece cuando su peso llega a cero"""
+    index = PrefixIndex()
+    index.add("Golf", 2)
+    assert index.suggest("g") == [("Golf", 2)]
+
+    index.remove("Golf")
+    assert index.suggest("g") == [("Golf", 1)]
+
+    index.remove("Golf")
+    assert index.suggest("g") == []
+    assert len(index) == 0
+
+
+def test_prefix_index_p99_latency():
+    """Test que el p99 de una sugerencia sobre 50.000 valores está por debajo de 5 ms"""
+    rng = random.Random(42)
+    index = PrefixIndex()
+    for _ in range(50_000):
+        index.add("".join(rng.choices(string.ascii_lowercase, k=8)), rng.randint(1, 100))
+
+    durations = []
+    for _ in range(500):
+        prefix = "".join(rng.choices(string.ascii_lowercase, k=rng.randint(1, 4)))
+        start = time.perf_counter()
+        index.suggest(prefix)
+        durations.append(time.perf_counter() - start)
+
+    durations.sort()
+    assert durations[int(len(durations) * 0.99)] < 0.005
+
+
+def create_suggestion_dataset(user_id, title, tags, authors, cars):
+    metadata = DSMetaData(
+        title=title,
+        description="Suggestions",
+        publication_type=PublicationType.NONE,
+        dataset_doi=f"10.1234/{title.replace(' ', '.')}",
+        tags=tags,
+    )
+    metadata.authors = [Author(name=name) for name in authors]
+    db.session.add(metadata)
+    db.session.flush()
+
+    dataset = CSVDataSet(user_id=user_id, ds_meta_data_id=metadata.id)
+    db.session.add(dataset)
+    db.session.flush()
+    for marca, modelo in cars:
+        db.session.add(
+            Coche(
+                dataset_id=dataset.id,
+                modelo=modelo,
+                marca=marca,
+                motor="1.6",
+                consumo=5.0,
+                combustible="Gasolina",
+                comienzo_de_produccion=2015,
+                asientos=5,
+                puertas=5,
+                peso=1200,
+                carga_max=400,
+                pais_de_origen="España",
+                precio_estimado=15000,
+                matricula="1234ABC",
+                fecha_matriculacion=datetime(2020, 1, 1),
+            )
+        )
+    db.session.commit()
+    return dataset
+
+
+@pytest.fixture(scope="module")
+def suggestion_datasets(test_client):
+    user = User.query.filter_by(email="test@example.com").first()
+    return [
+        create_suggestion_dataset(
+            user.id, "Seat fleet", "SUV, city", ["José Pérez"], [("Seat", "Ibiza"), ("Seat", "Ibiza"), ("Seat", "Leon")]
+        ),
+        create_suggestion_dataset(user.id, "Seat registry", "suv", ["Jose Luis"], [("Seat", "Ibiza")]),
+    ]
+
+
+def test_suggestion_index_counts_popularity(suggestion_datasets):
+    """Test que el índice de sugerencias se construye desde metadatos, autores y coches"""
+    index = SuggestionIndex()
+
+    assert index.suggest("title", "seat") == [
+        {"value": "Seat fleet", "count": 1},
+        {"value": "Seat registry", "count": 1},
+    ]
+    assert index.suggest("tags", "s") == [{"value": "suv", "count": 2}]
+    assert index.suggest("author", "jose") == [
+        {"value": "Jose Luis", "count": 1},
+        {"value": "José Pérez", "count": 1},
+    ]
+    assert index.suggest("marca", "se") == [{"value": "Seat", "count": 4}]
+    assert index.suggest("modelo", "i") == [{"value": "Ibiza", "count": 3}]
+
+
+def test_suggestion_index_refresh_is_incremental(suggestion_datasets):
+    """Test que refrescar un dataset actualiza solo sus contribuciones"""
+    index = SuggestionIndex()
+    index.get()
+
+    dataset = suggestion_datasets[1]
+    dataset.ds_meta_data.title = "Cupra registry"
+    db.session.commit()
+    try:
+        # Without a shared cache the index is not rebuilt on every lookup
+        assert index.suggest("title", "cupra") == []
+
+        index.refresh([dataset.id])
+
+        assert index.suggest("title", "seat") == [{"value": "Seat fleet", "count": 1}]
+        assert index.suggest("title", "cupra") == [{"value": "Cupra registry", "count": 1}]
+        assert index.suggest("marca", "seat") == [{"value": "Seat", "count": 4}]
+    finally:
+        dataset.ds_meta_data.title = "Seat registry"
+        db.session.commit()
+
+
+def test_suggestion_index_rejects_unknown_field(suggestion_datasets):
+    """Test que un campo desconocido lanza ValueError"""
+    with pytest.raises(ValueError):
+        SuggestionIndex().suggest("password", "a")
+
+
+def test_suggest_route(test_client, suggestion_datasets):
+    """Test que GET /explore/suggest devuelve las sugerencias y 400 si el campo no existe"""
+    # The index of the session app may have been built from the database of another test module
+    test_client.application.extensions.pop("suggestion_index", None)
+
+    rv = test_client.get("/explore/suggest?field=marca&prefix=SE")
+    assert rv.status_code == 200
+    assert rv.get_json()["suggestions"] == [{"value": "Seat", "count": 4}]
+
+    rv = test_client.get("/explore/suggest?field=unknown&prefix=se")
+    assert rv.status_code == 400
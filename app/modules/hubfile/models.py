@@ -5,6 +5,7 @@ from flask import request
 from app import db
 from app.modules.auth.models import User
 from app.modules.dataset.models import DataSet
+from app.modules.dataset.payloads import FilePayload, payload_to_dict
 
 
 class Hubfile(db.Model):
@@ -14,11 +15,13 @@ class Hubfile(db.Model):
     checksum = db.Column(db.String(120), nullable=False)
     size = db.Column(db.Integer, nullable=False)
     data_set_id = db.Column(db.Integer, db.ForeignKey("data_set.id"), nullable=False)
+    # Column sketches of the cars of the file (see CarColumnSketches), msgpack-encoded
+    sketches = db.Column(db.LargeBinary(length=2**24 - 1), nullable=True)
 
     def get_formatted_size(self):
         from app.modules.dataset.services import SizeService
 
-        return SizeService().get_human_readable_size(self.size)
+        return SizeService.get_human_readable_size(self.size)
 
     def get_owner_user(self) -> User:
         from app.modules.hubfile.services import HubfileService
@@ -35,15 +38,18 @@ class Hubfile(db.Model):
 
         return HubfileService().get_path_by_hubfile(self)
 
+    def to_payload(self) -> FilePayload:
+        return FilePayload(
+            id=self.id,
+            name=self.name,
+            checksum=self.checksum,
+            size_in_bytes=self.size,
+            size_in_human_format=self.get_formatted_size(),
+            url=f'{request.host_url.rstrip("/")}/file/download/{self.id}',
+        )
+
     def to_dict(self):
-        return {
-            "id": self.id,
-            "name": self.name,
-            "checksum": self.checksum,
-            "size_in_bytes": self.size,
-            "size_in_human_format": self.get_formatted_size(),
-            "url": f'{request.host_url.rstrip("/")}/file/download/{self.id}',
-        }
+        return payload_to_dict(self.to_payload())
 
     def __repr__(self):
         return f"File<{self.id}>"
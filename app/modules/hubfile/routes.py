@@ -9,6 +9,7 @@ from flask_login import current_user
 from app.modules.hubfile import hubfile_bp
 from app.modules.hubfile.models import HubfileDownloadRecord
 from app.modules.hubfile.services import HubfileDownloadRecordService, HubfileService
+from core.database.routing import bookkeeping_writes
 
 
 @hubfile_bp.route("/file/download/<int:file_id>", methods=["GET"])
@@ -35,12 +36,13 @@ def download_file(file_id):
 
     if not existing_record:
         # Record the download in your database
-        HubfileDownloadRecordService().create(
-            user_id=current_user.id if current_user.is_authenticated else None,
-            file_id=file_id,
-            download_date=datetime.now(timezone.utc),
-            download_cookie=user_cookie,
-        )
+        with bookkeeping_writes():
+            HubfileDownloadRecordService().create(
+                user_id=current_user.id if current_user.is_authenticated else None,
+                file_id=file_id,
+                download_date=datetime.now(timezone.utc),
+                download_cookie=user_cookie,
+            )
 
     # Save the cookie to the user's browser
     resp = make_response(send_from_directory(directory=file_path, path=filename, as_attachment=True))
@@ -5,3 +5,13 @@ from core.repositories.BaseRepository import BaseRepository
 class UserProfileRepository(BaseRepository):
     def __init__(self):
         super().__init__(UserProfile)
+
+    def get_by_orcid(self, orcid: str):
+        return self.model.query.filter_by(orcid=orcid).first()
+
+    def get_full_names(self) -> list:
+        """(id, "name surname") of every profile, for the name index"""
+        return [
+            (profile_id, f"{name} {surname}")
+            for profile_id, name, surname in self.session.query(UserProfile.id, UserProfile.name, UserProfile.surname)
+        ]
@@ -1,14 +1,44 @@
+from typing import Optional
+
+from app import cache
+from app.modules.auth.identity_cache import identity_cache
+from app.modules.profile.models import UserProfile
 from app.modules.profile.repositories import UserProfileRepository
+from core.indexes.trigram_index import ReloadingTrigramIndex
 from core.services.BaseService import BaseService
 
+# Result cache generation scope moved whenever a profile name may have changed
+PROFILE_NAMES_SCOPE = "profiles"
+
+profile_name_index = ReloadingTrigramIndex(
+    "profile_names", lambda: UserProfileRepository().get_full_names(), scope=PROFILE_NAMES_SCOPE
+)
+
 
 class UserProfileService(BaseService):
+    NAME_MATCH_THRESHOLD = 0.6
+
     def __init__(self):
         super().__init__(UserProfileRepository())
 
     def update_profile(self, user_profile_id, form):
         if form.validate():
             updated_instance = self.update(user_profile_id, **form.data)
+            cache.invalidate(PROFILE_NAMES_SCOPE)
+            if updated_instance is not None:
+                identity_cache.invalidate(updated_instance.user_id)
             return updated_instance, None
 
         return None, form.errors
+
+    def find_by_name(self, name: str) -> Optional[UserProfile]:
+        """Profile whose "name surname" best matches the name, ignoring case, accents and small typos"""
+        matches = profile_name_index.search(name, limit=1, threshold=self.NAME_MATCH_THRESHOLD) or []
+        return self.get_by_id(matches[0][0]) if matches else None
+
+    def resolve(self, orcid: str = "", name: str = "") -> Optional[UserProfile]:
+        """Profile identified by its ORCID or, failing that, by the closest name"""
+        profile = self.repository.get_by_orcid(orcid) if orcid else None
+        if profile is None and name:
+            profile = self.find_by_name(name)
+        return profile
@@ -36,3 +36,34 @@ def test_edit_profile_page_get(test_client):
     assert b"Edit profile" in response.data, "The expected content is not present on the page"
 
     logout(test_client)
+
+
+def test_resolve_profile_by_similar_name(test_client):
+    """
+    Tests that a profile is found by its full name despite case, accents and small typos.
+    """
+    from app.modules.profile.services import UserProfileService
+
+    service = UserProfileService()
+    profile = UserProfile.query.filter_by(name="Name", surname="Surname").first()
+
+    assert service.resolve(name="name surname").id == profile.id
+    assert service.resolve(name="Náme Surnmae").id == profile.id
+    assert service.resolve(name="Completely Different") is None
+
+
+def test_resolve_profile_by_orcid_first(test_client):
+    """
+    Tests that the ORCID takes precedence over the name when resolving a profile.
+    """
+    from app.modules.profile.services import UserProfileService
+
+    profile = UserProfile.query.filter_by(name="Name", surname="Surname").first()
+    profile.orcid = "0000-0002-1825-0097"
+    db.session.commit()
+    try:
+        assert UserProfileService().resolve(orcid="0000-0002-1825-0097", name="Unknown").id == profile.id
+        assert UserProfileService().resolve(orcid="0000-0000-0000-0000") is None
+    finally:
+        profile.orcid = None
+        db.session.commit()
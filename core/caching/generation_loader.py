@@ -0,0 +1,78 @@
+import threading
+import time
+
+from flask import current_app
+
+from core.caching.result_cache import is_shared
+
+
+class GenerationLoader:
+    """
+    A structure derived from the database (an index...) kept in memory per application,
+    built by `build()` and rebuilt once the result cache generation of `scope` moves.
+
+    Without a shared cache backend the generation only moves with the invalidations of this
+    process: the structure is then also rebuilt once it is `max_age` seconds old, so changes
+    made by other processes still show up without rebuilding on every lookup.
+
+    A stale structure is rebuilt by a single thread: the others wait on the lock, check the
+    version again and reuse its result. Lookups never see a structure being built or
+    changed, since the new one replaces the previous one in a single assignment.
+    """
+
+    EXTENSION = "generation_loaders"
+
+    def __init__(self, scope: str = None, max_age: float = 60):
+        self.scope = scope
+        self.max_age = max_age
+        self._lock = threading.Lock()
+
+    def build(self):
+        raise NotImplementedError
+
+    def _version(self) -> tuple:
+        from app import cache
+
+        return cache.generation(self.scope), cache.local_generation(self.scope)
+
+    def _loaded(self):
+        return current_app.extensions.get(self.EXTENSION, {}).get(self)
+
+    def _store(self, version: tuple, value, loaded_at: float):
+        current_app.extensions.setdefault(self.EXTENSION, {})[self] = (version, value, loaded_at)
+
+    def _is_fresh(self, loaded, version: tuple) -> bool:
+        from app import cache
+
+        if loaded is None or loaded[0] != version:
+            return False
+        return is_shared(cache.backend) or time.monotonic() - loaded[2] < self.max_age
+
+    def get(self):
+        """The structure of the current application, built first if missing or stale"""
+        loaded = self._loaded()
+        if self._is_fresh(loaded, self._version()):
+            return loaded[1]
+
+        with self._lock:
+            version = self._version()
+            loaded = self._loaded()
+            if self._is_fresh(loaded, version):
+                return loaded[1]
+            value = self.build()
+            self._store(version, value, time.monotonic())
+        return value
+
+    def update(self, change):
+        """
+        Replace the structure, if already built, by `change(structure)`, which must return a
+        modified copy. It is taken as current for the present version of `scope`.
+        """
+        with self._lock:
+            loaded = self._loaded()
+            if loaded is None:
+                return
+            self._store(self._version(), change(loaded[1]), loaded[2])
+
+    def forget(self):
+        current_app.extensions.get(self.EXTENSION, {}).pop(self, None)
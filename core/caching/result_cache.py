@@ -0,0 +1,200 @@
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from cachelib import BaseCache, FileSystemCache, NullCache, RedisCache
+from flask import current_app, has_app_context
+
+from core.caching.single_flight import SingleFlight
+
+GENERATION_KEY = "generation"
+
+
+class LRUMemoryCache(BaseCache):
+    """
+    In-process cache bounded both by time (per-entry TTL) and by size: once `threshold`
+    entries are stored, the least recently used one is evicted.
+    """
+
+    def __init__(self, threshold: int = 1000, default_timeout: int = 300):
+        super().__init__(default_timeout)
+        self._threshold = threshold
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _expires_at(self, timeout):
+        timeout = self._normalize_timeout(timeout)
+        return time.monotonic() + timeout if timeout > 0 else None
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout=None):
+        entry = (self._expires_at(timeout), pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._threshold:
+                self._entries.popitem(last=False)
+        return True
+
+    def add(self, key, value, timeout=None):
+        if self.has(key):
+            return False
+        return self.set(key, value, timeout)
+
+    def has(self, key):
+        return self.get(key) is not None
+
+    def delete(self, key):
+        with self._lock:
+            return self._entries.pop(key, None) is not None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        return True
+
+    def inc(self, key, delta=1):
+        with self._lock:
+            entry = self._entries.get(key)
+            value = pickle.loads(entry[1]) + delta if entry is not None else delta
+            expires_at = entry[0] if entry is not None else None
+            self._entries[key] = (expires_at, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+            self._entries.move_to_end(key)
+        return value
+
+    def __len__(self):
+        return len(self._entries)
+
+
+def create_backend(config) -> BaseCache:
+    """Build the cache backend selected by CACHE_TYPE (memory, filesystem, redis or null)"""
+    cache_type = config["CACHE_TYPE"]
+    timeout = config["CACHE_DEFAULT_TIMEOUT"]
+    threshold = config["CACHE_THRESHOLD"]
+
+    if cache_type == "memory":
+        return LRUMemoryCache(threshold=threshold, default_timeout=timeout)
+    if cache_type == "filesystem":
+        return FileSystemCache(config["CACHE_DIR"], threshold=threshold, default_timeout=timeout)
+    if cache_type == "redis":
+        import redis
+
+        client = redis.from_url(config["CACHE_REDIS_URL"])
+        return RedisCache(host=client, default_timeout=timeout, key_prefix=config["CACHE_KEY_PREFIX"])
+    if cache_type == "null":
+        return NullCache()
+
+    raise ValueError(f"Unknown CACHE_TYPE: {cache_type}")
+
+
+def is_shared(backend: BaseCache) -> bool:
+    """Whether every worker sees the entries (and invalidations) of `backend`, not just this process"""
+    return isinstance(backend, (FileSystemCache, RedisCache))
+
+
+class ResultCache:
+    """
+    Caches computed results (query pages, counts...) keyed by a namespace and the
+    parameters that produced them.
+
+    Every key embeds a generation number stored in the backend itself, so a call to
+    `invalidate()` makes all previously cached results unreachable at once, in every
+    worker sharing the backend. Stale entries are then dropped by the TTL/LRU bounds.
+
+    Concurrent misses for the same key within a process are coalesced, so N identical
+    requests arriving together run the computation only once.
+    """
+
+    def __init__(self, app=None):
+        self._null_backend = NullCache()
+        self._flights = SingleFlight()
+        self._local_generations = Counter()
+        self._local_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("CACHE_TYPE", "memory")
+        app.config.setdefault("CACHE_DEFAULT_TIMEOUT", 300)
+        app.config.setdefault("CACHE_THRESHOLD", 1000)
+        app.config.setdefault("CACHE_DIR", os.path.join(tempfile.gettempdir(), "cochehub_cache"))
+        app.config.setdefault("CACHE_REDIS_URL", "redis://localhost:6379/0")
+        app.config.setdefault("CACHE_KEY_PREFIX", "cochehub:")
+        app.extensions["result_cache"] = create_backend(app.config)
+
+    @property
+    def backend(self) -> BaseCache:
+        if not has_app_context():
+            return self._null_backend
+        return current_app.extensions.get("result_cache", self._null_backend)
+
+    @staticmethod
+    def _generation_key(scope):
+        return GENERATION_KEY if scope is None else f"{GENERATION_KEY}:{scope}"
+
+    def generation(self, scope: str = None) -> int:
+        """
+        Current generation of `scope` (the cached results when None). Other scopes let
+        derived in-process structures (name indexes...) notice changes made by other workers.
+        """
+        backend = self.backend
+        key = self._generation_key(scope)
+        generation = backend.get(key)
+        if generation is None:
+            # Seed with the clock rather than 0 so that a lost counter never makes
+            # entries of an older generation reachable again.
+            backend.add(key, time.time_ns(), timeout=0)
+            generation = backend.get(key)
+        return generation
+
+    def local_generation(self, scope: str = None) -> int:
+        """Number of invalidations of `scope` made by this process, whatever the backend"""
+        return self._local_generations[scope]
+
+    def invalidate(self, scope: str = None):
+        with self._local_lock:
+            self._local_generations[scope] += 1
+        self.generation(scope)
+        return self.backend.inc(self._generation_key(scope))
+
+    def make_key(self, namespace: str, params, scope: str = None) -> str:
+        digest = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+        return f"{namespace}:{self.generation(scope) or 0}:{digest}"
+
+    def get_or_compute(self, namespace: str, params, compute, timeout=None, scope: str = None):
+        """
+        Return the cached result for (namespace, params), calling `compute()` on a miss.
+        The entry expires when the generation of `scope` moves (see `generation`).
+        """
+        backend = self.backend
+        key = self.make_key(namespace, params, scope)
+        value = backend.get(key)
+        if value is not None:
+            return value
+
+        def compute_and_store():
+            # A previous leader may have stored the value since our lookup
+            stored = backend.get(key)
+            if stored is not None:
+                return stored
+            result = compute()
+            backend.set(key, result, timeout=timeout)
+            return result
+
+        return self._flights.do((id(backend), key), compute_and_store)
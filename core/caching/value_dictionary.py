@@ -0,0 +1,120 @@
+import threading
+import time
+from typing import Iterable, Optional
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert, select
+
+
+class ValueDictionary:
+    """
+    In-process id <-> string cache of a dictionary table (an `id` primary key and a unique
+    `value` column), which stores a repeated string column as small integer ids.
+
+    Dictionary tables only grow, so the table is loaded once per process and cached pairs
+    never go stale. Ids come from rows referencing the table, so a missing one was added by
+    another process and reloads it; values come from clients, so a missing one reloads it
+    at most every MISS_RELOAD_SECONDS. The cache is only dropped when the table is
+    (re)created and when a transaction that added values rolls back.
+    """
+
+    EXTENSION = "value_dictionaries"
+    MISS_RELOAD_SECONDS = 10
+
+    def __init__(self, name: str, model):
+        self.name = name
+        self.model = model
+        self._lock = threading.Lock()
+        event.listen(model.__table__, "after_create", lambda *args, **kwargs: self.forget())
+
+    @staticmethod
+    def _session(session=None):
+        if session is not None:
+            return session
+        from app import db
+
+        return db.session
+
+    def _current(self, session=None, reload: bool = False, stale_before: Optional[float] = None) -> tuple:
+        """
+        ({id: value}, {value: id}) of the table, loaded on first use, when `reload`, or when
+        loaded before the `stale_before` time.monotonic(). Threads waiting on the lock reuse
+        the pairs another one loaded meanwhile.
+        """
+        dictionaries = current_app.extensions.setdefault(self.EXTENSION, {})
+
+        def fresh(loaded):
+            return loaded is not None and (stale_before is None or loaded[2] >= stale_before)
+
+        loaded = dictionaries.get(self.name)
+        if not reload and fresh(loaded):
+            return loaded[:2]
+
+        with self._lock:
+            loaded = dictionaries.get(self.name)
+            if reload or not fresh(loaded):
+                loaded_at = time.monotonic()
+                rows = self._session(session).execute(select(self.model.id, self.model.value)).all()
+                loaded = ({id: value for id, value in rows}, {value: id for id, value in rows}, loaded_at)
+                dictionaries[self.name] = loaded
+        return loaded[:2]
+
+    def _after_miss(self) -> tuple:
+        """The pairs after missing a client value: reloaded if older than MISS_RELOAD_SECONDS"""
+        return self._current(stale_before=time.monotonic() - self.MISS_RELOAD_SECONDS)
+
+    def forget(self):
+        """Drop the cached pairs, e.g. after rolling back a transaction that added values"""
+        if has_app_context():
+            current_app.extensions.get(self.EXTENSION, {}).pop(self.name, None)
+
+    def decode(self, id: Optional[int]) -> Optional[str]:
+        return self.decode_many([id]).get(id) if id is not None else None
+
+    def decode_many(self, ids: Iterable[int]) -> dict:
+        """{id: value} of `ids`, reloading the table once if some are unknown"""
+        ids = set(ids) - {None}
+        values, _ = self._current()
+        if not ids <= values.keys():
+            values, _ = self._current(stale_before=time.monotonic())
+        return {id: values.get(id) for id in ids}
+
+    def encode(self, value: str) -> Optional[int]:
+        """Id of `value`, or None if no row holds it"""
+        _, ids = self._current()
+        if value not in ids:
+            _, ids = self._after_miss()
+        return ids.get(value)
+
+    def ids_matching(self, text: str) -> list:
+        """Ids of the values equal to `text` ignoring case"""
+        text = text.strip().lower()
+        for current in (self._current, self._after_miss):
+            values, _ = current()
+            matches = [id for id, value in values.items() if value.lower() == text]
+            if matches:
+                return matches
+        return []
+
+    def resolve(self, values: Iterable[str], session=None) -> dict:
+        """
+        {value: id} of `values`, inserting the missing ones in a single statement. Rows
+        added concurrently by another worker are ignored by the insert and read back.
+        """
+        values = set(values)
+        _, ids = self._current(session)
+        missing = values - ids.keys()
+        if missing:
+            session = self._session(session)
+            statement = (
+                insert(self.model.__table__)
+                .prefix_with("IGNORE", dialect="mysql")
+                .prefix_with("OR IGNORE", dialect="sqlite")
+            )
+            session.execute(statement, [{"value": value} for value in sorted(missing)])
+            session.info.setdefault("value_dictionaries", set()).add(self)
+            _, ids = self._current(session, reload=True)
+
+        # A case-insensitive collation may have matched another spelling of the value
+        folded = {value.lower(): id for value, id in ids.items()}
+        return {value: ids.get(value, folded.get(value.lower())) for value in values}
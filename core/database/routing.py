@@ -0,0 +1,169 @@
+import time
+from contextlib import contextmanager
+
+from flask import current_app, has_app_context, request, session
+from flask_sqlalchemy.session import Session
+from sqlalchemy import CompoundSelect, Select
+from sqlalchemy.exc import InterfaceError, OperationalError
+
+REPLICA_BIND = "replica"
+READ_METHODS = ("GET", "HEAD", "OPTIONS")
+
+# Keys of Session.info: depth of the replica_reads blocks entered, whether the session wrote,
+# whether it wrote anything but bookkeeping, depth of the bookkeeping_writes blocks entered,
+# whether the client of the request recently wrote, and whether the last statement went to the replica
+READS_KEY = "replica_reads"
+WROTE_KEY = "wrote"
+STICKING_WRITE_KEY = "sticking_write"
+BOOKKEEPING_KEY = "bookkeeping_writes"
+STICKY_KEY = "sticky"
+ON_REPLICA_KEY = "on_replica"
+# Key of the Flask session: until when the requests of a client that wrote read from the primary
+PRIMARY_UNTIL_KEY = "_primary_until"
+
+
+class RoutingSession(Session):
+    """
+    Session sending the SELECTs made within `replica_reads` (every GET request, read-only
+    repository methods) to the replica bind, and everything else to the primary.
+
+    Once the session has written (flushed, or executed any statement but a SELECT) it stays
+    on the primary, so a request always reads its own writes, and so do the requests that
+    follow for REPLICA_STICKY_SECONDS (see ReplicaRouter) unless it only wrote within
+    `bookkeeping_writes`. A replica that fails a statement is skipped for
+    REPLICA_RETRY_SECONDS and, if the session has no pending changes, the statement is run
+    again on the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        engine = super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+        self.info[ON_REPLICA_KEY] = False
+        # Explicit binds and the binds of models declaring a __bind_key__ are never rerouted
+        if bind is not None or engine is not self._db.engines.get(None):
+            return engine
+
+        if self._flushing or not isinstance(clause, (Select, CompoundSelect)):
+            self.info[WROTE_KEY] = True
+            if not self.info.get(BOOKKEEPING_KEY):
+                self.info[STICKING_WRITE_KEY] = True
+            return engine
+        if clause._for_update_arg is not None or not self.info.get(READS_KEY):
+            return engine
+        if self.info.get(WROTE_KEY) or self.info.get(STICKY_KEY):
+            return engine
+
+        replica = self._db.engines.get(REPLICA_BIND)
+        if replica is None or not replica_available():
+            return engine
+        self.info[ON_REPLICA_KEY] = True
+        return replica
+
+    def _falling_back(self, execute, *args, **kwargs):
+        try:
+            return execute(*args, **kwargs)
+        except (OperationalError, InterfaceError) as error:
+            if not self.info.get(ON_REPLICA_KEY):
+                raise
+            mark_replica_down(error)
+            # Rolling back would discard the pending objects (added under no_autoflush...)
+            if self.new or self.dirty or self.deleted:
+                raise
+            # Reads only ever go to the replica before the session writes: nothing else is lost
+            self.rollback()
+            return execute(*args, **kwargs)
+
+    def _routed(self, execute, statement, params=None, *, bind_arguments=None, **kwargs):
+        # Only ORM statements reach get_bind with their clause: Core ones (UNIONs...) would count as writes
+        bind_arguments = {"clause": statement, **(bind_arguments or {})}
+        return self._falling_back(execute, statement, params, bind_arguments=bind_arguments, **kwargs)
+
+    def execute(self, *args, **kwargs):
+        return self._routed(super().execute, *args, **kwargs)
+
+    def scalar(self, *args, **kwargs):
+        return self._routed(super().scalar, *args, **kwargs)
+
+    def scalars(self, *args, **kwargs):
+        return self._routed(super().scalars, *args, **kwargs)
+
+
+@contextmanager
+def replica_reads():
+    """
+    Send the reads made within to the replica, unless the session already wrote. Also usable
+    as a decorator (`@replica_reads()`) of read-only repository methods and views.
+    """
+    from app import db
+
+    info = db.session.info
+    info[READS_KEY] = info.get(READS_KEY, 0) + 1
+    try:
+        yield
+    finally:
+        info[READS_KEY] -= 1
+
+
+@contextmanager
+def bookkeeping_writes():
+    """
+    Writes made within (view and download records...) still read their own results in the
+    request, but do not keep the client on the primary afterwards: it never reads them back.
+    """
+    from app import db
+
+    info = db.session.info
+    info[BOOKKEEPING_KEY] = info.get(BOOKKEEPING_KEY, 0) + 1
+    try:
+        yield
+    finally:
+        info[BOOKKEEPING_KEY] -= 1
+
+
+def replica_available() -> bool:
+    if not has_app_context():
+        return False
+    return current_app.extensions[ReplicaRouter.EXTENSION]["down_until"] <= time.monotonic()
+
+
+def mark_replica_down(error=None):
+    current_app.extensions[ReplicaRouter.EXTENSION]["down_until"] = (
+        time.monotonic() + current_app.config["REPLICA_RETRY_SECONDS"]
+    )
+    current_app.logger.warning("Replica unavailable, reading from the primary: %s", error)
+
+
+class ReplicaRouter:
+    """
+    Routes the reads of GET requests to the replica configured by SQLALCHEMY_REPLICA_URI
+    (through RoutingSession), and keeps a client that wrote on the primary for
+    REPLICA_STICKY_SECONDS, long enough for the replica to catch up with its writes.
+    """
+
+    EXTENSION = "replica_router"
+
+    def __init__(self, db, app=None):
+        self.db = db
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault("REPLICA_STICKY_SECONDS", 10)
+        app.config.setdefault("REPLICA_RETRY_SECONDS", 30)
+        app.extensions[self.EXTENSION] = {"down_until": 0.0}
+        app.before_request(self.start_request)
+        app.after_request(self.end_request)
+
+    def start_request(self):
+        info = self.db.session.info
+        info[WROTE_KEY] = False
+        info[STICKING_WRITE_KEY] = False
+        info[STICKY_KEY] = REPLICA_BIND in self.db.engines and session.get(PRIMARY_UNTIL_KEY, 0) > time.time()
+        info[READS_KEY] = int(request.method in READ_METHODS)
+
+    def end_request(self, response):
+        info = self.db.session.info
+        if info.get(STICKING_WRITE_KEY) and REPLICA_BIND in self.db.engines:
+            session[PRIMARY_UNTIL_KEY] = time.time() + current_app.config["REPLICA_STICKY_SECONDS"]
+        # STICKY_KEY is left until the next request: a streamed response still reads after this
+        info[READS_KEY] = 0
+        return response
@@ -0,0 +1,216 @@
+import heapq
+from collections import Counter, defaultdict
+from typing import Iterable
+
+from flask import has_app_context
+
+from core.caching.generation_loader import GenerationLoader
+
+
+class FeatureIndex:
+    """
+    Inverted index of keys described by a group (e.g. a publication type) and a set of
+    features (e.g. tags and authors), to find the keys nearest to a query under the
+    difference [groups differ] + |symmetric difference of the feature sets|.
+
+    Only the keys sharing a feature with the query are scored one by one. The difference to
+    any other key is its group term plus both set sizes, so the best of them are simply the
+    smallest sets of each group, kept apart by size. Results are exact.
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._by_size = defaultdict(lambda: defaultdict(set))
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def keys(self):
+        return self._entries.keys()
+
+    def entry(self, key) -> tuple:
+        """(group, features) of an indexed key"""
+        return self._entries[key]
+
+    def add(self, key, group, features):
+        self.remove(key)
+        features = frozenset(features)
+        self._entries[key] = (group, features)
+        self._by_size[group][len(features)].add(key)
+        for feature in features:
+            self._postings[feature].add(key)
+
+    def remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        group, features = entry
+        sizes = self._by_size[group]
+        sizes[len(features)].discard(key)
+        if not sizes[len(features)]:
+            del sizes[len(features)]
+        for feature in features:
+            self._postings[feature].discard(key)
+            if not self._postings[feature]:
+                del self._postings[feature]
+
+    def difference(self, key, other) -> int:
+        group, features = self._entries[key]
+        other_group, other_features = self._entries[other]
+        return (group != other_group) + len(features ^ other_features)
+
+    def difference_from(self, group, features, key) -> int:
+        """Difference between a query and an indexed key"""
+        other_group, other_features = self._entries[key]
+        return (group != other_group) + len(frozenset(features) ^ other_features)
+
+    def _shared(self, features) -> Counter:
+        shared = Counter()
+        for feature in features:
+            shared.update(self._postings.get(feature, ()))
+        return shared
+
+    def nearest(self, group, features, k: int = 3, exclude=()) -> list:
+        """(key, difference) of the `k` keys nearest to a query, nearest first; lower keys win ties"""
+        features = frozenset(features)
+        exclude = set(exclude)
+        shared = self._shared(features)
+
+        candidates = [
+            (
+                (self._entries[key][0] != group) + len(features) + len(self._entries[key][1]) - 2 * count,
+                key,
+            )
+            for key, count in shared.items()
+            if key not in exclude
+        ]
+        # Of the keys sharing nothing, only the k smallest sets of each group can make the cut
+        for other_group, sizes in self._by_size.items():
+            taken = 0
+            for size in sorted(sizes):
+                for key in heapq.nsmallest(k + len(shared) + len(exclude), sizes[size]):
+                    if key in shared or key in exclude:
+                        continue
+                    candidates.append(((other_group != group) + len(features) + size, key))
+                    taken += 1
+                    if taken == k:
+                        break
+                if taken == k:
+                    break
+
+        return [(key, difference) for difference, key in heapq.nsmallest(k, candidates)]
+
+    def nearest_to(self, key, k: int = 3) -> list:
+        """Same as nearest, for the group and features of an indexed key (excluded from the result)"""
+        group, features = self._entries[key]
+        return self.nearest(group, features, k, exclude={key})
+
+    def differences_to(self, key):
+        """Yield (other key, difference) for every other key, without comparing feature sets"""
+        group, features = self._entries[key]
+        shared = self._shared(features)
+        for other, (other_group, other_features) in self._entries.items():
+            if other != key:
+                yield other, (group != other_group) + len(features) + len(other_features) - 2 * shared[other]
+
+
+def add_bitset(planes: list, bitset: int):
+    """Add 1 to the counters of the keys set in `bitset`; planes[j] holds bit j of every counter"""
+    for j in range(len(planes)):
+        planes[j], bitset = planes[j] ^ bitset, planes[j] & bitset
+        if not bitset:
+            return
+    planes.append(bitset)
+
+
+def batch_nearest(entries: Iterable, k: int = 3) -> dict:
+    """
+    {key: [(key, difference), ...]} of the `k` nearest keys of every (key, group, features)
+    entry, nearest first and lower keys winning ties, exactly as FeatureIndex.nearest_to.
+
+    Built for full rebuilds: each feature and each (group, feature count) bucket is a packed
+    bit array over all keys (a Python int, bit i for the i-th key), and the features every
+    key shares with a query are counted for all keys at once in bit-sliced counters, so the
+    work per query is a few word-parallel operations per feature and bucket instead of a
+    comparison with every other key. Buckets are visited by their lower bound on the
+    difference and skipped once they cannot beat the k-th best key found.
+    """
+    entries = sorted(entries, key=lambda entry: entry[0])
+    keys = [key for key, _, _ in entries]
+    postings = defaultdict(int)
+    buckets = defaultdict(int)
+    for bit, (_, group, features) in enumerate(entries):
+        for feature in features:
+            postings[feature] |= 1 << bit
+        buckets[(group, len(features))] |= 1 << bit
+
+    results = {}
+    for bit, (key, group, features) in enumerate(entries):
+        size = len(features)
+        planes = []
+        for feature in features:
+            add_bitset(planes, postings[feature])
+
+        bounds = sorted(
+            ((other_group != group) + size + other_size - 2 * min(size, other_size), other_group, other_size)
+            for other_group, other_size in buckets
+        )
+        # The k best as (-difference, -bit), so that the root of the heap is the worst of them
+        best = []
+        for bound, other_group, other_size in bounds:
+            if len(best) == k and bound > -best[0][0]:
+                break
+            remaining = buckets[(other_group, other_size)] & ~(1 << bit)
+            while remaining:
+                # The keys of the bucket sharing the most features: walk the counters from the top bit
+                top, shared = remaining, 0
+                for j in reversed(range(len(planes))):
+                    if top & planes[j]:
+                        top &= planes[j]
+                        shared |= 1 << j
+                remaining &= ~top
+                difference = (other_group != group) + size + other_size - 2 * shared
+                if len(best) == k and difference > -best[0][0]:
+                    break
+                while top:
+                    lowest = top & -top
+                    entry = (-difference, -(lowest.bit_length() - 1))
+                    if len(best) < k:
+                        heapq.heappush(best, entry)
+                    elif entry > best[0]:
+                        heapq.heapreplace(best, entry)
+                    else:
+                        # The other keys of `top` tie on the difference and come later
+                        break
+                    top ^= lowest
+
+        results[key] = [
+            (keys[-negative_bit], -negative_difference)
+            for negative_difference, negative_bit in sorted(best, reverse=True)
+        ]
+    return results
+
+
+class ReloadingFeatureIndex(GenerationLoader):
+    """FeatureIndex of the current application, loaded from `load()`: (key, group, features) triples"""
+
+    def __init__(self, name: str, load, scope: str = None):
+        super().__init__(scope)
+        self.name = name
+        self.load = load
+
+    def build(self) -> FeatureIndex:
+        index = FeatureIndex()
+        for key, group, features in self.load():
+            index.add(key, group, features)
+        return index
+
+    def current(self) -> FeatureIndex:
+        """The index of the current application, or an empty one outside an application context"""
+        if not has_app_context():
+            return FeatureIndex()
+        return self.get()
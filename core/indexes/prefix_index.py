@@ -0,0 +1,75 @@
+import heapq
+import threading
+
+from sortedcontainers import SortedList
+
+from core.indexes.text import normalize
+
+
+class PrefixIndex:
+    """
+    Weighted values kept sorted by their normalized form, so the values starting with a
+    prefix are a contiguous range found by bisection.
+
+    The top-k of the shortest prefixes spans most of the index, so it is memoized until
+    the next change.
+    """
+
+    MEMO_PREFIX_LENGTH = 2
+
+    def __init__(self):
+        self._entries = SortedList()
+        self._weights = {}
+        self._memo = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._weights)
+
+    def add(self, value: str, weight: int = 1):
+        key = normalize(value)
+        if not key or weight == 0:
+            return
+        with self._lock:
+            entry = (key, value)
+            current = self._weights.get(entry, 0)
+            if current == 0:
+                self._entries.add(entry)
+            self._weights[entry] = current + weight
+            if self._weights[entry] <= 0:
+                self._entries.remove(entry)
+                del self._weights[entry]
+            self._memo.clear()
+
+    def copy(self) -> "PrefixIndex":
+        """An independent copy, to change while lookups keep using this one"""
+        copy = PrefixIndex()
+        with self._lock:
+            copy._entries = self._entries.copy()
+            copy._weights = dict(self._weights)
+        return copy
+
+    def remove(self, value: str, weight: int = 1):
+        self.add(value, -weight)
+
+    def weight(self, value: str) -> int:
+        return self._weights.get((normalize(value), value), 0)
+
+    def suggest(self, prefix: str, limit: int = 10) -> list:
+        """The `limit` heaviest (value, weight) pairs whose normalized form starts with the prefix"""
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        memoize = len(prefix) <= self.MEMO_PREFIX_LENGTH
+        with self._lock:
+            if memoize and (prefix, limit) in self._memo:
+                return self._memo[(prefix, limit)]
+
+            candidates = self._entries.irange((prefix,), (prefix + "\uffff",))
+            top = heapq.nsmallest(limit, candidates, key=lambda entry: (-self._weights[entry], entry))
+            result = [(value, self._weights[(key, value)]) for key, value in top]
+
+            if memoize:
+                self._memo[(prefix, limit)] = result
+        return result
@@ -0,0 +1,6 @@
+from unidecode import unidecode
+
+
+def normalize(text: str) -> str:
+    """Lowercase ASCII form of a text, with accents removed and whitespace collapsed ("José " -> "jose")"""
+    return " ".join(unidecode(text or "").lower().split())
@@ -0,0 +1,95 @@
+from collections import Counter, defaultdict
+from typing import Optional
+
+from flask import has_app_context
+
+from core.caching.generation_loader import GenerationLoader
+from core.indexes.text import normalize
+
+
+def trigrams(text: str) -> set:
+    """Trigrams of a normalized text, padded so that word starts and ends count too"""
+    padded = f"  {text} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class TrigramIndex:
+    """
+    Fuzzy lookup of short texts (names) by trigram overlap, ignoring case and accents.
+
+    The score of a candidate is the share of the query trigrams it contains, so a value
+    containing the query scores 1.0 and typos lower it gradually ("Jsoe" still finds "José").
+    """
+
+    def __init__(self):
+        self._postings = defaultdict(set)
+        self._values = {}
+
+    def __len__(self):
+        return len(self._values)
+
+    def add(self, key, text: str):
+        self.remove(key)
+        value = normalize(text)
+        if not value:
+            return
+        self._values[key] = value
+        for trigram in trigrams(value):
+            self._postings[trigram].add(key)
+
+    def remove(self, key):
+        value = self._values.pop(key, None)
+        if value is None:
+            return
+        for trigram in trigrams(value):
+            self._postings[trigram].discard(key)
+            if not self._postings[trigram]:
+                del self._postings[trigram]
+
+    def search(self, query: str, limit: Optional[int] = 10, threshold: float = 0.5) -> list:
+        """
+        (key, score) pairs with a score of at least `threshold`, best first; shorter values win
+        ties. A `limit` of None returns every match.
+        """
+        query = normalize(query)
+        if not query:
+            return []
+
+        if len(query) < 3:
+            # Too short to have inner trigrams: plain containment over the (in-memory) values
+            scores = {key: 1.0 for key, value in self._values.items() if query in value}
+        else:
+            # Inner trigrams only, so that a query found in the middle of a word scores 1.0
+            query_trigrams = {query[i : i + 3] for i in range(len(query) - 2)}
+            shared = Counter()
+            for trigram in query_trigrams:
+                shared.update(self._postings.get(trigram, ()))
+            scores = {key: count / len(query_trigrams) for key, count in shared.items()}
+
+        matches = [(key, score) for key, score in scores.items() if score >= threshold]
+        matches.sort(key=lambda match: (-match[1], len(self._values[match[0]]), str(match[0])))
+        return matches[:limit]
+
+
+class ReloadingTrigramIndex(GenerationLoader):
+    """
+    TrigramIndex of the current application, loaded from `load()` (an iterable of
+    (key, text) pairs) and reloaded when the result cache generation of `scope` moves.
+    """
+
+    def __init__(self, name: str, load, scope: str):
+        super().__init__(scope)
+        self.name = name
+        self.load = load
+
+    def build(self) -> TrigramIndex:
+        index = TrigramIndex()
+        for key, text in self.load():
+            index.add(key, text)
+        return index
+
+    def search(self, query: str, limit: Optional[int] = 10, threshold: float = 0.5):
+        """Same as TrigramIndex.search, or None outside an application context"""
+        if not has_app_context():
+            return None
+        return self.get().search(query, limit=limit, threshold=threshold)
@@ -1,6 +1,8 @@
 import os
 import secrets
 
+from core.database.routing import REPLICA_BIND
+
 
 class ConfigManager:
     def __init__(self, app):
@@ -19,6 +21,14 @@ class ConfigManager:
         else:
             self.app.config.from_object(DevelopmentConfig)
 
+        # Reads routed to the replica (see core.database.routing) use a bind of their own
+        replica_uri = self.app.config.get("SQLALCHEMY_REPLICA_URI")
+        if replica_uri:
+            self.app.config["SQLALCHEMY_BINDS"] = {
+                **self.app.config.get("SQLALCHEMY_BINDS", {}),
+                REPLICA_BIND: replica_uri,
+            }
+
 
 class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", secrets.token_bytes())
@@ -29,6 +39,18 @@ class Config:
         f"{os.getenv('MARIADB_PORT', '3306')}/"
         f"{os.getenv('MARIADB_DATABASE', 'default_db')}"
     )
+    # Optional MariaDB replica, with the credentials and database of the primary
+    SQLALCHEMY_REPLICA_URI = (
+        f"mysql+pymysql://{os.getenv('MARIADB_USER', 'default_user')}:"
+        f"{os.getenv('MARIADB_PASSWORD', 'default_password')}@"
+        f"{os.getenv('MARIADB_REPLICA_HOSTNAME')}:"
+        f"{os.getenv('MARIADB_REPLICA_PORT', os.getenv('MARIADB_PORT', '3306'))}/"
+        f"{os.getenv('MARIADB_DATABASE', 'default_db')}"
+        if os.getenv("MARIADB_REPLICA_HOSTNAME")
+        else None
+    )
+    REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+    REPLICA_RETRY_SECONDS = int(os.getenv("REPLICA_RETRY_SECONDS", "30"))
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     MAIL_SERVER = os.getenv("MAIL_SERVER", "localhost")
     MAIL_PORT = os.getenv("MAIL_PORT", "1025")
@@ -38,6 +60,15 @@ class Config:
     TIMEZONE = "Europe/Madrid"
     TEMPLATES_AUTO_RELOAD = True
     UPLOAD_FOLDER = "uploads"
+    CACHE_TYPE = os.getenv("CACHE_TYPE", "memory")
+    CACHE_DEFAULT_TIMEOUT = int(os.getenv("CACHE_DEFAULT_TIMEOUT", "300"))
+    CACHE_THRESHOLD = int(os.getenv("CACHE_THRESHOLD", "1000"))
+    CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "redis://localhost:6379/0")
+    IDENTITY_CACHE_TIMEOUT = int(os.getenv("IDENTITY_CACHE_TIMEOUT", "60"))
+    IDENTITY_CACHE_THRESHOLD = int(os.getenv("IDENTITY_CACHE_THRESHOLD", "1000"))
+    SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "database")
+    ELASTICSEARCH_URL = os.getenv("ELASTICSEARCH_URL", "http://localhost:9200")
+    ELASTICSEARCH_INDEX = os.getenv("ELASTICSEARCH_INDEX", "datasets")
 
 
 class DevelopmentConfig(Config):
@@ -55,6 +86,8 @@ class TestingConfig(Config):
         f"{os.getenv('MARIADB_TEST_DATABASE', 'default_db')}"
     )
     WTF_CSRF_ENABLED = False
+    CACHE_TYPE = "null"
+    SQLALCHEMY_REPLICA_URI = None
 
 
 class ProductionConfig(Config):
@@ -1,4 +1,9 @@
-from typing import Generic, List, NoReturn, Optional, TypeVar, Union
+from typing import Generic, Iterable, List, NoReturn, Optional, TypeVar, Union
+
+from sqlalchemy import delete, func, insert
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import select, update
+from sqlalchemy.orm import MANYTOMANY, ONETOMANY
 
 import app
 
@@ -48,6 +53,10 @@ class BaseRepository(Generic[T]):
         return False
 
     def delete_by_column(self, column_name: str, value) -> bool:
+        if not self._deletes_per_instance():
+            return self.delete_where(**{column_name: value}) > 0
+
+        # Cascades of the ORM (deleting children, or nulling their foreign key) only run on deleted instances
         instances: List[T] = self.get_by_column(column_name, value)
         if not instances:
             return False
@@ -57,5 +66,70 @@ class BaseRepository(Generic[T]):
         self.session.commit()
         return True
 
-    def count(self) -> int:
-        return self.model.query.count()
+    def count(self, *criteria, **filters) -> int:
+        """Rows matching the criteria and column filters, counted by a single SELECT count(*)"""
+        statement = select(func.count()).select_from(self.model).where(*criteria).filter_by(**filters)
+        return self.session.scalar(statement)
+
+    def exists(self, *criteria, **filters) -> bool:
+        """Whether any row matches the criteria and column filters, without loading it"""
+        statement = select(self.model).where(*criteria).filter_by(**filters).exists()
+        return bool(self.session.scalar(select(statement)))
+
+    # Set-based operations: one statement whatever the number of rows. They work on rows,
+    # not instances, so ORM events, validators and relationship cascades do not run; the
+    # instances of the session are synchronized with the rows they change.
+
+    def bulk_create(self, rows: Iterable[dict], commit: bool = True, batch_size: int = 1000) -> int:
+        """Insert rows (dicts of column values) with one executemany INSERT per `batch_size` rows"""
+        rows = list(rows)
+        for start in range(0, len(rows), batch_size):
+            self.session.execute(insert(self.model), rows[start : start + batch_size])
+        self._end(commit)
+        return len(rows)
+
+    def bulk_update(self, rows: Iterable[dict], commit: bool = True) -> int:
+        """Update rows by primary key: each dict holds the primary key and the columns to set"""
+        rows = list(rows)
+        if rows:
+            self.session.execute(update(self.model), rows)
+        self._end(commit)
+        return len(rows)
+
+    def update_where(self, values: dict, *criteria, commit: bool = True, **filters) -> int:
+        """Set `values` on every row matching the criteria and column filters; returns how many"""
+        statement = update(self.model).where(*criteria).filter_by(**filters).values(**values)
+        result = self.session.execute(statement)
+        self._end(commit)
+        return result.rowcount
+
+    def delete_where(self, *criteria, commit: bool = True, **filters) -> int:
+        """Delete every row matching the criteria and column filters; returns how many"""
+        if not criteria and not filters:
+            raise ValueError("delete_where needs criteria or filters; use delete_all to delete every row")
+        result = self.session.execute(delete(self.model).where(*criteria).filter_by(**filters))
+        self._end(commit)
+        return result.rowcount
+
+    def delete_all(self, commit: bool = True) -> int:
+        """Delete every row of the table; returns how many"""
+        result = self.session.execute(delete(self.model))
+        self._end(commit)
+        return result.rowcount
+
+    def _end(self, commit: bool):
+        if commit:
+            self.session.commit()
+        else:
+            self.session.flush()
+
+    def _deletes_per_instance(self) -> bool:
+        """
+        Whether deleting a row must go through the ORM: besides delete cascades, deleting the
+        parent of a one-to-many (or a many-to-many) relationship nulls the foreign key of its
+        children, or deletes its association rows, which a plain DELETE would leave behind.
+        """
+        return any(
+            relationship.cascade.delete or relationship.direction in (ONETOMANY, MANYTOMANY)
+            for relationship in sqlalchemy_inspect(self.model).relationships
+        )
@@ -1,9 +1,20 @@
-from datetime import datetime
+import enum
+from datetime import date, datetime
+from functools import partial
 
-from flask import request
+from flask import Response, request, stream_with_context
 from flask_restful import Resource
+from sqlalchemy import and_
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import or_
 
 from app import db
+from core.database.routing import replica_reads
+from core.serialisers.cursor import decode_cursor, encode_cursor
+from core.serialisers.encoding import json_encoder
+
+# Query parameters of the list endpoints; any other one naming a field filters by it
+LIST_PARAMS = ("fields", "limit", "cursor", "order", "stream")
 
 
 def convert_value(value):
@@ -12,21 +23,167 @@ def convert_value(value):
     return value
 
 
+def parse_column_value(column, value):
+    """`value` (a query parameter or a cursor position) as the Python type of `column`. Raises ValueError."""
+    try:
+        python_type = column.type.python_type
+    except NotImplementedError:
+        return value
+    if isinstance(value, python_type):
+        return value
+    if python_type is bool:
+        if str(value).lower() in ("1", "true", "yes"):
+            return True
+        if str(value).lower() in ("0", "false", "no"):
+            return False
+        raise ValueError(f"Not a boolean: {value}")
+    if python_type in (datetime, date):
+        return python_type.fromisoformat(str(value))
+    if issubclass(python_type, enum.Enum):
+        try:
+            return python_type[str(value)]
+        except KeyError:
+            return python_type(value)
+    return python_type(value)
+
+
 class GenericResource(Resource):
+    """
+    CRUD resource of a model, serialized with a Serializer. Lists are paginated by cursor:
+
+    - ?limit= rows per page (DEFAULT_PAGE_SIZE, at most MAX_PAGE_SIZE); pass the returned
+      `next_cursor` back as ?cursor= for the next page;
+    - ?<field>=value keeps the rows whose field (one serialized from a column) equals value;
+      parameters naming no field are ignored;
+    - ?order=<field> or ?order=-<field> sorts by such a field (non-nullable), then by id;
+    - ?stream=ndjson streams every matching row instead, one JSON document per line,
+      loading them in batches of STREAM_BATCH_SIZE.
+    """
+
+    DEFAULT_PAGE_SIZE = 100
+    MAX_PAGE_SIZE = 1000
+    STREAM_BATCH_SIZE = 500
+
     def __init__(self, model, serializer):
         self.model = model
         self.model_name = model.__name__
         self.serializer = serializer
 
+    def get_page_size(self, limit=None) -> int:
+        try:
+            limit = int(limit) if limit is not None else self.DEFAULT_PAGE_SIZE
+        except (TypeError, ValueError):
+            limit = self.DEFAULT_PAGE_SIZE
+        return max(1, min(limit, self.MAX_PAGE_SIZE))
+
+    def column_of(self, key):
+        """Column attribute of the model a serialized field reads, or None if it is not a plain column"""
+        attr_name = self.serializer.serialization_fields.get(key)
+        column_attrs = sqlalchemy_inspect(self.model).column_attrs
+        if attr_name is None or attr_name not in column_attrs:
+            return None
+        return getattr(self.model, attr_name)
+
+    def filter_query(self, query, args):
+        """
+        `query` with the field filters of `args`. Parameters naming no field (cache busters
+        such as `_=`...) are ignored. Raises ValueError on fields that cannot filter.
+        """
+        for key, value in args.items():
+            if key in LIST_PARAMS or key not in self.serializer.serialization_fields:
+                continue
+            column = self.column_of(key)
+            if column is None:
+                raise ValueError(f"Cannot filter by {key}")
+            try:
+                query = query.filter(column == parse_column_value(column, value))
+            except ValueError as exc:
+                raise ValueError(f"Invalid value for {key}: {value}") from exc
+        return query
+
+    def order_columns(self, order) -> tuple:
+        """(columns, descending) of ?order=, the primary key last. Raises ValueError on fields that cannot order."""
+        primary_key = getattr(self.model, sqlalchemy_inspect(self.model).primary_key[0].key)
+        if not order:
+            return [primary_key], False
+        descending = order.startswith("-")
+        key = order.lstrip("-")
+        column = self.column_of(key)
+        if column is None or column.expression.nullable:
+            raise ValueError(f"Cannot order by {key}")
+        if column.expression is primary_key.expression:
+            return [primary_key], descending
+        return [column, primary_key], descending
+
+    def list_query(self, fields, args):
+        """
+        (query, order columns, descending) of the rows of the list endpoint: filtered, ordered
+        and with the eager loads of `fields`
+        """
+        columns, descending = self.order_columns(args.get("order"))
+        query = self.filter_query(self.model.query, args)
+        query = query.options(*self.serializer.loader_options(self.model, fields))
+        return (
+            query.order_by(*(column.desc() if descending else column.asc() for column in columns)),
+            columns,
+            descending,
+        )
+
     def get(self, id=None):
+        """One item, or a page of them (see the class docstring); ?fields=a,b returns only those fields"""
+        try:
+            fields = self.serializer.parse_fields(request.args.get("fields"))
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
         if id:
             item = self.model.query.get(id)
             if not item:
                 return {"message": f"{self.model_name} not found"}, 404
-            return self.serializer.serialize(item), 200
-        else:
-            items = self.model.query.all()
-            return {"items": [self.serializer.serialize(i) for i in items]}, 200
+            return self.serializer.serialize(item, fields), 200
+
+        try:
+            query, columns, descending = self.list_query(fields, request.args)
+            if request.args.get("stream") == "ndjson":
+                return self.stream(query, fields)
+            after = (
+                decode_cursor(request.args["cursor"], [partial(parse_column_value, column) for column in columns])
+                if request.args.get("cursor")
+                else None
+            )
+        except ValueError as exc:
+            return {"message": str(exc)}, 400
+
+        if after is not None:
+            query = query.filter(self.after_position(columns, after, descending))
+        page_size = self.get_page_size(request.args.get("limit"))
+        items = query.limit(page_size + 1).all()
+
+        next_cursor = None
+        if len(items) > page_size:
+            items = items[:page_size]
+            next_cursor = encode_cursor(*(getattr(items[-1], column.key) for column in columns))
+        return {"items": self.serializer.serialize_many(items, fields), "next_cursor": next_cursor}, 200
+
+    @staticmethod
+    def after_position(columns, position, descending):
+        """Condition of the rows after `position` in the order of `columns` (keyset pagination)"""
+        conditions = []
+        for i, column in enumerate(columns):
+            beyond = column < position[i] if descending else column > position[i]
+            conditions.append(and_(*(columns[j] == position[j] for j in range(i)), beyond))
+        return or_(*conditions)
+
+    def stream(self, query, fields) -> Response:
+        """Every row of `query` as NDJSON, loaded STREAM_BATCH_SIZE at a time instead of all at once"""
+
+        def generate():
+            # Iterated after the request ended, which stopped routing its reads to the replica
+            with replica_reads():
+                for instance in query.yield_per(self.STREAM_BATCH_SIZE):
+                    yield json_encoder.encode(self.serializer.serialize(instance, fields)) + b"\n"
+
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
 
     def post(self):
         data = request.get_json()
@@ -0,0 +1,34 @@
+import base64
+import enum
+import json
+from datetime import date, datetime
+from typing import Callable, Sequence
+
+
+def cursor_value(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    return value
+
+
+def encode_cursor(*position) -> str:
+    """Opaque cursor of a keyset position (the sort values of the last row of a page)"""
+    position = [cursor_value(value) for value in position]
+    return base64.urlsafe_b64encode(json.dumps(position).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable]) -> tuple:
+    """
+    Position of a cursor produced by encode_cursor, each value converted by the parser of its
+    place (datetime.fromisoformat, int...). Raises ValueError if it is malformed or does not
+    hold one value per parser.
+    """
+    try:
+        position = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(position) != len(parsers):
+            raise ValueError("Cursor does not match the order")
+        return tuple(parse(value) for parse, value in zip(parsers, position))
+    except (TypeError, ValueError, KeyError, UnicodeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
@@ -0,0 +1,66 @@
+import enum
+from decimal import Decimal
+
+import msgspec
+from flask import Response, request
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+# Both names are in use for MessagePack; a response answers with the one asked for
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+
+def enc_hook(value):
+    """Types msgspec does not encode natively"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, Decimal):
+        return float(value)
+    raise NotImplementedError(f"Cannot encode objects of type {type(value).__name__}")
+
+
+json_encoder = msgspec.json.Encoder(enc_hook=enc_hook)
+msgpack_encoder = msgspec.msgpack.Encoder(enc_hook=enc_hook)
+
+
+def negotiate_mimetype() -> str:
+    """Response mimetype preferred by the Accept header of the request: JSON unless MessagePack is asked for"""
+    return request.accept_mimetypes.best_match((JSON_MIMETYPE, *MSGPACK_MIMETYPES), default=JSON_MIMETYPE)
+
+
+def encode(data, mimetype: str = JSON_MIMETYPE) -> bytes:
+    """
+    `data` (dicts, lists, msgspec Structs, datetimes...) encoded by msgspec as MessagePack
+    or JSON. Datetimes become RFC 3339 strings in both.
+    """
+    if mimetype in MSGPACK_MIMETYPES:
+        return msgpack_encoder.encode(data)
+    return json_encoder.encode(data)
+
+
+def encoded_response(data, status: int = 200, headers=None) -> Response:
+    """Response of `data` in the mimetype negotiated with the request, in place of jsonify"""
+    mimetype = negotiate_mimetype()
+    response = Response(encode(data, mimetype), status=status, mimetype=mimetype, headers=headers)
+    response.vary.add("Accept")
+    return response
+
+
+def output_json(data, code, headers=None) -> Response:
+    """flask_restful representation of application/json"""
+    response = Response(json_encoder.encode(data), status=code, mimetype=JSON_MIMETYPE, headers=headers)
+    response.vary.add("Accept")
+    return response
+
+
+def output_msgpack(data, code, headers=None) -> Response:
+    """flask_restful representation of MessagePack"""
+    response = Response(msgpack_encoder.encode(data), status=code, mimetype=MSGPACK_MIMETYPE, headers=headers)
+    response.vary.add("Accept")
+    return response
+
+
+def register_representations(api):
+    """Negotiate the responses of the resources of a flask_restful Api between JSON and MessagePack"""
+    api.representations = {JSON_MIMETYPE: output_json, **{mimetype: output_msgpack for mimetype in MSGPACK_MIMETYPES}}
+    return api
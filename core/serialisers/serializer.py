@@ -1,4 +1,12 @@
-from datetime import datetime
+import inspect
+from datetime import date, datetime
+from operator import attrgetter
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import Date, DateTime
+from sqlalchemy import inspect as sqlalchemy_inspect
+from sqlalchemy import orm
+from sqlalchemy.exc import NoInspectionAvailable
 
 
 def convert_value(value):
@@ -7,25 +15,172 @@ def convert_value(value):
     return value
 
 
+def convert_any(value):
+    return value.isoformat() if isinstance(value, date) else value
+
+
+# Post-processing of the fields that only need their dates converted, or their method
+# called and the result converted: done inline rather than through a function call
+CONVERT = object()
+CALL = object()
+
+
 class Serializer:
-    def __init__(self, serialization_fields, related_serializers=None):
+    """
+    Serialize model instances to dicts of `serialization_fields` ({key: attribute name}).
+    Attributes that are methods on the model are called; related serializers serialize the
+    instance (or list of instances) the attribute returns.
+
+    Each model class (and sparse fieldset) is compiled once into a single attrgetter plus
+    the calls and conversions of the fields that need them, so serializing an instance does
+    no getattr/callable probing. Plain columns skip the datetime conversion, which only
+    columns of date types need.
+
+    Args:
+        serialization_fields: {key in the output: attribute or method name}.
+        related_serializers: {key: Serializer} of the fields holding related instances.
+        depends_on: {key: relationship names} the methods of the fields read, so that
+            `loader_options` can load them eagerly (e.g. {"name": ("ds_meta_data",)}).
+    """
+
+    def __init__(self, serialization_fields, related_serializers=None, depends_on=None):
         self.serialization_fields = serialization_fields
         self.related_serializers = related_serializers or {}
+        self.depends_on = depends_on or {}
+        self._compiled = {}
+
+    def parse_fields(self, fields: Optional[str]) -> Optional[tuple]:
+        """Keys of a ?fields=a,b sparse fieldset (None for all of them). Raises ValueError on unknown ones."""
+        if not fields:
+            return None
+        requested = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in requested if field not in self.serialization_fields]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+        return requested
+
+    def _post_processor(self, model, key, attr_name):
+        """
+        What to do with the attribute value of a field: None (use it as is), CONVERT (convert
+        dates), CALL (call the method and convert), or a function (e.g. serialize the related
+        instances)
+        """
+        static = inspect.getattr_static(model, attr_name, None)
+        is_method = inspect.isfunction(static) or isinstance(static, (staticmethod, classmethod))
+        related = self.related_serializers.get(key)
+        if related is not None:
+
+            def serialize_related(value):
+                value = value() if is_method else value
+                if isinstance(value, list):
+                    return related.serialize_many(value)
+                return related.serialize(value) if value is not None else None
+
+            return serialize_related
+        if is_method:
+            return CALL
+        if static is None:
+            # Not declared on the class (e.g. set per instance): it may hold anything, even a method
+            return lambda value: convert_any(value() if callable(value) else value)
+        if self._is_plain_column(model, attr_name):
+            return None
+        return CONVERT
+
+    @staticmethod
+    def _is_plain_column(model, attr_name) -> bool:
+        try:
+            column_attrs = sqlalchemy_inspect(model).column_attrs
+        except NoInspectionAvailable:
+            return False
+        if attr_name not in column_attrs:
+            return False
+        return not any(isinstance(column.type, (Date, DateTime)) for column in column_attrs[attr_name].columns)
+
+    def compile(self, model, fields: Optional[Sequence[str]] = None):
+        """
+        Function serializing instances of `model` with `fields` (all when None), compiled on
+        first use: one attrgetter reads every attribute in a single call, and only the fields
+        that need it are called, converted or serialized afterwards.
+        """
+        cache_key = (model, tuple(fields) if fields is not None else None)
+        compiled = self._compiled.get(cache_key)
+        if compiled is not None:
+            return compiled
+
+        keys = tuple(fields) if fields is not None else tuple(self.serialization_fields)
+        attr_names = [self.serialization_fields[key] for key in keys]
+        # Plain values go into the dict as read; only the other fields are revisited
+        fixes = []
+        for index, (key, attr_name) in enumerate(zip(keys, attr_names)):
+            post = self._post_processor(model, key, attr_name)
+            if post is not None:
+                fixes.append((index, key, post))
+        # attrgetter of several names returns a tuple, of a single one the bare value
+        if len(attr_names) > 1:
+            getter = attrgetter(*attr_names)
+        else:
+            getter = lambda instance: tuple(getattr(instance, attr_name) for attr_name in attr_names)  # noqa: E731
+
+        def serialize(instance):
+            try:
+                values = getter(instance)
+            except AttributeError:
+                # Missing attributes serialize as None
+                values = [getattr(instance, attr_name, None) for attr_name in attr_names]
+            serialized = dict(zip(keys, values))
+            for index, key, post in fixes:
+                value = values[index]
+                if post is CALL:
+                    value = value()
+                elif post is not CONVERT:
+                    serialized[key] = post(value)
+                    continue
+                serialized[key] = value.isoformat() if isinstance(value, date) else value
+            return serialized
+
+        self._compiled[cache_key] = serialize
+        return serialize
+
+    def serialize(self, instance, fields: Optional[Sequence[str]] = None) -> dict:
+        return self.compile(type(instance), fields)(instance)
+
+    def serialize_many(self, instances: Iterable, fields: Optional[Sequence[str]] = None) -> list:
+        """
+        Serialize instances with the function compiled for their class. Query them with
+        `loader_options(model, fields)` so that related fields do not load row by row.
+        """
+        instances = instances if isinstance(instances, (list, tuple)) else list(instances)
+        if not instances:
+            return []
+        model = type(instances[0])
+        serialize = self.compile(model, fields)
+        if all(type(instance) is model for instance in instances):
+            return [serialize(instance) for instance in instances]
+        # Mixed classes (e.g. polymorphic loads): each with its own compiled function
+        return [self.compile(type(instance), fields)(instance) for instance in instances]
+
+    def loader_options(self, model, fields: Optional[Sequence[str]] = None, parent=None) -> list:
+        """
+        Eager-loading options for a query of `model` serialized with `fields`: related fields
+        are loaded with selectinload (recursively with their own serializer) and the
+        relationships of `depends_on` with joinedload.
+        """
+        try:
+            relationships = sqlalchemy_inspect(model).relationships
+        except NoInspectionAvailable:
+            return []
 
-    def serialize(self, instance):
-        serialized_data = {}
-        for key, attr_name in self.serialization_fields.items():
-            if key in self.related_serializers:
-                related_data = getattr(instance, attr_name)()
-                if isinstance(related_data, list):
-                    serialized_data[key] = [
-                        self.related_serializers[key].serialize(sub_instance) for sub_instance in related_data
-                    ]
-                else:
-                    serialized_data[key] = self.related_serializers[key].serialize(related_data)
-            else:
-                attr = getattr(instance, attr_name, None)
-                if callable(attr):
-                    attr = attr()
-                serialized_data[key] = convert_value(attr)
-        return serialized_data
+        root = parent if parent is not None else orm
+        options, joined = [], set()
+        for key in fields if fields is not None else self.serialization_fields:
+            attr_name = self.serialization_fields[key]
+            if key in self.related_serializers and attr_name in relationships:
+                loader = root.selectinload(getattr(model, attr_name))
+                options.append(loader)
+                related_model = relationships[attr_name].mapper.class_
+                options.extend(self.related_serializers[key].loader_options(related_model, parent=loader))
+            for name in self.depends_on.get(key, ()):
+                if name in relationships and name not in joined:
+                    joined.add(name)
+                    options.append(root.joinedload(getattr(model, name)))
+        return options
@@ -0,0 +1,28 @@
+from bisect import bisect_right
+
+
+class FixedHistogram:
+    """
+    Counts per fixed bin: `edges` are the lower bounds of the bins, the last one being
+    open-ended, and values below the first edge fall in the first bin. Histograms with
+    the same edges merge by adding their counts.
+    """
+
+    def __init__(self, edges, counts=None):
+        self.edges = list(edges)
+        self.counts = list(counts) if counts is not None else [0] * len(self.edges)
+
+    def update(self, value):
+        self.counts[max(bisect_right(self.edges, value) - 1, 0)] += 1
+
+    def merge(self, other: "FixedHistogram") -> "FixedHistogram":
+        if other.edges != self.edges:
+            raise ValueError("Cannot merge histograms with different bins")
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        return self
+
+    def bins(self) -> list:
+        upper_bounds = self.edges[1:] + [None]
+        return [
+            {"min": low, "max": high, "count": count} for low, high, count in zip(self.edges, upper_bounds, self.counts)
+        ]
@@ -0,0 +1,120 @@
+import math
+import random
+from bisect import bisect_right
+from itertools import accumulate
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch (Karnin, Lang and Liberty, 2016): a stack of compactors where
+    level h holds items of weight 2**h. When a level fills up it is sorted and every
+    other item (from a random offset) is promoted to the next level, so the sketch keeps
+    O(k) items whatever the stream length while the rank error stays around 1.7 / k.
+
+    Sketches of disjoint streams merge into the sketch of their union, which is what
+    lets per-file sketches be combined per dataset without rereading any row.
+    """
+
+    DEFAULT_K = 200
+    DECAY = 2 / 3
+
+    def __init__(self, k: int = DEFAULT_K, seed=None):
+        self.k = k
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.levels = [[]]
+        self._rng = random.Random(seed)
+
+    def __len__(self):
+        return self.count
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * self.DECAY**depth))
+
+    def _size(self) -> int:
+        return sum(len(items) for items in self.levels)
+
+    def _max_size(self) -> int:
+        return sum(self._capacity(level) for level in range(len(self.levels)))
+
+    def update(self, value):
+        self.levels[0].append(value)
+        self.count += 1
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if len(self.levels[0]) >= self._capacity(0):
+            self._compress()
+
+    def _compress(self):
+        while self._size() >= self._max_size():
+            for level, items in enumerate(self.levels):
+                if len(items) < self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append([])
+                items.sort()
+                # An odd item out stays at this level so that no weight is lost
+                kept = [items.pop()] if len(items) % 2 else []
+                self.levels[level + 1].extend(items[self._rng.randint(0, 1) :: 2])
+                self.levels[level] = kept
+                break
+
+    def merge(self, other: "KLLSketch") -> "KLLSketch":
+        """Fold `other` into this sketch (in place) and return it"""
+        if other.count == 0:
+            return self
+        while len(self.levels) < len(other.levels):
+            self.levels.append([])
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress()
+        return self
+
+    def _weighted(self):
+        items = sorted((value, 1 << level) for level, values in enumerate(self.levels) for value in values)
+        return [value for value, _ in items], list(accumulate(weight for _, weight in items))
+
+    def quantiles(self, fractions) -> list:
+        """Approximate values at each fraction (0..1) of the rank; the extremes are exact"""
+        if self.count == 0:
+            return [None for _ in fractions]
+        values, cumulative = self._weighted()
+        total = cumulative[-1]
+        result = []
+        for fraction in fractions:
+            if fraction <= 0:
+                result.append(self.min)
+            elif fraction >= 1:
+                result.append(self.max)
+            else:
+                index = bisect_right(cumulative, fraction * total - 1e-9)
+                result.append(values[min(index, len(values) - 1)])
+        return result
+
+    def quantile(self, fraction: float):
+        return self.quantiles([fraction])[0]
+
+    def cdf(self, value) -> float:
+        """Approximate share of the stream that is <= `value`"""
+        if self.count == 0:
+            return 0.0
+        values, cumulative = self._weighted()
+        index = bisect_right(values, value)
+        return cumulative[index - 1] / cumulative[-1] if index else 0.0
+
+    def to_dict(self) -> dict:
+        return {"k": self.k, "count": self.count, "min": self.min, "max": self.max, "levels": self.levels}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "KLLSketch":
+        sketch = cls(k=data["k"])
+        sketch.count = data["count"]
+        sketch.min = data["min"]
+        sketch.max = data["max"]
+        sketch.levels = [list(items) for items in data["levels"]] or [[]]
+        return sketch
@@ -0,0 +1,158 @@
+import hashlib
+import random
+import struct
+from collections import defaultdict
+from typing import Iterable, Optional
+
+from flask import has_app_context
+
+from core.caching.generation_loader import GenerationLoader
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+class MinHash:
+    """
+    MinHash signature of a set of tokens (Broder, 1997): for each of `num_perm` random
+    hash functions, the minimum hash over the set. The share of positions two signatures
+    agree on estimates the Jaccard similarity of their sets, with a standard error of
+    about 1 / sqrt(num_perm).
+
+    The hash functions are drawn from a fixed seed, so signatures computed at different
+    times (and stored) stay comparable; signatures of different seeds or sizes are not.
+    """
+
+    NUM_PERM = 64
+    SEED = 1
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = SEED, values: Optional[list] = None):
+        self.num_perm = num_perm
+        self.seed = seed
+        self._permutations = self.permutations(num_perm, seed)
+        self.values = list(values) if values is not None else [MERSENNE_PRIME] * num_perm
+
+    @staticmethod
+    def permutations(num_perm: int, seed: int) -> list:
+        rng = random.Random(seed)
+        return [(rng.randrange(1, MERSENNE_PRIME), rng.randrange(0, MERSENNE_PRIME)) for _ in range(num_perm)]
+
+    @staticmethod
+    def token_hash(token: str) -> int:
+        return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "big")
+
+    def update(self, token: str):
+        value = self.token_hash(token)
+        self.values = [
+            min(current, (a * value + b) % MERSENNE_PRIME) for current, (a, b) in zip(self.values, self._permutations)
+        ]
+
+    def update_many(self, tokens: Iterable[str]):
+        for token in set(tokens):
+            self.update(token)
+        return self
+
+    def is_empty(self) -> bool:
+        return all(value == MERSENNE_PRIME for value in self.values)
+
+    def jaccard(self, other: "MinHash") -> float:
+        if (self.num_perm, self.seed) != (other.num_perm, other.seed):
+            raise ValueError("MinHash signatures of different hash functions are not comparable")
+        if self.is_empty() or other.is_empty():
+            return 0.0
+        return sum(1 for a, b in zip(self.values, other.values) if a == b) / self.num_perm
+
+    def to_bytes(self) -> bytes:
+        return struct.pack(f">HI{self.num_perm}Q", self.num_perm, self.seed, *self.values)
+
+    @classmethod
+    def from_bytes(cls, data: Optional[bytes]) -> Optional["MinHash"]:
+        """The signature stored by to_bytes, or None if there is none"""
+        if not data:
+            return None
+        num_perm, seed = struct.unpack_from(">HI", data)
+        return cls(num_perm, seed, struct.unpack_from(f">{num_perm}Q", data, struct.calcsize(">HI")))
+
+
+class LSHIndex:
+    """
+    Banded locality-sensitive hashing of MinHash signatures: each signature is cut into
+    `bands` bands of `rows` values, and keys whose signatures agree on a whole band land in
+    the same bucket. Keys with Jaccard similarity s collide in some band with probability
+    1 - (1 - s**rows)**bands, an S-curve around (1 / bands) ** (1 / rows), so a lookup reads
+    a few buckets instead of comparing the query with every key.
+    """
+
+    def __init__(self, bands: int = 16, rows: int = 4):
+        self.bands = bands
+        self.rows = rows
+        self._buckets = defaultdict(set)
+        self._signatures = {}
+
+    def __len__(self):
+        return len(self._signatures)
+
+    def __contains__(self, key):
+        return key in self._signatures
+
+    def signature(self, key) -> Optional[MinHash]:
+        return self._signatures.get(key)
+
+    def _band_keys(self, signature: MinHash) -> list:
+        if signature.num_perm != self.bands * self.rows:
+            raise ValueError(f"Signatures of {signature.num_perm} values do not fit {self.bands}x{self.rows} bands")
+        return [
+            (band, tuple(signature.values[band * self.rows : (band + 1) * self.rows])) for band in range(self.bands)
+        ]
+
+    def add(self, key, signature: MinHash):
+        self.remove(key)
+        if signature.is_empty():
+            return
+        self._signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].add(key)
+
+    def remove(self, key):
+        signature = self._signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].discard(key)
+            if not self._buckets[band_key]:
+                del self._buckets[band_key]
+
+    def query(self, signature: MinHash, threshold: float = 0.0, exclude=()) -> list:
+        """(key, estimated Jaccard) of the keys colliding with `signature` in any band, at least `threshold`"""
+        if signature.is_empty():
+            return []
+        candidates = set()
+        for band_key in self._band_keys(signature):
+            candidates |= self._buckets.get(band_key, set())
+        matches = [(key, signature.jaccard(self._signatures[key])) for key in candidates if key not in exclude]
+        return sorted(
+            [(key, similarity) for key, similarity in matches if similarity >= threshold],
+            key=lambda match: (-match[1], match[0]),
+        )
+
+
+class ReloadingLSHIndex(GenerationLoader):
+    """LSHIndex of the current application over the (key, MinHash) pairs of `load()`"""
+
+    def __init__(self, name: str, load, scope: str = None, bands: int = 16, rows: int = 4):
+        super().__init__(scope)
+        self.name = name
+        self.load = load
+        self.bands = bands
+        self.rows = rows
+
+    def build(self) -> LSHIndex:
+        index = LSHIndex(self.bands, self.rows)
+        for key, signature in self.load():
+            index.add(key, signature)
+        return index
+
+    def current(self) -> LSHIndex:
+        """The index of the current application, or an empty one outside an application context"""
+        if not has_app_context():
+            return LSHIndex(self.bands, self.rows)
+        return self.get()
@@ -0,0 +1,80 @@
+"""Dictionary-encode marca, motor, combustible and pais_de_origen of coche
+
+Revision ID: add_coche_dicts
+Revises: add_file_sketches
+Create Date: 2026-10-19 15:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_coche_dicts"
+down_revision = "add_file_sketches"
+branch_labels = None
+depends_on = None
+
+
+# coche column -> dictionary table
+DICTIONARIES = {
+    "marca": "coche_marca",
+    "motor": "coche_motor",
+    "combustible": "coche_combustible",
+    "pais_de_origen": "coche_pais_de_origen",
+}
+
+
+def upgrade():
+    for column, table in DICTIONARIES.items():
+        op.create_table(
+            table,
+            sa.Column("id", sa.Integer(), nullable=False),
+            sa.Column("value", sa.String(length=120), nullable=False),
+            sa.PrimaryKeyConstraint("id"),
+            sa.UniqueConstraint("value"),
+        )
+        # Backfill the dictionary with the distinct values of the column
+        op.execute(f"INSERT INTO {table} (value) SELECT DISTINCT {column} FROM coche")
+
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.drop_index("ix_coche_combustible_comienzo")
+        batch_op.drop_index("ix_coche_dataset_marca_modelo")
+        for column in DICTIONARIES:
+            batch_op.add_column(sa.Column(f"{column}_id", sa.Integer(), nullable=True))
+
+    for column, table in DICTIONARIES.items():
+        op.execute(f"UPDATE coche SET {column}_id = (SELECT id FROM {table} WHERE {table}.value = coche.{column})")
+
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        for column, table in DICTIONARIES.items():
+            batch_op.alter_column(f"{column}_id", existing_type=sa.Integer(), nullable=False)
+            batch_op.create_foreign_key(f"fk_coche_{column}_id", table, [f"{column}_id"], ["id"])
+            batch_op.drop_column(column)
+        batch_op.create_index("ix_coche_dataset_marca_modelo", ["dataset_id", "marca_id", "modelo"], unique=False)
+        batch_op.create_index(
+            "ix_coche_combustible_comienzo", ["combustible_id", "comienzo_de_produccion"], unique=False
+        )
+
+
+def downgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.drop_index("ix_coche_combustible_comienzo")
+        batch_op.drop_index("ix_coche_dataset_marca_modelo")
+        for column in DICTIONARIES:
+            batch_op.add_column(sa.Column(column, sa.String(length=120), nullable=True))
+
+    for column, table in DICTIONARIES.items():
+        op.execute(f"UPDATE coche SET {column} = (SELECT value FROM {table} WHERE {table}.id = coche.{column}_id)")
+
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        for column in DICTIONARIES:
+            batch_op.drop_constraint(f"fk_coche_{column}_id", type_="foreignkey")
+            batch_op.drop_column(f"{column}_id")
+            batch_op.alter_column(column, existing_type=sa.String(length=120), nullable=False)
+        batch_op.create_index("ix_coche_dataset_marca_modelo", ["dataset_id", "marca", "modelo"], unique=False)
+        batch_op.create_index("ix_coche_combustible_comienzo", ["combustible", "comienzo_de_produccion"], unique=False)
+
+    for table in DICTIONARIES.values():
+        op.drop_table(table)
@@ -0,0 +1,35 @@
+"""Add matricula_duplicada flag and the cross-dataset matricula index to coche
+
+Revision ID: add_coche_matricula_idx
+Revises: add_coche_dicts
+Create Date: 2026-10-19 16:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_coche_matricula_idx"
+down_revision = "add_coche_dicts"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("matricula_duplicada", sa.Boolean(), nullable=False, server_default=sa.false()))
+        batch_op.create_index("ix_coche_matricula_dataset", ["matricula", "dataset_id"], unique=False)
+
+    # Flag the rows ingested before this revision that repeat a plate of their dataset
+    op.execute(
+        "UPDATE coche SET matricula_duplicada = 1 WHERE id NOT IN "
+        "(SELECT first_id FROM (SELECT MIN(id) AS first_id FROM coche GROUP BY dataset_id, matricula) AS firsts)"
+    )
+
+
+def downgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.drop_index("ix_coche_matricula_dataset")
+        batch_op.drop_column("matricula_duplicada")
@@ -0,0 +1,28 @@
+"""Add composite indexes to coche for the row-level car API
+
+Revision ID: add_coche_query_idx
+Revises: add_ds_zone_map
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "add_coche_query_idx"
+down_revision = "add_ds_zone_map"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.create_index("ix_coche_dataset_marca_modelo", ["dataset_id", "marca", "modelo"], unique=False)
+        batch_op.create_index("ix_coche_combustible_comienzo", ["combustible", "comienzo_de_produccion"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.drop_index("ix_coche_combustible_comienzo")
+        batch_op.drop_index("ix_coche_dataset_marca_modelo")
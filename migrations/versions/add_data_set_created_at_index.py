@@ -0,0 +1,26 @@
+"""Add (created_at, id) index to data_set for keyset pagination
+
+Revision ID: add_ds_created_at_idx
+Revises: 22eac6cda529
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = "add_ds_created_at_idx"
+down_revision = "22eac6cda529"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table("data_set", schema=None) as batch_op:
+        batch_op.create_index("ix_data_set_created_at_id", ["created_at", "id"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("data_set", schema=None) as batch_op:
+        batch_op.drop_index("ix_data_set_created_at_id")
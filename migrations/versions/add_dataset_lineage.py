@@ -0,0 +1,107 @@
+"""Add dataset version lineage and per-row content hashes of coche
+
+Revision ID: add_dataset_lineage
+Revises: add_coche_matricula_idx
+Create Date: 2026-10-19 17:00:00.000000
+
+"""
+
+import hashlib
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_dataset_lineage"
+down_revision = "add_coche_matricula_idx"
+branch_labels = None
+depends_on = None
+
+
+# Frozen copy of CAR_HASHED_FIELDS and car_content_hash of app.modules.dataset.models
+HASHED_FIELDS = (
+    "modelo",
+    "marca",
+    "motor",
+    "consumo",
+    "combustible",
+    "comienzo_de_produccion",
+    "fin_de_produccion",
+    "asientos",
+    "puertas",
+    "peso",
+    "carga_max",
+    "pais_de_origen",
+    "precio_estimado",
+    "matricula",
+    "fecha_matriculacion",
+)
+DICTIONARIES = {
+    "marca": "coche_marca",
+    "motor": "coche_motor",
+    "combustible": "coche_combustible",
+    "pais_de_origen": "coche_pais_de_origen",
+}
+BATCH_SIZE = 10_000
+
+
+def hashed_value(value) -> str:
+    # Floats to 6 significant digits, which a single-precision FLOAT column round-trips
+    if value is None:
+        return ""
+    return format(value, ".6g") if isinstance(value, float) else str(value)
+
+
+def content_hash(values) -> int:
+    encoded = "\x1f".join(hashed_value(value) for value in values).encode("utf-8")
+    return int.from_bytes(hashlib.blake2b(encoded, digest_size=8).digest(), "big", signed=True)
+
+
+def upgrade():
+    with op.batch_alter_table("data_set", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("parent_id", sa.Integer(), nullable=True))
+        batch_op.create_foreign_key("fk_data_set_parent_id", "data_set", ["parent_id"], ["id"], ondelete="SET NULL")
+
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("row_hash", sa.BigInteger(), nullable=True))
+
+    # Hash the existing rows in id batches, reading the strings back from the dictionaries
+    metadata = sa.MetaData()
+    coche = sa.Table("coche", metadata, autoload_with=op.get_bind())
+    tables = {name: sa.Table(table, metadata, autoload_with=op.get_bind()) for name, table in DICTIONARIES.items()}
+    columns = [tables[field].c.value if field in tables else coche.c[field] for field in HASHED_FIELDS]
+    source = coche
+    for name, table in tables.items():
+        source = source.join(table, table.c.id == coche.c[f"{name}_id"])
+
+    connection = op.get_bind()
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(coche.c.id, *columns)
+            .select_from(source)
+            .where(coche.c.id > last_id)
+            .order_by(coche.c.id)
+            .limit(BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(
+            sa.update(coche).where(coche.c.id == sa.bindparam("car_id")).values(row_hash=sa.bindparam("hash")),
+            [{"car_id": row[0], "hash": content_hash(row[1:])} for row in rows],
+        )
+        last_id = rows[-1][0]
+
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.create_index("ix_coche_dataset_row_hash", ["dataset_id", "row_hash"], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table("coche", schema=None) as batch_op:
+        batch_op.drop_index("ix_coche_dataset_row_hash")
+        batch_op.drop_column("row_hash")
+
+    with op.batch_alter_table("data_set", schema=None) as batch_op:
+        batch_op.drop_constraint("fk_data_set_parent_id", type_="foreignkey")
+        batch_op.drop_column("parent_id")
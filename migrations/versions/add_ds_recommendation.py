@@ -0,0 +1,39 @@
+"""Add ds_recommendation table of the stored dataset recommendations
+
+Revision ID: add_ds_recommendation
+Revises: add_dataset_lineage
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_ds_recommendation"
+down_revision = "add_dataset_lineage"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table(
+        "ds_recommendation",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("dataset_id", sa.Integer(), nullable=False),
+        sa.Column("recommended_id", sa.Integer(), nullable=False),
+        sa.Column("rank", sa.Integer(), nullable=False),
+        sa.Column("difference", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["dataset_id"], ["data_set.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["recommended_id"], ["data_set.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("dataset_id", "rank", name="uq_ds_recommendation_rank"),
+    )
+    # Finding the datasets that recommend a changed one
+    op.create_index("ix_ds_recommendation_recommended_id", "ds_recommendation", ["recommended_id"], unique=False)
+
+
+def downgrade():
+    op.drop_index("ix_ds_recommendation_recommended_id", table_name="ds_recommendation")
+    op.drop_table("ds_recommendation")
@@ -0,0 +1,79 @@
+"""Add ds_zone_map table with per-dataset car summaries, backfilled from coche
+
+Revision ID: add_ds_zone_map
+Revises: add_ds_created_at_idx
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+
+from collections import defaultdict
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_ds_zone_map"
+down_revision = "add_ds_created_at_idx"
+branch_labels = None
+depends_on = None
+
+
+def encode_values(values):
+    return "|" + "".join(f"{value}|" for value in sorted({value.strip().lower() for value in values if value}))
+
+
+def upgrade():
+    zone_map = op.create_table(
+        "ds_zone_map",
+        sa.Column("dataset_id", sa.Integer(), nullable=False),
+        sa.Column("car_count", sa.Integer(), nullable=False),
+        sa.Column("min_year", sa.Integer(), nullable=True),
+        sa.Column("max_year", sa.Integer(), nullable=True),
+        sa.Column("min_price", sa.Integer(), nullable=True),
+        sa.Column("max_price", sa.Integer(), nullable=True),
+        sa.Column("marcas", sa.Text(), nullable=False),
+        sa.Column("combustibles", sa.Text(), nullable=False),
+        sa.Column("paises", sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(["dataset_id"], ["data_set.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("dataset_id"),
+    )
+
+    # Backfill the datasets ingested before this revision
+    bind = op.get_bind()
+    ranges = bind.execute(
+        sa.text(
+            "SELECT dataset_id, COUNT(id), MIN(comienzo_de_produccion), MAX(comienzo_de_produccion), "
+            "MIN(precio_estimado), MAX(precio_estimado) FROM coche GROUP BY dataset_id"
+        )
+    ).fetchall()
+    values = defaultdict(lambda: (set(), set(), set()))
+    for dataset_id, marca, combustible, pais in bind.execute(
+        sa.text("SELECT DISTINCT dataset_id, marca, combustible, pais_de_origen FROM coche")
+    ):
+        values[dataset_id][0].add(marca)
+        values[dataset_id][1].add(combustible)
+        values[dataset_id][2].add(pais)
+
+    rows = []
+    for dataset_id, car_count, min_year, max_year, min_price, max_price in ranges:
+        marcas, combustibles, paises = values[dataset_id]
+        rows.append(
+            {
+                "dataset_id": dataset_id,
+                "car_count": car_count,
+                "min_year": min_year,
+                "max_year": max_year,
+                "min_price": min_price,
+                "max_price": max_price,
+                "marcas": encode_values(marcas),
+                "combustibles": encode_values(combustibles),
+                "paises": encode_values(paises),
+            }
+        )
+    if rows:
+        op.bulk_insert(zone_map, rows)
+
+
+def downgrade():
+    op.drop_table("ds_zone_map")
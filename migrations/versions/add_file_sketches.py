@@ -0,0 +1,26 @@
+"""Add sketches column to file with the column distributions of its cars
+
+Revision ID: add_file_sketches
+Revises: add_coche_query_idx
+Create Date: 2026-10-19 14:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_file_sketches"
+down_revision = "add_coche_query_idx"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing files are sketched from their CSV the first time their dataset is queried
+    op.add_column("file", sa.Column("sketches", sa.LargeBinary(length=2**24 - 1), nullable=True))
+
+
+def downgrade():
+    op.drop_column("file", "sketches")
@@ -0,0 +1,28 @@
+"""Add the MinHash signature of the car models of a dataset to ds_zone_map
+
+Revision ID: add_zone_map_minhash
+Revises: add_ds_recommendation
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "add_zone_map_minhash"
+down_revision = "add_ds_recommendation"
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing datasets are signed by `rosemary recommendations:build`
+    with op.batch_alter_table("ds_zone_map", schema=None) as batch_op:
+        batch_op.add_column(sa.Column("minhash", sa.LargeBinary(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table("ds_zone_map", schema=None) as batch_op:
+        batch_op.drop_column("minhash")
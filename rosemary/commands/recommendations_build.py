@@ -0,0 +1,27 @@
+import time
+
+import click
+from flask.cli import with_appcontext
+
+
+@click.command(
+    "recommendations:build",
+    help="Recomputes the stored recommendations of every published dataset, e.g. after a deploy or a bulk import.",
+)
+@with_appcontext
+def recommendations_build():
+    from app.modules.dataset.services import DataSetRecommendationService
+
+    click.echo("Rebuilding the dataset recommendations...")
+    start = time.perf_counter()
+    try:
+        datasets = DataSetRecommendationService().rebuild()
+    except Exception as e:
+        click.echo(click.style(f"Error rebuilding the recommendations: {e}", fg="red"))
+        return
+
+    click.echo(
+        click.style(
+            f"Stored the recommendations of {datasets} datasets in {time.perf_counter() - start:.1f}s.", fg="green"
+        )
+    )
@@ -0,0 +1,23 @@
+import click
+from flask import current_app
+from flask.cli import with_appcontext
+
+
+@click.command("search:reindex", help="Rebuilds the search index used by explore from the database.")
+@with_appcontext
+def search_reindex():
+    from app.modules.explore.search_backends import get_search_backend
+
+    backend_name = current_app.config.get("SEARCH_BACKEND", "database")
+    if backend_name == "database":
+        click.echo(click.style("SEARCH_BACKEND is 'database': there is no index to rebuild.", fg="yellow"))
+        return
+
+    click.echo(f"Rebuilding the '{backend_name}' search index...")
+    try:
+        indexed = get_search_backend().reindex()
+    except Exception as e:
+        click.echo(click.style(f"Error rebuilding the search index: {e}", fg="red"))
+        return
+
+    click.echo(click.style(f"Indexed {indexed} datasets.", fg="green"))
@@ -0,0 +1,135 @@
+"""
+Benchmark of dictionary-encoding the low-cardinality coche columns.
+
+Builds the same synthetic cars twice in standalone SQLite databases, once with marca,
+motor, combustible and pais_de_origen as strings (the old layout) and once as ids into
+dictionary tables (the current layout), then compares the size of the databases (table
+plus a (combustible, precio_estimado) index) and the latency of the aggregate API GROUP BYs.
+
+    python scripts/benchmarks/car_dictionary_benchmark.py --rows 2000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import Column, Float, Integer, MetaData, String, Table, create_engine, func, insert, select
+
+MARCAS = ["Seat", "Volkswagen", "Toyota", "Renault", "BMW", "Fiat", "Citroën", "Peugeot", "Hyundai", "Kia"]
+MOTORES = [f"{size} {engine}" for size in (1.0, 1.2, 1.5, 1.6, 2.0, 3.0) for engine in ("TSI", "TDI", "HEV", "PHEV")]
+COMBUSTIBLES = ["Gasolina", "Diésel", "Híbrido", "Eléctrico", "GLP"]
+PAISES = ["España", "Alemania", "Japón", "Francia", "Italia", "Corea del Sur"]
+DICTIONARIES = {"marca": MARCAS, "motor": MOTORES, "combustible": COMBUSTIBLES, "pais_de_origen": PAISES}
+BATCH_SIZE = 50_000
+
+
+def coche_table(metadata: MetaData, encoded: bool) -> Table:
+    encoded_columns = [
+        Column(f"{name}_id" if encoded else name, Integer if encoded else String(120), nullable=False)
+        for name in DICTIONARIES
+    ]
+    return Table(
+        "coche",
+        metadata,
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        Column("dataset_id", Integer, nullable=False),
+        Column("modelo", String(120), nullable=False),
+        Column("consumo", Float, nullable=False),
+        Column("peso", Integer, nullable=False),
+        Column("precio_estimado", Integer, nullable=False),
+        *encoded_columns,
+    )
+
+
+def build(path: str, rows: int, encoded: bool) -> tuple:
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    metadata = MetaData()
+    table = coche_table(metadata, encoded)
+    dictionaries = {
+        name: Table(f"coche_{name}", metadata, Column("id", Integer, primary_key=True), Column("value", String(120)))
+        for name in DICTIONARIES
+    }
+    metadata.create_all(engine)
+
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        if encoded:
+            for name, values in DICTIONARIES.items():
+                connection.execute(
+                    insert(dictionaries[name]), [{"id": i + 1, "value": value} for i, value in enumerate(values)]
+                )
+        for offset in range(0, rows, BATCH_SIZE):
+            batch = []
+            for car_id in range(offset + 1, min(offset + BATCH_SIZE, rows) + 1):
+                row = {
+                    "id": car_id,
+                    "dataset_id": rng.randint(1, 5_000),
+                    "modelo": f"Modelo {rng.randint(1, 40)}",
+                    "consumo": round(rng.uniform(3.5, 12.0), 1),
+                    "peso": rng.randint(900, 2400),
+                    "precio_estimado": rng.randint(5_000, 90_000),
+                }
+                for name, values in DICTIONARIES.items():
+                    index = rng.randrange(len(values))
+                    row[f"{name}_id" if encoded else name] = index + 1 if encoded else values[index]
+                batch.append(row)
+            connection.execute(insert(table), batch)
+        column = "combustible_id" if encoded else "combustible"
+        connection.exec_driver_sql(f"CREATE INDEX ix_coche_combustible ON coche ({column}, precio_estimado)")
+    engine.dispose()
+
+    # VACUUM needs to run outside of a transaction
+    engine = create_engine(f"sqlite:///{path}", isolation_level="AUTOCOMMIT")
+    with engine.connect() as connection:
+        connection.exec_driver_sql("VACUUM")
+    return engine, table, dictionaries
+
+
+def group_by_latency(engine, table: Table, dictionaries: dict, encoded: bool, repeat: int) -> dict:
+    results = {}
+    for name in ("marca", "combustible", "pais_de_origen"):
+        column = table.c[f"{name}_id" if encoded else name]
+        statement = select(column, func.count(), func.avg(table.c.precio_estimado), func.avg(table.c.consumo))
+        statement = statement.group_by(column)
+        durations = []
+        with engine.connect() as connection:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                rows = connection.execute(statement).fetchall()
+                if encoded:
+                    # Decoding the few group ids is part of the cost
+                    values = dict(connection.execute(select(dictionaries[name].c.id, dictionaries[name].c.value)).all())
+                    rows = [(values[row[0]], *row[1:]) for row in rows]
+                durations.append(time.perf_counter() - start)
+        results[f"GROUP BY {name}"] = statistics.median(durations) * 1000
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dir", default="/tmp")
+    args = parser.parse_args()
+
+    results = {}
+    for encoded in (False, True):
+        path = os.path.join(args.dir, f"car_dictionary_{'encoded' if encoded else 'strings'}.db")
+        start = time.perf_counter()
+        engine, table, dictionaries = build(path, args.rows, encoded)
+        print(f"Built {path} in {time.perf_counter() - start:.1f}s")
+        results[encoded] = {"database size (MB)": os.path.getsize(path) / 2**20}
+        results[encoded].update(group_by_latency(engine, table, dictionaries, encoded, args.repeat))
+
+    print(f"\n{'measure':28} {'strings':>10} {'encoded':>10} {'ratio':>7}")
+    for measure, before in results[False].items():
+        after = results[True][measure]
+        print(f"{measure:28} {before:10.2f} {after:10.2f} {before / after if after else float('inf'):6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
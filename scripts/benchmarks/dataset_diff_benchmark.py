@@ -0,0 +1,113 @@
+"""
+Benchmark of diffing two versions of a dataset by row hash.
+
+Builds two synthetic versions of a dataset in a standalone SQLite database, the second one
+with a share of its rows changed, removed or added, and times the two calls of
+CocheRepository.rows_missing_from (an anti-join over the (dataset_id, row_hash) index,
+then the copies of the repeated hashes) the diff makes.
+
+    python scripts/benchmarks/dataset_diff_benchmark.py --rows 1000000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import time
+
+from sqlalchemy import BigInteger, Column, Integer, MetaData, String, Table, create_engine, func, insert, select
+
+BATCH_SIZE = 50_000
+
+
+def build(path: str, rows: int, churn: float) -> tuple:
+    if os.path.exists(path):
+        os.remove(path)
+    engine = create_engine(f"sqlite:///{path}")
+    metadata = MetaData()
+    table = Table(
+        "coche",
+        metadata,
+        Column("id", Integer, primary_key=True),
+        Column("dataset_id", Integer, nullable=False),
+        Column("matricula", String(7), nullable=False),
+        Column("row_hash", BigInteger),
+    )
+    metadata.create_all(engine)
+
+    rng = random.Random(42)
+    with engine.begin() as connection:
+        for offset in range(0, rows, BATCH_SIZE):
+            batch = []
+            for i in range(offset, min(offset + BATCH_SIZE, rows)):
+                row_hash = rng.getrandbits(63)
+                matricula = f"{i:07d}"
+                batch.append({"dataset_id": 1, "matricula": matricula, "row_hash": row_hash})
+                draw = rng.random()
+                if draw < churn / 3:
+                    # Changed: same plate, other content
+                    batch.append({"dataset_id": 2, "matricula": matricula, "row_hash": rng.getrandbits(63)})
+                elif draw < 2 * churn / 3:
+                    # Removed, and a new row added in its place
+                    batch.append({"dataset_id": 2, "matricula": f"N{i:06d}", "row_hash": rng.getrandbits(63)})
+                else:
+                    batch.append({"dataset_id": 2, "matricula": matricula, "row_hash": row_hash})
+            connection.execute(insert(table), batch)
+        connection.exec_driver_sql("CREATE INDEX ix_coche_dataset_row_hash ON coche (dataset_id, row_hash)")
+        connection.exec_driver_sql("ANALYZE")
+    return engine, table
+
+
+def rows_missing_from(connection, table: Table, dataset_id: int, other_dataset_id: int) -> list:
+    other = table.alias("other")
+    statement = (
+        select(table.c.id, table.c.matricula)
+        .where(table.c.dataset_id == dataset_id)
+        .where(
+            ~select(other.c.id)
+            .where(other.c.dataset_id == other_dataset_id, other.c.row_hash == table.c.row_hash)
+            .exists()
+        )
+    )
+    missing = connection.execute(statement).all()
+
+    repeated = (
+        select(table.c.row_hash, func.count(table.c.id).label("copies"))
+        .where(table.c.dataset_id == dataset_id)
+        .group_by(table.c.row_hash)
+        .having(func.count(table.c.id) > 1)
+        .subquery()
+    )
+    other_copies = (
+        select(func.count(other.c.id))
+        .where(other.c.dataset_id == other_dataset_id, other.c.row_hash == repeated.c.row_hash)
+        .scalar_subquery()
+    )
+    connection.execute(select(repeated.c.row_hash).where(other_copies.between(1, repeated.c.copies - 1))).all()
+    return missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--churn", type=float, default=0.05, help="share of the rows that differ")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--db", default="/tmp/dataset_diff_benchmark.db")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    engine, table = build(args.db, args.rows, args.churn)
+    print(f"Built {args.rows} rows per version in {time.perf_counter() - start:.1f}s")
+
+    durations = []
+    with engine.connect() as connection:
+        for _ in range(args.repeat):
+            start = time.perf_counter()
+            added = rows_missing_from(connection, table, 2, 1)
+            removed = rows_missing_from(connection, table, 1, 2)
+            durations.append(time.perf_counter() - start)
+    print(f"{len(added)} added and {len(removed)} removed rows found in {statistics.median(durations):.2f}s (median)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark of the full rebuild of the stored dataset recommendations.
+
+Generates a synthetic corpus of datasets with a publication type, Zipf-distributed tags
+(a few of them on most datasets) and authors, then times batch_nearest over the whole
+corpus, and FeatureIndex.nearest_to (the incremental path) over a sample of it.
+
+    python scripts/benchmarks/recommendation_build_benchmark.py --datasets 50000
+"""
+
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..")))
+
+from core.indexes.feature_index import FeatureIndex, batch_nearest  # noqa: E402
+
+PUBLICATION_TYPES = ["NONE", "AVAILABLE_TO_BUY_CARS", "MISSING_CARS", "SOLD_CARS"]
+
+
+def corpus(datasets: int, tags: int, authors: int, seed: int = 42) -> list:
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(tags)]
+    entries = []
+    for key in range(1, datasets + 1):
+        features = {("tag", f"tag{tag}") for tag in rng.choices(range(tags), weights, k=rng.randint(0, 6))}
+        features |= {("author", f"author{rng.randrange(authors)}") for _ in range(rng.randint(1, 3))}
+        entries.append((key, rng.choice(PUBLICATION_TYPES), features))
+    return entries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--datasets", type=int, default=50_000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--authors", type=int, default=20_000)
+    parser.add_argument("--sample", type=int, default=1_000)
+    parser.add_argument("-k", type=int, default=3)
+    args = parser.parse_args()
+
+    entries = corpus(args.datasets, args.tags, args.authors)
+
+    start = time.perf_counter()
+    results = batch_nearest(entries, args.k)
+    batch = time.perf_counter() - start
+    print(f"batch_nearest: {len(results)} datasets in {batch:.1f}s")
+
+    index = FeatureIndex()
+    for entry in entries:
+        index.add(*entry)
+    sample = random.Random(1).sample([key for key, _, _ in entries], min(args.sample, len(entries)))
+    start = time.perf_counter()
+    for key in sample:
+        assert index.nearest_to(key, args.k) == results[key]
+    per_key = (time.perf_counter() - start) / len(sample)
+    print(f"nearest_to: {per_key * 1000:.2f}ms per dataset, {per_key * len(entries):.1f}s for all (estimated)")
+
+
+if __name__ == "__main__":
+    main()